@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -88,6 +89,20 @@ DATABASES = {
     }
 }
 
+# エクスポートの行を読み込むための接続。mysqlclient の既定のカーソルは結果を全て
+# クライアントに読み込むため、SSCursor (サーバーサイドカーソル) で1行ずつ受け取る。
+# 結果を読み終えるまで同じ接続で他のクエリを実行できないため、エクスポート専用にする。
+try:
+    from MySQLdb.cursors import SSCursor
+except ImportError:  # mysqlclient が無い環境では default の接続で読み込む
+    SSCursor = None
+if SSCursor is not None:
+    DATABASES["export"] = {
+        **DATABASES["default"],
+        "OPTIONS": {"cursorclass": SSCursor},
+        "TEST": {"MIRROR": "default"},
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -127,7 +142,89 @@ CORS_ALLOWED_ORIGINS = [
 ]
 CORS_EXPOSE_HEADERS = [
     "Content-Disposition",
+    "ETag",
 ]
+# エクスポートキャッシュ (生成済みExcelファイルの保存先と合計サイズの上限)
+EXPORT_CACHE_DIR = BASE_DIR / "export_cache"
+EXPORT_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+# 非同期エクスポートジョブ (成果物の保存先と保持期間)
+EXPORT_JOB_DIR = BASE_DIR / "export_jobs"
+EXPORT_JOB_TTL_HOURS = 24
+# エクスポートジョブ専用のスレッドプールのワーカー数と、期限切れのジョブを削除する間隔
+EXPORT_JOB_WORKERS = 2
+EXPORT_JOB_PURGE_INTERVAL_MINUTES = 10
+# 未完了のジョブの生存確認日時を更新する間隔と、中断されたとみなすまでの秒数
+EXPORT_JOB_HEARTBEAT_SECONDS = 30
+EXPORT_JOB_STALE_SECONDS = 150
+
+# 取得した口コミページのHTMLアーカイブ (内容のSHA-256で重複排除し、圧縮して保存)
+RAW_HTML_ARCHIVE_DIR = BASE_DIR / "html_archive"
+RAW_HTML_ARCHIVE_ENABLED = os.environ.get("RAW_HTML_ARCHIVE_ENABLED", "1") == "1"
+
+# 口コミ本文の翻訳 (translate_reviews コマンド)
+# TRANSLATION_BACKEND: 翻訳バックエンドのクラスのパス
+# (動作確認用に、通信しない reviews.translation.StubTranslationBackend も使える)
+TRANSLATION_BACKEND = os.environ.get(
+    "TRANSLATION_BACKEND", "reviews.translation.GoogleCloudTranslationBackend"
+)
+TRANSLATION_API_KEY = os.environ.get("TRANSLATION_API_KEY", "")
+TRANSLATION_TARGET_LANGUAGE = "ja"
+
+# クロールの実行 (reviews.crawl_scheduler)
+# CRAWL_MAX_BROWSERS: 同時に起動するブラウザ (Chrome) の数の上限
+# CRAWL_MAX_HTTP_WORKERS: ブラウザを使わないOTAのクロールを同時に実行する数の上限
+CRAWL_MAX_BROWSERS = int(os.environ.get("CRAWL_MAX_BROWSERS", "1"))
+CRAWL_MAX_HTTP_WORKERS = int(os.environ.get("CRAWL_MAX_HTTP_WORKERS", "4"))
+
+# OTAごとの永続的なChromeプロファイル (reviews.browser_profiles)
+# 同意済みのCookieとHTTPディスクキャッシュを次回のクロールに引き継ぐ。
+# CHROME_PROFILE_SLOTS: OTAごとのプロファイルの数 (同じOTAを同時にクロールできる数)
+CHROME_PROFILE_DIR = BASE_DIR / "chrome_profiles"
+CHROME_PROFILES_ENABLED = os.environ.get("CHROME_PROFILES_ENABLED", "1") == "1"
+CHROME_PROFILE_SLOTS = int(os.environ.get("CHROME_PROFILE_SLOTS", "2"))
+
+# Chromeのメモリの監視 (reviews.browser_watchdog)
+# CHROME_MAX_RSS_MB: Chromeのプロセスツリーの RSS の上限。超えるとページの切り替わりで起動し直す (0 の場合は無効)
+# CHROME_RECYCLE_PAGES: この数のページを処理するごとに起動し直す (0 の場合は無効)
+CHROME_MAX_RSS_MB = int(os.environ.get("CHROME_MAX_RSS_MB", "1500"))
+CHROME_RECYCLE_PAGES = int(os.environ.get("CHROME_RECYCLE_PAGES", "200"))
+
+# Selenium Remote WebDriver (Selenium Grid / standalone サーバー) でChromeを起動する場合の
+# エンドポイント (カンマ区切り, 例: "http://grid1:4444,http://grid2:4444")。空の場合はローカルで起動する。
+# SELENIUM_REMOTE_STATUS_TIMEOUT: 各エンドポイントの /status の応答を待つ秒数
+SELENIUM_REMOTE_URLS = [
+    url.strip()
+    for url in os.environ.get("SELENIUM_REMOTE_URLS", "").split(",")
+    if url.strip()
+]
+SELENIUM_REMOTE_STATUS_TIMEOUT = float(
+    os.environ.get("SELENIUM_REMOTE_STATUS_TIMEOUT", "3")
+)
+
+# ロギング
+# LOG_FORMAT: "json" (1行1レコードのJSON) または "text"
+# REVIEW_LOG_SAMPLE_RATE: DEBUG有効時に、抽出した口コミの内容を記録する割合 (0.0〜1.0)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text" if DEBUG else "json")
+REVIEW_LOG_SAMPLE_RATE = float(os.environ.get("REVIEW_LOG_SAMPLE_RATE", "0.1"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "reviews.logging_utils.JsonFormatter"},
+        "text": {"format": "%(asctime)s - %(levelname)s - %(name)s - %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": LOG_FORMAT},
+    },
+    "root": {"handlers": ["console"], "level": "WARNING"},
+    "loggers": {
+        "reviews": {"handlers": ["console"], "level": LOG_LEVEL, "propagate": False},
+    },
+}
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/3.2/howto/static-files/
 
@@ -0,0 +1,19 @@
+"""
+gunicorn の設定。backend/ で `gunicorn config.wsgi` を実行すると読み込まれる。
+
+PROMETHEUS_MULTIPROC_DIR を指定して複数のワーカーで動かす場合、終了したワーカーの
+ゲージのファイルを削除しないと、その最後の値が /metrics で集計され続ける。
+"""
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+
+
+def child_exit(server, worker):
+    # マスタープロセスで、ワーカーの終了 (再起動を含む) ごとに呼ばれる
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,153 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+
+class ReviewFilterError(ValueError):
+    """クエリパラメータの値が不正な場合に送出される例外"""
+
+
+def _parse_int_list(value, param_name):
+    try:
+        # カンマ区切りの文字列を整数のリストに変換
+        return [int(id_str) for id_str in value.split(",") if id_str.strip()]
+    except (ValueError, TypeError):
+        raise ReviewFilterError(
+            f"無効な {param_name} パラメータです。カンマ区切りの数値を指定してください。"
+        )
+
+
+def _parse_date(value, param_name):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise ReviewFilterError(
+            f"無効な {param_name} パラメータです。YYYY-MM-DD形式で指定してください。"
+        )
+
+
+def _parse_decimal(value, param_name):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ReviewFilterError(f"無効な {param_name} パラメータです。数値を指定してください。")
+
+
+def filter_reviews(queryset, query_params):
+    """
+    クエリパラメータに従ってReviewのクエリセットを絞り込む。
+
+    対応パラメータ: hotel_id, ota_ids (カンマ区切り), start_date, end_date,
+    min_score, max_score (10点満点に正規化済みの総合評価),
+    language (言語コード), traveler_type (正規化済みの旅行形態)
+    """
+    hotel_id = query_params.get("hotel_id")
+    if hotel_id:
+        hotel_ids = _parse_int_list(hotel_id, "hotel_id")
+        queryset = queryset.filter(crawl_target__hotel_id__in=hotel_ids)
+
+    ota_ids = query_params.get("ota_ids")
+    if ota_ids:
+        queryset = queryset.filter(
+            crawl_target__ota_id__in=_parse_int_list(ota_ids, "ota_ids")
+        )
+
+    start_date = query_params.get("start_date")
+    if start_date:
+        queryset = queryset.filter(
+            review_date__gte=_parse_date(start_date, "start_date")
+        )
+
+    end_date = query_params.get("end_date")
+    if end_date:
+        queryset = queryset.filter(review_date__lte=_parse_date(end_date, "end_date"))
+
+    min_score = query_params.get("min_score")
+    if min_score:
+        queryset = queryset.filter(
+            overall_score__gte=_parse_decimal(min_score, "min_score")
+        )
+
+    max_score = query_params.get("max_score")
+    if max_score:
+        queryset = queryset.filter(
+            overall_score__lte=_parse_decimal(max_score, "max_score")
+        )
+
+    language = query_params.get("language")
+    if language:
+        queryset = queryset.filter(language_code=language)
+
+    traveler_type = query_params.get("traveler_type")
+    if traveler_type:
+        queryset = queryset.filter(traveler_type=traveler_type)
+
+    return queryset
+
+
+def encode_review_cursor(review) -> str:
+    """(review_date, id) のキーセットを不透明なカーソル文字列に変換する。"""
+    payload = {
+        "d": review.review_date.isoformat() if review.review_date else None,
+        "id": review.id,
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_review_cursor(cursor: str):
+    """カーソル文字列を (review_date, id) に戻す。"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        review_date = payload["d"]
+        if review_date is not None:
+            review_date = datetime.strptime(review_date, "%Y-%m-%d").date()
+        return review_date, int(payload["id"])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise ReviewFilterError("無効な cursor パラメータです。")
+
+
+def seek_review_page(queryset, cursor, limit):
+    """
+    (-review_date, -id) 順で、カーソル位置より後ろのレビューを最大 limit 件返す。
+    OFFSETを使わないため、深いページでも1ページ目と同じコストで取得できる。
+
+    MySQL は降順で NULL を末尾に並べるため、review_date が NULL のレビューは末尾に続く。
+    (review_date, id) のインデックスで範囲検索できるよう、絞り込みには NULL の条件を
+    含めず、日付のあるレビューを読み終えた場合だけ NULL の末尾を別のクエリで取得する。
+    :param cursor: decode_review_cursor() の (review_date, id)。1ページ目は None。
+    """
+    ordered = queryset.order_by("-review_date", "-id")
+    if cursor is None:
+        return list(ordered[:limit])
+    review_date, review_id = cursor
+    if review_date is None:
+        return list(ordered.filter(review_date__isnull=True, id__lt=review_id)[:limit])
+
+    results = list(
+        ordered.filter(
+            Q(review_date__lt=review_date) | Q(review_date=review_date, id__lt=review_id)
+        )[:limit]
+    )
+    if len(results) < limit:
+        results += list(
+            ordered.filter(review_date__isnull=True)[: limit - len(results)]
+        )
+    return results
+
+
+def parse_page_params(query_params, default_page_size=20, max_page_size=100):
+    """page / page_size パラメータを検証して (page, page_size) を返す。"""
+    try:
+        page = int(query_params.get("page", 1))
+        page_size = int(query_params.get("page_size", default_page_size))
+    except (ValueError, TypeError):
+        raise ReviewFilterError("page / page_size には数値を指定してください。")
+    if page < 1 or page_size < 1:
+        raise ReviewFilterError("page / page_size には1以上の値を指定してください。")
+    return page, min(page_size, max_page_size)
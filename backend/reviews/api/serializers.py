@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from ..models import CrawlTarget, Ota, Hotel
+from ..models import CrawlTarget, ExportJob, Ota, Hotel, Review, ReviewScore
 
 
 class OtaSerializer(serializers.ModelSerializer):
@@ -37,3 +37,86 @@ class CrawlTargetStatusSerializer(serializers.ModelSerializer):
             "last_crawled_at",
             "last_crawl_message",
         ]
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """エクスポートジョブの進捗状況を返すためのシリアライザー"""
+
+    hotel_name = serializers.CharField(source="hotel.name", read_only=True)
+
+    class Meta:
+        model = ExportJob
+        fields = [
+            "id",
+            "hotel_name",
+            "ota_ids",
+            "start_date",
+            "end_date",
+            "file_format",
+            "status",
+            "rows_written",
+            "total_rows",
+            "file_size",
+            "error_message",
+            "created_at",
+            "finished_at",
+            "expires_at",
+        ]
+
+
+class ReviewSearchResultSerializer(serializers.ModelSerializer):
+    """口コミ全文検索の結果を返すためのシリアライザー"""
+
+    hotel_name = serializers.CharField(source="crawl_target.hotel.name", read_only=True)
+    ota_name = serializers.CharField(source="crawl_target.ota.name", read_only=True)
+    relevance = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = Review
+        fields = [
+            "id",
+            "hotel_name",
+            "ota_name",
+            "review_date",
+            "reviewer_name",
+            "overall_score",
+            "review_language",
+            "review_comment",
+            "translated_review_comment",
+            "relevance",
+        ]
+
+
+class ReviewScoreSerializer(serializers.ModelSerializer):
+    """口コミのカテゴリ別スコアを返すためのシリアライザー"""
+
+    class Meta:
+        model = ReviewScore
+        fields = ["category", "score"]
+
+
+class ReviewSerializer(serializers.ModelSerializer):
+    """口コミ一覧を返すためのシリアライザー"""
+
+    hotel_name = serializers.CharField(source="crawl_target.hotel.name", read_only=True)
+    ota_name = serializers.CharField(source="crawl_target.ota.name", read_only=True)
+    scores = ReviewScoreSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Review
+        fields = [
+            "id",
+            "hotel_name",
+            "ota_name",
+            "review_date",
+            "reviewer_name",
+            "overall_score",
+            "language_code",
+            "review_language",
+            "traveler_type",
+            "purpose_of_visit",
+            "room_type",
+            "review_comment",
+            "translated_review_comment",
+            "scores",
+        ]
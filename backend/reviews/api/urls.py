@@ -3,18 +3,44 @@ from .views import (
     OtaListView,
     HotelListAPIView,
     StartCrawlerAPIView,
+    BatchCrawlAPIView,
     ExportExcelAPIView,
     CrawlStatusAPIView,
+    CrawlRunTrendsAPIView,
+    ExportJobCreateAPIView,
+    ExportJobDetailAPIView,
+    ExportJobDownloadAPIView,
+    ReviewSearchAPIView,
+    ReviewListAPIView,
 )
 
 urlpatterns = [
     path("otas/", OtaListView.as_view(), name="ota-list"),
     path("hotels/", HotelListAPIView.as_view(), name="hotel-list"),
     path("crawlers/start/", StartCrawlerAPIView.as_view(), name="start-crawler"),
+    path("crawlers/batch/", BatchCrawlAPIView.as_view(), name="batch-crawl"),
     path("export/", ExportExcelAPIView.as_view(), name="export-file"),
+    path("export-jobs/", ExportJobCreateAPIView.as_view(), name="export-job-create"),
+    path(
+        "export-jobs/<uuid:job_id>/",
+        ExportJobDetailAPIView.as_view(),
+        name="export-job-detail",
+    ),
+    path(
+        "export-jobs/<uuid:job_id>/download/",
+        ExportJobDownloadAPIView.as_view(),
+        name="export-job-download",
+    ),
+    path("reviews/", ReviewListAPIView.as_view(), name="review-list"),
+    path("reviews/search/", ReviewSearchAPIView.as_view(), name="review-search"),
     path(
         "crawl-status/<int:hotel_id>/",
         CrawlStatusAPIView.as_view(),
         name="crawl-status",
     ),
+    path(
+        "crawl-runs/trends/",
+        CrawlRunTrendsAPIView.as_view(),
+        name="crawl-run-trends",
+    ),
 ]
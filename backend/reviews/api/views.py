@@ -1,15 +1,42 @@
 from rest_framework.generics import ListAPIView
-from ..models import CrawlTarget, Hotel,Ota
-from .serializers import OtaSerializer, HotelSerializer, CrawlTargetStatusSerializer
+from ..models import CrawlRun, CrawlTarget, ExportJob, Hotel,Ota, Review, ReviewScore
+from .serializers import (
+    OtaSerializer,
+    HotelSerializer,
+    CrawlTargetStatusSerializer,
+    ExportJobSerializer,
+    ReviewSearchResultSerializer,
+    ReviewSerializer,
+)
+from .filters import (
+    ReviewFilterError,
+    decode_review_cursor,
+    encode_review_cursor,
+    filter_reviews,
+    parse_page_params,
+    seek_review_page,
+)
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.core.management import call_command
-from reviews.services import get_reviews_as_dataframe, generate_excel_in_memory
-from django.http import HttpResponse
+from reviews.services import write_reviews_xlsx
+from reviews.export_cache import export_cache, get_data_versions
+from reviews.export_jobs import purge_expired_export_jobs_if_due, submit_export_job
+from reviews.search import search_reviews
+from reviews.crawl_stats import build_throughput_trends
+from reviews.metrics import (
+    EXECUTOR_QUEUED,
+    EXECUTOR_RUNNING,
+    EXPORT_BYTES,
+    EXPORT_DURATION,
+)
+from django.http import FileResponse, HttpResponse
+from django.utils.http import parse_etags
 import io
+import os
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 from urllib.parse import quote
 from django.http import HttpResponse
 from rest_framework.views import APIView
@@ -20,6 +47,8 @@ import threading
 from concurrent.futures import ThreadPoolExecutor
 from django.core.management import call_command
 from django.db import connection
+from django.db.models import Prefetch
+from django.utils import timezone
 
 # -----------------------------------------------------------------------------
 # API Views
@@ -44,24 +73,43 @@ class HotelListAPIView(ListAPIView):
     serializer_class = HotelSerializer
 
 
+logger = logging.getLogger(__name__)
+
 # サーバー全体で1つのスレッドプールを共有します。
 # サーバーのスペックに合わせて調整します。
 # max_workers=5 は「同時に実行する重い処理は最大5つまで」
 thread_pool = ThreadPoolExecutor(max_workers=5)
 
 
+def _run_with_queue_metrics(func, *args):
+    EXECUTOR_QUEUED.dec()
+    EXECUTOR_RUNNING.inc()
+    try:
+        return func(*args)
+    finally:
+        EXECUTOR_RUNNING.dec()
+
+
+def submit_to_thread_pool(func, *args):
+    """
+    スレッドプールに処理を投入する。
+    実行待ち・実行中のタスク数をメトリクスとして記録する。
+    """
+    EXECUTOR_QUEUED.inc()
+    return thread_pool.submit(_run_with_queue_metrics, func, *args)
+
+
 def _command_wrapper(command_name, *args):
     """
     call_commandをラップし、エラーハンドリングとDB接続管理を行う。
     この関数がスレッドで直接実行される。
     """
     try:
-        print(f"Starting command '{command_name}' in thread...")
+        logger.info(f"Starting command '{command_name}' in thread...")
         call_command(command_name, *args)
-        print(f"Finished command '{command_name}' successfully.")
+        logger.info(f"Finished command '{command_name}' successfully.")
     except Exception as e:
         # スレッド内で発生した例外をログに記録する
-        logger = logging.getLogger(__name__)
         logger.error(
             f"Error executing command '{command_name}' in thread with args {args}",
             exc_info=True,  
@@ -71,10 +119,8 @@ def _command_wrapper(command_name, *args):
         connection.close()
 
 
-def run_command_in_thread(command_name, *args, **kwargs):
-    """
-    Djangoのコマンドをスレッドプールを使って安全に実行する
-    """
+def build_command_args(*args, **kwargs):
+    """call_command に渡す引数のリストを作る (キーワード引数は --オプション に変換する)"""
     cmd_args = list(args)
     for key, value in kwargs.items():
         if value is not None:
@@ -87,8 +133,28 @@ def run_command_in_thread(command_name, *args, **kwargs):
             elif not isinstance(value, bool):
                 cmd_args.append(f'--{key.replace("_", "-")}')
                 cmd_args.append(str(value))
+    return cmd_args
 
-    thread_pool.submit(_command_wrapper, command_name, *cmd_args)
+
+def run_command_in_thread(command_name, *args, **kwargs):
+    """
+    Djangoのコマンドをスレッドプールを使って安全に実行する
+    """
+    cmd_args = build_command_args(*args, **kwargs)
+    submit_to_thread_pool(_command_wrapper, command_name, *cmd_args)
+
+
+# 一括クロール専用のスレッドプール。一括クロールは数時間かかるため、共有のスレッドプールの
+# ワーカーを占有しないよう分ける。ブラウザの同時起動数を守るため、実行中の一括クロールは1つまで。
+batch_crawl_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="batch-crawl")
+_batch_crawl_lock = threading.Lock()
+
+
+def _run_batch_crawl(cmd_args):
+    try:
+        _command_wrapper("start_crawl", *cmd_args)
+    finally:
+        _batch_crawl_lock.release()
 
 
 class StartCrawlerAPIView(APIView):
@@ -141,6 +207,89 @@ class StartCrawlerAPIView(APIView):
             )
 
 
+def parse_ota_ids(value):
+    """
+    OTA IDのリスト (またはカンマ区切りの文字列) を整数のリストに変換する。
+    指定がない場合は None。数値でない値が含まれる場合は ValueError か TypeError。
+    """
+    if value in (None, "", []):
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    return [int(ota_id) for ota_id in value]
+
+
+class BatchCrawlAPIView(APIView):
+    """
+    全ホテルのクロール対象を、OTAごとに1つのブラウザでまとめてクロールするAPIビュー。
+    POST /api/crawlers/batch/ で開始し (start_crawl --all-hotels --group-by-ota)、
+    GET /api/crawlers/batch/?ota_ids=1,2 でクロール対象ごとの実行結果を返す。
+    一括クロールの実行中に POST した場合は 409 を返す。
+    """
+
+    def post(self, request, *args, **kwargs):
+        options = request.data.get("options", {})
+        try:
+            ota_ids = parse_ota_ids(options.get("ota_ids"))
+        except (ValueError, TypeError):
+            return Response(
+                {"error": "無効な ota_ids です。数値のリストを指定してください。"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        targets = CrawlTarget.objects.all()
+        if ota_ids:
+            targets = targets.filter(ota_id__in=ota_ids)
+        target_count = targets.count()
+        if not target_count:
+            return Response(
+                {"error": "クロール対象が登録されていません。"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # 実行中の一括クロールがあれば開始しない (Chromeの数が倍になり、同じ対象を同時に保存してしまう)
+        if not _batch_crawl_lock.acquire(blocking=False):
+            return Response(
+                {"error": "一括クロールを実行中です。完了してから再度実行してください。"},
+                status=status.HTTP_409_CONFLICT,
+            )
+        cmd_args = build_command_args(
+            all_hotels=True,
+            group_by_ota=True,
+            ota_ids=ota_ids,
+            start_date=options.get("startDate"),
+            end_date=options.get("endDate"),
+        )
+        try:
+            batch_crawl_pool.submit(_run_batch_crawl, cmd_args)
+        except Exception:
+            _batch_crawl_lock.release()
+            raise
+        return Response(
+            {
+                "message": f"{target_count}件のクロール対象の一括クロールをバックグラウンドで開始しました。",
+                "target_count": target_count,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    def get(self, request, *args, **kwargs):
+        try:
+            ota_ids = parse_ota_ids(request.query_params.get("ota_ids"))
+        except (ValueError, TypeError):
+            return Response(
+                {"error": "無効な ota_ids パラメータです。カンマ区切りの数値を指定してください。"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        targets = CrawlTarget.objects.select_related("hotel", "ota").order_by(
+            "ota__name", "hotel__name"
+        )
+        if ota_ids:
+            targets = targets.filter(ota_id__in=ota_ids)
+        serializer = CrawlTargetStatusSerializer(targets, many=True)
+        return Response(serializer.data)
+
+
 class CrawlStatusAPIView(APIView):
 
     def get(self, request, hotel_id):
@@ -170,10 +319,91 @@ class CrawlStatusAPIView(APIView):
             )
 
 
+class CrawlRunTrendsAPIView(APIView):
+    """
+    OTAごとのクロール実行履歴から、スループット (1分あたりの口コミ数・ページ数) の推移と、
+    直近の実行がそれ以前より低下していないか (回帰) を返すAPIビュー。
+    /api/crawl-runs/trends/?ota_ids=1,2&hotel_id=1&days=90&recent=5&threshold=0.3
+    """
+
+    default_days = 90
+    default_recent = 5
+    default_threshold = 0.3
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        try:
+            days = int(params.get("days", self.default_days))
+            recent_size = int(params.get("recent", self.default_recent))
+            threshold = float(params.get("threshold", self.default_threshold))
+            if days <= 0 or recent_size <= 0 or not 0 < threshold < 1:
+                raise ValueError
+        except (ValueError, TypeError):
+            return Response(
+                {
+                    "error": "days・recent には正の整数、threshold には0より大きく1未満の数値を指定してください。"
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # 成功した実行のみを (ota, started_at) インデックスの順で読み込む
+        runs = CrawlRun.objects.filter(
+            ota__isnull=False,
+            status=CrawlTarget.CrawlStatus.SUCCESS,
+            started_at__gte=timezone.now() - timedelta(days=days),
+        )
+        ota_ids_str = params.get("ota_ids")
+        if ota_ids_str:
+            try:
+                ota_ids = [int(id_str) for id_str in ota_ids_str.split(",")]
+            except (ValueError, TypeError):
+                return Response(
+                    {"error": "無効な ota_ids パラメータです。カンマ区切りの数値を指定してください。"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            runs = runs.filter(ota_id__in=ota_ids)
+        hotel_id = params.get("hotel_id")
+        if hotel_id:
+            if not hotel_id.isdigit():
+                return Response(
+                    {"error": "無効な hotel_id パラメータです。"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            runs = runs.filter(crawl_target__hotel_id=int(hotel_id))
+
+        runs = runs.order_by("ota_id", "started_at").values(
+            "id",
+            "ota_id",
+            "ota__name",
+            "crawl_target__hotel__name",
+            "started_at",
+            "duration_seconds",
+            "browser_seconds",
+            "pages_visited",
+            "reviews_seen",
+            "bytes_downloaded",
+        )
+        return Response(
+            {
+                "days": days,
+                "recent": recent_size,
+                "threshold": threshold,
+                "results": build_throughput_trends(runs, recent_size, threshold),
+            }
+        )
+
+
+# エクスポート形式ごとのContent-Type
+EXPORT_CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
 class ExportExcelAPIView(APIView):
     """
     リクエストされたホテルのレビューデータをExcelファイルとして生成し、
     直接ダウンロードさせるAPIビュー。
+    生成済みのファイルはエクスポートキャッシュから返し、ETag/If-None-Match にも対応する。
     """
 
     def post(self, request, *args, **kwargs):
@@ -185,46 +415,90 @@ class ExportExcelAPIView(APIView):
         otas_ids = options_data.get("ota_ids")
         start_date = options_data.get("startDate")
         end_date = options_data.get("endDate")
+        file_format = options_data.get("format") or "xlsx"
 
         if not hotel_name:
             return Response(
                 {"error": "hotel_nameは必須です。"}, status=status.HTTP_400_BAD_REQUEST
             )
+        if file_format not in EXPORT_CONTENT_TYPES:
+            return Response(
+                {"error": f"未対応の出力形式です: {file_format}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            otas_ids = parse_ota_ids(otas_ids)
+        except (ValueError, TypeError):
+            return Response(
+                {"error": "無効な ota_ids です。数値のリストを指定してください。"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         try:
-            if not Hotel.objects.filter(name=hotel_name).exists():
+            hotel_master = Hotel.objects.filter(name=hotel_name).first()
+            if hotel_master is None:
                 return Response(
                     {"error": f"ホテル '{hotel_name}' が見つかりません。"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
-            # --- サービス関数を呼び出す (hotel_name を渡す) ---
-            df = get_reviews_as_dataframe(
-                hotel_name=hotel_name,
-                hotel_id=selected_hotel_id, 
+
+            # --- キャッシュキー (ETag) の算出 ---
+            cache_key = export_cache.make_key(
+                hotel_id=hotel_master.id,
                 ota_ids=otas_ids,
                 start_date=start_date,
                 end_date=end_date,
+                file_format=file_format,
+                data_versions=get_data_versions(hotel_master, otas_ids),
             )
-            if df.empty:
-                return Response(
-                    {"message": "エクスポート対象のデータがありませんでした。"},
-                    status=status.HTTP_204_NO_CONTENT,
-                )
+            etag = f'"{cache_key}"'
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+                response["ETag"] = etag
+                return response
 
-            # --- ファイル名生成とレスポンス作成 (ここは前回の回答と同じ) ---
+            # --- ファイル名生成 ---
             safe_hotel_name = re.sub(r'[\\/*?:"<>|]', "_", hotel_name)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            final_filename = f"{safe_hotel_name}_{timestamp}.xlsx"
+            final_filename = f"{safe_hotel_name}_{timestamp}.{file_format}"
+            content_type = EXPORT_CONTENT_TYPES[file_format]
 
-            excel_data_buffer = generate_excel_in_memory(df)
+            response = None
+            cached_path = export_cache.get(cache_key)
+            if cached_path is not None:
+                # キャッシュヒット: 保存済みファイルをそのまま返す
+                try:
+                    response = FileResponse(
+                        open(cached_path, "rb"), content_type=content_type
+                    )
+                except FileNotFoundError:
+                    # get() の後に追い出された場合は、キャッシュが無いものとして作り直す
+                    logger.info(f"エクスポートキャッシュ {cache_key} が削除されたため、作り直します。")
+            if response is None:
+                # --- 行をDBから逐次読み込み、Excelに書き込む (DataFrameは作らない) ---
+                excel_buffer = io.BytesIO()
+                with EXPORT_DURATION.labels("sync").time():
+                    rows_written = write_reviews_xlsx(
+                        excel_buffer,
+                        hotel=hotel_master,
+                        ota_ids=otas_ids,
+                        start_date=start_date,
+                        end_date=end_date,
+                    )
+                if rows_written == 0:
+                    return Response(
+                        {"message": "エクスポート対象のデータがありませんでした。"},
+                        status=status.HTTP_204_NO_CONTENT,
+                    )
+                excel_data = excel_buffer.getvalue()
+                EXPORT_BYTES.labels("sync").observe(len(excel_data))
+                export_cache.put(cache_key, excel_data)
+                response = HttpResponse(excel_data, content_type=content_type)
 
-            response = HttpResponse(
-                excel_data_buffer,
-                content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            )
             response["Content-Disposition"] = (
                 f"attachment; filename*=UTF-8''{quote(final_filename)}"
             )
+            response["ETag"] = etag
 
             return response
 
@@ -238,3 +512,228 @@ class ExportExcelAPIView(APIView):
                 {"error": f"サーバー内部でエラーが発生しました: {e}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+
+class ExportJobCreateAPIView(APIView):
+    """
+    エクスポート処理をバックグラウンドジョブとして登録するAPIビュー。
+    リクエストの形式は ExportExcelAPIView と同じで、ジョブIDを即座に返す。
+    """
+
+    def post(self, request, *args, **kwargs):
+        hotel_data = request.data.get("hotel", {})
+        selected_hotel_id = hotel_data.get("id")
+        options_data = request.data.get("options", {})
+        file_format = options_data.get("format") or "xlsx"
+
+        if not selected_hotel_id:
+            return Response(
+                {"error": "Hotel IDは必須です。"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if file_format not in EXPORT_CONTENT_TYPES:
+            return Response(
+                {"error": f"未対応の出力形式です: {file_format}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            ota_ids = parse_ota_ids(options_data.get("ota_ids"))
+        except (ValueError, TypeError):
+            return Response(
+                {"error": "無効な ota_ids です。数値のリストを指定してください。"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            hotel_master = Hotel.objects.get(pk=selected_hotel_id)
+        except Hotel.DoesNotExist:
+            return Response(
+                {"error": f"ホテル '{selected_hotel_id}' が見つかりません。"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        # 期限切れの成果物は一定間隔ごとに、ジョブのAPIが呼ばれたタイミングで掃除する
+        purge_expired_export_jobs_if_due()
+
+        job = ExportJob.objects.create(
+            hotel=hotel_master,
+            ota_ids=ota_ids or [],
+            start_date=options_data.get("startDate") or None,
+            end_date=options_data.get("endDate") or None,
+            file_format=file_format,
+        )
+        submit_export_job(job.id)
+
+        serializer = ExportJobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class ExportJobDetailAPIView(APIView):
+    """エクスポートジョブの進捗 (書き込み済み行数など) を返すAPIビュー。"""
+
+    def get(self, request, job_id):
+        purge_expired_export_jobs_if_due()
+        try:
+            job = ExportJob.objects.select_related("hotel").get(pk=job_id)
+        except ExportJob.DoesNotExist:
+            return Response(
+                {"error": f"エクスポートジョブ '{job_id}' が見つかりません。"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        serializer = ExportJobSerializer(job)
+        return Response(serializer.data)
+
+
+class ExportJobDownloadAPIView(APIView):
+    """完了したエクスポートジョブの成果物をダウンロードさせるAPIビュー。"""
+
+    def get(self, request, job_id):
+        purge_expired_export_jobs_if_due()
+        try:
+            job = ExportJob.objects.select_related("hotel").get(pk=job_id)
+        except ExportJob.DoesNotExist:
+            return Response(
+                {"error": f"エクスポートジョブ '{job_id}' が見つかりません。"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        if job.status != ExportJob.JobStatus.SUCCESS:
+            return Response(
+                {"error": "エクスポート処理はまだ完了していません。", "status": job.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if job.is_expired or not os.path.exists(job.file_path):
+            return Response(
+                {"error": "成果物の保持期間が過ぎたため、ダウンロードできません。"},
+                status=status.HTTP_410_GONE,
+            )
+
+        safe_hotel_name = re.sub(r'[\\/*?:"<>|]', "_", job.hotel.name)
+        timestamp = timezone.localtime(job.finished_at).strftime("%Y%m%d_%H%M%S")
+        final_filename = f"{safe_hotel_name}_{timestamp}.{job.file_format}"
+
+        response = FileResponse(
+            open(job.file_path, "rb"),
+            content_type=EXPORT_CONTENT_TYPES[job.file_format],
+        )
+        response["Content-Disposition"] = (
+            f"attachment; filename*=UTF-8''{quote(final_filename)}"
+        )
+        return response
+
+
+class ReviewSearchAPIView(APIView):
+    """
+    口コミ本文 (原文・翻訳) を全文検索し、関連度順にページ単位で返すAPIビュー。
+    /api/reviews/search/?q=朝食&hotel_id=1&ota_ids=1,2&start_date=2025-01-01&min_score=8&page=1
+    """
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response(
+                {"error": "検索キーワード (q) は必須です。"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            page, page_size = parse_page_params(request.query_params)
+            reviews = filter_reviews(Review.objects.all(), request.query_params)
+        except ReviewFilterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        reviews = (
+            search_reviews(query, reviews)
+            .select_related("crawl_target__hotel", "crawl_target__ota")
+            .only(
+                "id",
+                "review_date",
+                "reviewer_name",
+                "overall_score",
+                "review_language",
+                "review_comment",
+                "translated_review_comment",
+                "crawl_target__hotel__name",
+                "crawl_target__ota__name",
+            )
+        )
+
+        # 総件数のCOUNTは行わず、1件多く取得して次ページの有無を判定する
+        offset = (page - 1) * page_size
+        results = list(reviews[offset : offset + page_size + 1])
+        has_next = len(results) > page_size
+
+        serializer = ReviewSearchResultSerializer(results[:page_size], many=True)
+        return Response(
+            {
+                "query": query,
+                "page": page,
+                "page_size": page_size,
+                "has_next": has_next,
+                "results": serializer.data,
+            }
+        )
+
+
+class ReviewListAPIView(APIView):
+    """
+    口コミをキーセット (review_date, id) ページネーションで一覧表示するAPIビュー。
+    /api/reviews/?hotel_id=1&ota_ids=1,2&language=en&traveler_type=家族&page_size=50
+    2ページ目以降はレスポンスの next_cursor を cursor パラメータに渡す。
+    """
+
+    default_page_size = 50
+    max_page_size = 200
+
+    def get(self, request, *args, **kwargs):
+        try:
+            _, page_size = parse_page_params(
+                request.query_params,
+                default_page_size=self.default_page_size,
+                max_page_size=self.max_page_size,
+            )
+            reviews = filter_reviews(Review.objects.all(), request.query_params)
+            cursor = request.query_params.get("cursor")
+            cursor = decode_review_cursor(cursor) if cursor else None
+        except ReviewFilterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        reviews = (
+            reviews.select_related("crawl_target__hotel", "crawl_target__ota")
+            .only(
+                "id",
+                "review_date",
+                "reviewer_name",
+                "overall_score",
+                "language_code",
+                "review_language",
+                "traveler_type",
+                "purpose_of_visit",
+                "room_type",
+                "review_comment",
+                "translated_review_comment",
+                "crawl_target__hotel__name",
+                "crawl_target__ota__name",
+            )
+            # ページ内のスコアは1回の追加クエリでまとめて取得する
+            .prefetch_related(
+                Prefetch(
+                    "scores",
+                    queryset=ReviewScore.objects.only(
+                        "id", "review_id", "category", "score"
+                    ),
+                )
+            )
+        )
+
+        # 1件多く取得して次ページの有無を判定する
+        results = seek_review_page(reviews, cursor, page_size + 1)
+        has_next = len(results) > page_size
+        results = results[:page_size]
+
+        serializer = ReviewSerializer(results, many=True)
+        return Response(
+            {
+                "next_cursor": encode_review_cursor(results[-1]) if has_next else None,
+                "results": serializer.data,
+            }
+        )
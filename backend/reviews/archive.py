@@ -0,0 +1,221 @@
+"""
+取得した口コミページのHTMLを保存するアーカイブ。
+
+HTMLは内容の SHA-256 をキーとしてディスクに保存するため、同じ内容のページは
+クロール実行をまたいで1ファイルにまとまる。zstandard がインストールされていれば
+zstd、なければ gzip で圧縮する。どのページをいつ取得したかは ArchivedPage に
+(クロール対象, 実行, ページ番号) で記録し、reextract コマンドから
+ネットワークに接続せずに再抽出できるようにする。
+"""
+import contextvars
+import gzip
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import ArchivedPage
+from .tracing import ARCHIVE, phase
+
+try:
+    import zstandard
+except ImportError:  # zstandard は任意。無ければ gzip で圧縮する
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ZSTD_SUFFIX = ".html.zst"
+GZIP_SUFFIX = ".html.gz"
+
+# 再抽出時にページ内のスクリプトを実行させないため、<script> 要素は取り除いて表示する
+_SCRIPT_TAG_RE = re.compile(r"<script\b[^>]*>.*?</script\s*>", re.IGNORECASE | re.DOTALL)
+_HEAD_TAG_RE = re.compile(r"<head\b[^>]*>", re.IGNORECASE)
+
+
+class HtmlArchive:
+    """SHA-256 をキーとした、圧縮済みHTMLのディスク上のストア"""
+
+    def __init__(self, archive_dir=None):
+        self.archive_dir = Path(archive_dir or settings.RAW_HTML_ARCHIVE_DIR)
+
+    def _path_for(self, sha256: str, suffix: str) -> Path:
+        # 1ディレクトリのファイル数が増えすぎないよう、先頭2文字で分ける
+        return self.archive_dir / sha256[:2] / f"{sha256}{suffix}"
+
+    def find(self, sha256: str):
+        """保存済みファイルのパスを返す。存在しない場合は None。"""
+        for suffix in (ZSTD_SUFFIX, GZIP_SUFFIX):
+            path = self._path_for(sha256, suffix)
+            if path.exists():
+                return path
+        return None
+
+    def put(self, html: str):
+        """
+        HTMLを保存し、(SHA-256, 圧縮前のバイト数) を返す。
+        同じ内容が保存済みの場合は書き込みを行わない。
+        """
+        data = html.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        if self.find(sha256) is not None:
+            return sha256, len(data)
+
+        if zstandard is not None:
+            compressed = zstandard.ZstdCompressor(level=10).compress(data)
+            path = self._path_for(sha256, ZSTD_SUFFIX)
+        else:
+            compressed = gzip.compress(data, compresslevel=6)
+            path = self._path_for(sha256, GZIP_SUFFIX)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(compressed)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return sha256, len(data)
+
+    def get(self, sha256: str) -> str:
+        """保存済みのHTMLを展開して返す。"""
+        path = self.find(sha256)
+        if path is None:
+            raise FileNotFoundError(f"アーカイブにHTMLがありません: {sha256}")
+        compressed = path.read_bytes()
+        if path.name.endswith(ZSTD_SUFFIX):
+            if zstandard is None:
+                raise RuntimeError(
+                    "zstd で圧縮されたアーカイブの展開には zstandard が必要です。"
+                )
+            data = zstandard.ZstdDecompressor().decompress(compressed)
+        else:
+            data = gzip.decompress(compressed)
+        return data.decode("utf-8")
+
+
+html_archive = HtmlArchive()
+
+
+class PageRecorder:
+    """
+    1回のクロール実行中に取得したページを記録する。
+    HTMLはその場でアーカイブに書き込み、ArchivedPage は実行終了時にまとめて保存する。
+    """
+
+    def __init__(self, crawl_target, archive=None):
+        self.crawl_target = crawl_target
+        self.archive = archive or html_archive
+        self.pages = []
+
+    def add(self, html, page_number, kind, url=""):
+        sha256, size = self.archive.put(html)
+        self.pages.append(
+            ArchivedPage(
+                crawl_target=self.crawl_target,
+                page_number=page_number,
+                kind=kind,
+                url=url[:2000],
+                content_sha256=sha256,
+                size=size,
+                fetched_at=timezone.now(),
+            )
+        )
+
+    def save(self, crawl_run=None):
+        for page in self.pages:
+            page.crawl_run = crawl_run
+        ArchivedPage.objects.bulk_create(self.pages)
+        return len(self.pages)
+
+
+_current_recorder = contextvars.ContextVar("page_recorder", default=None)
+
+
+@contextmanager
+def start_page_archive(crawl_target):
+    """
+    このコンテキスト内 (同じスレッド) で archive_page() を有効にする。
+    RAW_HTML_ARCHIVE_ENABLED が False の場合は None を返し、何も記録しない。
+    """
+    if not settings.RAW_HTML_ARCHIVE_ENABLED:
+        yield None
+        return
+    recorder = PageRecorder(crawl_target)
+    token = _current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current_recorder.reset(token)
+
+
+def archive_page(driver, page_number, kind=ArchivedPage.PageKind.LIST, url=None):
+    """
+    ブラウザで表示中のページのHTML (DOMの現在の状態) をアーカイブする。
+    url を省略した場合は現在のURLを記録する。
+    アーカイブが無効な場合や、クロール外から呼ばれた場合は何もしない。
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return
+    with phase(ARCHIVE):
+        try:
+            recorder.add(
+                driver.page_source, page_number, kind, url or driver.current_url
+            )
+        except Exception as e:
+            # アーカイブの失敗でクロールを止めない
+            logger.warning(f"ページのアーカイブに失敗しました: {e}")
+
+
+@contextmanager
+def offline_browser():
+    """
+    再抽出用のヘッドレスChromeを起動する。
+    全てのホスト名の名前解決を失敗させるため、外部へは一切通信しない。
+    """
+    import undetected_chromedriver as uc
+
+    options = uc.ChromeOptions()
+    options.add_argument("--lang=ja-JP")
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--host-resolver-rules=MAP * ~NOTFOUND")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    driver = uc.Chrome(options=options)
+    work_dir = tempfile.TemporaryDirectory(prefix="reextract_")
+    driver.archive_work_dir = work_dir.name
+    try:
+        yield driver
+    finally:
+        driver.quit()
+        work_dir.cleanup()
+
+
+def open_archived_page(driver, archived_page):
+    """offline_browser() で起動したブラウザに、アーカイブ済みのページを表示する。"""
+    # <base> にページごとのURLを入れるため、ファイルはページ単位で作成する
+    path = Path(driver.archive_work_dir) / f"page_{archived_page.pk}.html"
+    if not path.exists():
+        html = _SCRIPT_TAG_RE.sub("", html_archive.get(archived_page.content_sha256))
+        if archived_page.url:
+            # 相対リンクの href が取得時と同じURLに解決されるようにする
+            base_tag = f'<base href="{escape(archived_page.url)}">'
+            match = _HEAD_TAG_RE.search(html)
+            if match:
+                html = html[: match.end()] + base_tag + html[match.end() :]
+            else:
+                html = base_tag + html
+        path.write_text(html, encoding="utf-8")
+    driver.get(path.as_uri())
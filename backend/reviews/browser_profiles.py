@@ -0,0 +1,318 @@
+"""
+OTAごとの永続的なChromeプロファイル。
+
+クローラーは毎回まっさらなプロファイルでChromeを起動していたため、Cookie同意の
+バナーが毎回表示され、静的ファイルも毎回ダウンロードし直していた。
+CHROME_PROFILE_DIR/<OTA>/<スロット番号>/ を user-data-dir として使い回すことで、
+同意済みのCookieとHTTPディスクキャッシュを次回の実行に引き継ぐ。
+
+1つのプロファイルを複数のChromeで同時に使うと壊れるため、プロファイルごとの
+ロックファイルを fcntl.flock で排他ロックしてから使う。同じOTAのクロールが同時に
+実行された場合は、空いている次のスロットのプロファイルを使う。全てのスロットが
+使用中の場合は、従来どおり一時的なプロファイルで起動する。
+プロファイルが壊れた場合は reset_chrome_profiles コマンドで削除できる。
+
+複数のホテルを続けてクロールする場合は browser_session() の中で実行すると、
+同じOTAのChromeを1つだけ起動して使い回す (起動と初回アクセスの準備を繰り返さない)。
+"""
+import contextvars
+import copy
+import fcntl
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from .remote_webdriver import start_remote_chrome
+from .tracing import BROWSER_LAUNCH, phase
+
+logger = logging.getLogger(__name__)
+
+# 異常終了したChromeが残す、プロファイルの使用中を示すファイル
+_CHROME_SINGLETON_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie")
+
+# 使用済みのプロファイルでは、同意バナーやポップアップの表示を待つ時間をこの秒数に短縮する
+WARM_PROFILE_DIALOG_TIMEOUT = 2
+
+
+class ChromeProfile:
+    """ロックを取得したプロファイル1つ分"""
+
+    def __init__(self, ota_key, slot, path, lock_file):
+        self.ota_key = ota_key
+        self.slot = slot
+        self.path = path
+        self._lock_file = lock_file
+        # 一度でもChromeが使ったプロファイルか (Cookieやキャッシュが残っているか)
+        self.is_warm = (path / "Default").is_dir()
+
+    def release(self):
+        if self._lock_file is None:
+            return
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+        self._lock_file = None
+
+    def __repr__(self):
+        return f"<ChromeProfile: {self.ota_key}/{self.slot}>"
+
+
+def profile_root(ota_key=None):
+    root = Path(settings.CHROME_PROFILE_DIR)
+    return root / ota_key if ota_key else root
+
+
+def _try_lock(lock_path):
+    """ロックファイルを排他ロックする。他のプロセスが使用中なら None を返す。"""
+    lock_file = open(lock_path, "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+def acquire_profile(ota_key):
+    """
+    OTAのプロファイルのうち、使用中でない最初のスロットをロックして返す。
+    永続プロファイルが無効な場合や、全てのスロットが使用中の場合は None。
+    """
+    if not settings.CHROME_PROFILES_ENABLED:
+        return None
+    root = profile_root(ota_key)
+    root.mkdir(parents=True, exist_ok=True)
+    for slot in range(settings.CHROME_PROFILE_SLOTS):
+        lock_file = _try_lock(root / f"{slot}.lock")
+        if lock_file is None:
+            continue
+        path = root / str(slot)
+        path.mkdir(exist_ok=True)
+        # ロックを持っているので、残っているファイルは異常終了したChromeのもの
+        for name in _CHROME_SINGLETON_FILES:
+            try:
+                os.unlink(path / name)
+            except FileNotFoundError:
+                pass
+        return ChromeProfile(ota_key, slot, path, lock_file)
+    logger.warning(
+        f"{ota_key} のChromeプロファイルが全て使用中のため、一時プロファイルで起動します。"
+    )
+    return None
+
+
+class BrowserSession:
+    """
+    複数のクロールで同じChromeを使い回すためのセッション。
+    セッション内の launch_chrome() は、同じOTAのChromeが起動済みであればそれを返す。
+    クローラーが最後に呼ぶ driver.quit() はセッション内では何もせず、
+    セッションの終了時にまとめてChromeを終了する。
+    """
+
+    def __init__(self):
+        # OTAのキー -> (ドライバー, 本来の quit)
+        self._drivers = {}
+
+    def get(self, ota_key):
+        """起動済みのChromeを返す。終了していた場合は None。"""
+        entry = self._drivers.get(ota_key)
+        if entry is None:
+            return None
+        driver, _ = entry
+        try:
+            # 前のクロールのページ (スクリプトの状態やDOM) を破棄しておく
+            driver.get("about:blank")
+        except Exception as e:
+            logger.warning(f"{ota_key} のChromeが応答しないため、起動し直します: {e}")
+            self._quit(ota_key)
+            return None
+        from .browser_watchdog import chrome_rss_bytes
+
+        rss = chrome_rss_bytes(driver)
+        max_rss_mb = settings.CHROME_MAX_RSS_MB
+        if max_rss_mb and rss is not None and rss >= max_rss_mb * 1024 * 1024:
+            logger.info(
+                f"{ota_key} のChromeのメモリ使用量が上限を超えたため、起動し直します。"
+                f"({rss // (1024 * 1024)}MB)"
+            )
+            self._quit(ota_key)
+            return None
+        if driver.chrome_profile is not None:
+            # 同じセッションで一度使ったプロファイルには、同意済みのCookieが残っている
+            driver.chrome_profile.is_warm = True
+        return driver
+
+    def add(self, ota_key, driver):
+        self._drivers[ota_key] = (driver, driver.quit)
+        driver.quit = lambda: None
+
+    def discard(self, driver):
+        """セッションで使い回しているドライバーであれば、終了してセッションから外す。"""
+        for ota_key, (session_driver, _) in list(self._drivers.items()):
+            if session_driver is driver:
+                self._quit(ota_key)
+                return True
+        return False
+
+    def _quit(self, ota_key):
+        _, quit = self._drivers.pop(ota_key)
+        try:
+            quit()
+        except Exception as e:
+            logger.warning(f"{ota_key} のChromeの終了に失敗しました: {e}")
+
+    def close(self):
+        for ota_key in list(self._drivers):
+            self._quit(ota_key)
+
+
+_current_session = contextvars.ContextVar("browser_session", default=None)
+
+
+@contextmanager
+def browser_session():
+    """
+    この中で起動したChromeを、OTAごとに使い回すセッションを開始する。
+    セッションはスレッド (コンテキスト) ごとに独立している。
+    """
+    session = BrowserSession()
+    token = _current_session.set(session)
+    try:
+        yield session
+    finally:
+        _current_session.reset(token)
+        session.close()
+
+
+def launch_chrome(ota_key, options, **kwargs):
+    """
+    OTAの永続プロファイルを使って undetected_chromedriver のChromeを起動する。
+    プロファイルのロックは driver.quit() で解放される。使用したプロファイルは
+    driver.chrome_profile で参照できる (一時プロファイルの場合は None)。
+    browser_session() の中では、起動済みの同じOTAのChromeがあればそれを返す。
+    settings.SELENIUM_REMOTE_URLS が設定されている場合は、ローカルではなく
+    Remote WebDriver のエンドポイントでChromeを起動する (kwargs は使わない)。
+    """
+    import undetected_chromedriver as uc
+
+    session = _current_session.get()
+    if session is not None:
+        driver = session.get(ota_key)
+        if driver is not None:
+            logger.info(f"起動済みの {ota_key} のChromeを再利用します。")
+            return driver
+
+    if settings.SELENIUM_REMOTE_URLS:
+        # Remote WebDriver のノードで起動する (プロファイルはノード側のため使わない)
+        with phase(BROWSER_LAUNCH):
+            driver = start_remote_chrome(options)
+        driver.chrome_profile = None
+        if session is not None:
+            session.add(ota_key, driver)
+        return driver
+
+    profile = acquire_profile(ota_key)
+    # uc.Chrome は一度渡した ChromeOptions を再利用できない (RuntimeError) ため、
+    # 一時プロファイルで起動し直す場合に備えて、起動前の状態を複製しておく
+    fallback_options = copy.deepcopy(options) if profile is not None else None
+    try:
+        with phase(BROWSER_LAUNCH):
+            if profile is None:
+                driver = uc.Chrome(options=options, **kwargs)
+            else:
+                driver = uc.Chrome(
+                    options=options, user_data_dir=str(profile.path), **kwargs
+                )
+    except Exception as e:
+        if profile is None:
+            raise
+        # プロファイルが壊れている可能性があるため、一時プロファイルで起動し直す
+        profile.release()
+        logger.warning(
+            f"Chromeプロファイル {profile.path} で起動できませんでした ({e})。"
+            "一時プロファイルで起動します。解消しない場合は reset_chrome_profiles を実行してください。"
+        )
+        profile = None
+        with phase(BROWSER_LAUNCH):
+            driver = uc.Chrome(options=fallback_options, **kwargs)
+
+    driver.chrome_profile = profile
+    if profile is not None:
+        original_quit = driver.quit
+
+        def quit():
+            try:
+                original_quit()
+            finally:
+                profile.release()
+
+        driver.quit = quit
+    if session is not None:
+        session.add(ota_key, driver)
+    return driver
+
+
+def relaunch_chrome(driver, ota_key, options, **kwargs):
+    """
+    driver を終了し、同じOTAのChromeを起動し直して返す。
+    browser_session() の中で使い回しているドライバーも、実際に終了する。
+    """
+    session = _current_session.get()
+    if session is None or not session.discard(driver):
+        quit_chrome(driver)
+    return launch_chrome(ota_key, options, **kwargs)
+
+
+def quit_chrome(driver):
+    """
+    launch_chrome() で起動したChromeを終了する。既に終了している場合は何もしない
+    (Remote WebDriver のドライバーには service が無いため、終了済みかは例外で判定する)。
+    """
+    try:
+        driver.quit()
+    except Exception as e:
+        logger.debug(f"Chromeは既に終了しています: {e}")
+
+
+def dialog_timeout(driver, default):
+    """
+    Cookie同意バナー等の表示を待つ秒数。使用済みのプロファイルでは同意が
+    保存されていて表示されないことが多いため、待ち時間を短くする。
+    """
+    profile = getattr(driver, "chrome_profile", None)
+    if profile is not None and profile.is_warm:
+        return min(default, WARM_PROFILE_DIALOG_TIMEOUT)
+    return default
+
+
+def reset_profiles(ota_keys=None):
+    """
+    プロファイルを削除する。使用中 (ロック中) のプロファイルは削除しない。
+    Returns:
+        tuple: (削除したプロファイルのリスト, 使用中でスキップしたプロファイルのリスト)
+    """
+    root = profile_root()
+    if not root.is_dir():
+        return [], []
+    if ota_keys is None:
+        ota_dirs = [path for path in root.iterdir() if path.is_dir()]
+    else:
+        ota_dirs = [root / ota_key for ota_key in ota_keys if (root / ota_key).is_dir()]
+
+    removed, busy = [], []
+    for ota_dir in ota_dirs:
+        for path in sorted(p for p in ota_dir.iterdir() if p.is_dir()):
+            lock_file = _try_lock(ota_dir / f"{path.name}.lock")
+            if lock_file is None:
+                busy.append(path)
+                continue
+            try:
+                shutil.rmtree(path)
+                removed.append(path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+    return removed, busy
@@ -0,0 +1,174 @@
+"""
+Chromeのメモリ使用量の監視と、ページの切り替わり時の再起動。
+
+口コミの多いホテルでは1つのChromeが数時間動き続け、メモリ (RSS) が増え続ける。
+BrowserWatchdog はページごとに Chrome のプロセスツリー (ブラウザ本体・レンダラー・
+chromedriver) の RSS の合計を取得し (psutil があれば psutil、無ければ /proc から)、
+上限 (CHROME_MAX_RSS_MB) を超えた場合や、起動してからのページ数が
+CHROME_RECYCLE_PAGES に達した場合に、Chromeを起動し直して同じURLを開き直す。
+
+ページ番号がURLに反映されるOTA (楽天トラベル, じゃらん) のページの切り替わりで使う。
+「さらに表示」やスクロールで読み込む形式のOTAは開き直すと最初からになるため対象外
+(取り出し済みの口コミをプレースホルダーに置き換えて、DOMの増加を抑えている)。
+Remote WebDriver のChromeはプロセスを参照できないため、ページ数だけで判定する。
+"""
+import logging
+import os
+
+from django.conf import settings
+
+from .browser_profiles import relaunch_chrome
+from .metrics import instrument_webdriver
+from .tracing import BROWSER_RECYCLES, NAVIGATION, count, phase
+
+try:
+    import psutil
+except ImportError:  # psutil が無い環境では /proc を直接読む
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+
+def _root_pids(driver):
+    """Chromeのプロセスツリーの起点となるプロセスID (ブラウザ本体と chromedriver)"""
+    pids = []
+    # undetected_chromedriver はブラウザ本体を自分で起動し、その PID を持っている
+    browser_pid = getattr(driver, "browser_pid", None)
+    if browser_pid:
+        pids.append(browser_pid)
+    process = getattr(getattr(driver, "service", None), "process", None)
+    if process is not None and process.pid:
+        pids.append(process.pid)
+    return pids
+
+
+def _proc_tree_rss(root_pids):
+    """/proc からプロセスツリーの RSS の合計 (バイト) を求める。"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # コマンド名に空白や括弧が含まれても良いように、最後の ")" の後ろを分割する
+        ppid = int(stat[stat.rfind(")") + 2 :].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+
+    total, seen, stack = 0, set(), list(root_pids)
+    while stack:
+        pid = stack.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+        stack.extend(children.get(pid, []))
+    return total
+
+
+def _psutil_tree_rss(root_pids):
+    """psutil でプロセスツリーの RSS の合計 (バイト) を求める。"""
+    processes = {}
+    for pid in root_pids:
+        try:
+            root = psutil.Process(pid)
+            for process in [root] + root.children(recursive=True):
+                processes[process.pid] = process
+        except psutil.Error:
+            continue
+    total = 0
+    for process in processes.values():
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return total
+
+
+def chrome_rss_bytes(driver):
+    """
+    Chromeのプロセスツリーの RSS の合計 (バイト)。プロセスを参照できない場合
+    (Remote WebDriver など) は None。共有メモリは重複して数えるため、実際より大きめになる。
+    """
+    root_pids = _root_pids(driver)
+    if not root_pids:
+        return None
+    if psutil is not None:
+        return _psutil_tree_rss(root_pids)
+    if os.path.isdir("/proc"):
+        return _proc_tree_rss(root_pids)
+    return None
+
+
+class BrowserWatchdog:
+    """
+    ページの切り替わりごとに after_page() を呼び、必要であればChromeを起動し直す。
+    起動し直したChromeには、元のウィンドウサイズと (一時プロファイルの場合は) Cookieを引き継ぐ。
+    undetected_chromedriver は一度使った ChromeOptions で起動できないため、
+    options_factory (新しい ChromeOptions を返す関数) で起動のたびに作り直す。
+    """
+
+    def __init__(self, ota_key, options_factory, max_rss_mb=None, max_pages=None, **launch_kwargs):
+        self.ota_key = ota_key
+        self.options_factory = options_factory
+        self.launch_kwargs = launch_kwargs
+        self.max_rss_bytes = (
+            max_rss_mb if max_rss_mb is not None else settings.CHROME_MAX_RSS_MB
+        ) * 1024 * 1024
+        self.max_pages = (
+            max_pages if max_pages is not None else settings.CHROME_RECYCLE_PAGES
+        )
+        self.pages = 0
+
+    def recycle_reason(self, driver):
+        """再起動が必要な理由。不要な場合は None。"""
+        if self.max_pages and self.pages >= self.max_pages:
+            return f"起動してから{self.pages}ページを処理しました"
+        if self.max_rss_bytes:
+            rss = chrome_rss_bytes(driver)
+            if rss is not None and rss >= self.max_rss_bytes:
+                return f"メモリ使用量が上限を超えました ({rss // (1024 * 1024)}MB)"
+        return None
+
+    def after_page(self, driver):
+        """
+        次のページに遷移した直後に呼び出す。再起動した場合は、同じURLを開き直した
+        新しいドライバーを返す。それ以外は driver をそのまま返す。
+        """
+        self.pages += 1
+        reason = self.recycle_reason(driver)
+        if reason is None:
+            return driver
+
+        url = driver.current_url
+        window_size = driver.get_window_size()
+        cookies = driver.get_cookies()
+        logger.info(f"{reason}。Chromeを起動し直して {url} から再開します。")
+
+        new_driver = relaunch_chrome(
+            driver, self.ota_key, self.options_factory(), **self.launch_kwargs
+        )
+        instrument_webdriver(new_driver)
+        new_driver.set_window_size(window_size["width"], window_size["height"])
+        with phase(NAVIGATION):
+            new_driver.get(url)
+            if getattr(new_driver, "chrome_profile", None) is None and cookies:
+                # 一時プロファイルでは Cookie (並び順やセッション) が失われるため引き継ぐ
+                for cookie in cookies:
+                    try:
+                        new_driver.add_cookie(cookie)
+                    except Exception as e:
+                        logger.debug(f"Cookieを引き継げませんでした ({cookie.get('name')}): {e}")
+                new_driver.get(url)
+        count(BROWSER_RECYCLES)
+        self.pages = 0
+        return new_driver
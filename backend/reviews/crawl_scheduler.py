@@ -0,0 +1,180 @@
+"""
+クロール対象の実行計画と実行。
+
+CrawlTarget ごとに、登録されたクローラーの特性 (CrawlerCapabilities) から
+実行方法を決める。HTTPだけで取得できるOTAはブラウザを起動せずに実行し、
+ブラウザが必要なOTAはブラウザの同時起動数 (settings.CRAWL_MAX_BROWSERS) の範囲で
+実行する。同じOTAへの同時実行数はクローラーの max_concurrency までに制限する。
+時間のかかる対象から順に開始し、全体の所要時間が最後の1件で延びないようにする。
+
+多数のホテルをまとめてクロールする場合は、OTAごとにジョブをまとめて1つのブラウザの
+セッションで順番に実行できる (ホテルごとにブラウザを起動し直さない)。
+"""
+import logging
+import queue
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import connections
+
+from .browser_profiles import browser_session
+from .crawler_registry import BaseCrawler, CrawlerCapabilities, get_crawler
+
+logger = logging.getLogger(__name__)
+
+# 実行方法
+HTTP = "http"
+BROWSER = "browser"
+
+# ワーカーが実行単位を終えたことを run_crawl_plan に知らせる印
+_UNIT_DONE = object()
+
+
+@dataclass
+class CrawlJob:
+    target: object  # CrawlTarget
+    crawler: BaseCrawler
+    strategy: str
+    cost: int
+
+
+def choose_strategy(capabilities: CrawlerCapabilities):
+    """ブラウザを使わずに取得できる場合は HTTP、それ以外は BROWSER"""
+    if capabilities.http_fetch and not capabilities.needs_browser:
+        return HTTP
+    return BROWSER
+
+
+def estimate_cost(capabilities: CrawlerCapabilities):
+    """
+    1件のクロールにかかる負荷の相対的な目安。
+    ブラウザの起動、詳細ページの巡回、「さらに表示」形式の読み込み、
+    ヘッドレスで実行できないことをそれぞれ加算する。
+    """
+    cost = 1
+    if choose_strategy(capabilities) == BROWSER:
+        cost += 2
+    if capabilities.detail_pages:
+        cost += 2
+    if not capabilities.direct_pagination:
+        cost += 1
+    if not capabilities.headless:
+        cost += 1
+    return cost
+
+
+def plan_crawl(targets):
+    """
+    クロール対象から実行計画 (CrawlJob のリスト) を作る。
+    クローラーが登録されていないOTAの対象は計画に含めず、2つ目の戻り値で返す。
+    """
+    jobs, unsupported = [], []
+    for target in targets:
+        crawler = get_crawler(target.ota.name)
+        if crawler is None:
+            unsupported.append(target)
+            continue
+        capabilities = crawler.capabilities
+        jobs.append(
+            CrawlJob(
+                target=target,
+                crawler=crawler,
+                strategy=choose_strategy(capabilities),
+                cost=estimate_cost(capabilities),
+            )
+        )
+    # 負荷の大きい対象から開始する (同じ負荷の中では元の順序を保つ)
+    jobs.sort(key=lambda job: job.cost, reverse=True)
+    return jobs, unsupported
+
+
+def run_crawl_plan(jobs, run_job, max_browsers=None, max_http=None, group_by_ota=False):
+    """
+    実行計画の各ジョブに対して run_job(job) を実行し、(job, 戻り値または例外) を
+    完了した順に返すジェネレーター。run_job はワーカースレッドで呼び出される。
+    group_by_ota=True の場合は、同じOTAのジョブを1つのワーカーで順番に実行し、
+    browser_session() で1つのChromeを全てのジョブで使い回す。
+
+    ジョブの開始はこのジェネレーター (呼び出し元のスレッド) が行い、OTAの同時実行数と
+    ブラウザ (またはHTTP) の同時実行数の両方に空きがあるものだけをワーカーに渡す。
+    同時実行数の上限に達しているOTAのジョブは後回しにし、計画の順で次のジョブを開始する
+    (ワーカーがOTAの空きを待って止まり、他のOTAのジョブが待たされることはない)。
+    """
+    max_browsers = max(1, max_browsers or settings.CRAWL_MAX_BROWSERS)
+    max_http = max(1, max_http or settings.CRAWL_MAX_HTTP_WORKERS)
+    if not jobs:
+        return
+
+    if group_by_ota:
+        groups = {}
+        for job in jobs:
+            groups.setdefault(job.crawler.ota_name, []).append(job)
+        # 合計の負荷が大きいOTAから開始する
+        units = sorted(
+            groups.values(), key=lambda unit: sum(job.cost for job in unit), reverse=True
+        )
+    else:
+        units = [[job] for job in jobs]
+
+    strategy_limits = {BROWSER: max_browsers, HTTP: max_http}
+    ota_limits = {
+        job.crawler.ota_name: max(1, job.crawler.capabilities.max_concurrency)
+        for job in jobs
+    }
+    running_by_strategy = Counter()
+    running_by_ota = Counter()
+    # ワーカーからの通知 (job, 結果) と、単位の終了 (_UNIT_DONE, unit)
+    events = queue.Queue()
+
+    def worker(unit):
+        try:
+            with browser_session() if group_by_ota else nullcontext():
+                for job in unit:
+                    try:
+                        events.put((job, run_job(job)))
+                    except Exception as e:
+                        events.put((job, e))
+        finally:
+            # ワーカースレッドで開いたDB接続を閉じる
+            connections.close_all()
+            events.put((_UNIT_DONE, unit))
+
+    def can_start(unit):
+        first = unit[0]
+        return (
+            running_by_ota[first.crawler.ota_name] < ota_limits[first.crawler.ota_name]
+            and running_by_strategy[first.strategy] < strategy_limits[first.strategy]
+        )
+
+    has_http = any(job.strategy == HTTP for job in jobs)
+    max_workers = min(len(units), max_browsers + (max_http if has_http else 0))
+    logger.info(
+        "クロールを開始します。対象: %d件 (%d単位), ブラウザの同時起動数: %d, ワーカー数: %d",
+        len(jobs),
+        len(units),
+        max_browsers,
+        max_workers,
+    )
+    pending = list(units)
+    running_units = 0
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crawl") as executor:
+        while pending or running_units:
+            for unit in list(pending):
+                if not can_start(unit):
+                    continue
+                pending.remove(unit)
+                running_by_ota[unit[0].crawler.ota_name] += 1
+                running_by_strategy[unit[0].strategy] += 1
+                running_units += 1
+                executor.submit(worker, unit)
+
+            job, result = events.get()
+            if job is _UNIT_DONE:
+                running_by_ota[result[0].crawler.ota_name] -= 1
+                running_by_strategy[result[0].strategy] -= 1
+                running_units -= 1
+                continue
+            yield job, result
@@ -0,0 +1,86 @@
+from collections import defaultdict
+from statistics import median
+
+# スループットの指標名 (CrawlRun 1件ごとに算出する)
+THROUGHPUT_METRICS = ("reviews_per_minute", "pages_per_minute")
+
+
+def run_throughput(run):
+    """
+    CrawlRun の値の辞書から、1分あたりの口コミ数・ページ数を算出する。
+    口コミが0件の実行は期間内に口コミが無かっただけの可能性があるため、
+    口コミ数の指標は None とする。
+    """
+    duration = run["duration_seconds"]
+    if not duration:
+        return {metric: None for metric in THROUGHPUT_METRICS}
+    return {
+        "reviews_per_minute": (
+            round(run["reviews_seen"] * 60 / duration, 2) if run["reviews_seen"] else None
+        ),
+        "pages_per_minute": (
+            round(run["pages_visited"] * 60 / duration, 2)
+            if run["pages_visited"]
+            else None
+        ),
+    }
+
+
+def _median(values):
+    values = [value for value in values if value is not None]
+    return round(median(values), 2) if values else None
+
+
+def detect_regression(points, recent_size, threshold):
+    """
+    開始日時順の実行ごとの指標から、直近 recent_size 件の中央値と、それより前の実行
+    (基準期間) の中央値を比較する。いずれかの指標が threshold の割合以上
+    低下していれば回帰とみなす。
+    """
+    recent, baseline = points[-recent_size:], points[:-recent_size]
+    result = {"regression": False}
+    for metric in THROUGHPUT_METRICS:
+        baseline_value = _median(point[metric] for point in baseline)
+        recent_value = _median(point[metric] for point in recent)
+        change_ratio = None
+        if baseline_value and recent_value is not None:
+            change_ratio = round(recent_value / baseline_value - 1, 3)
+            if change_ratio <= -threshold:
+                result["regression"] = True
+        result[metric] = {
+            "baseline": baseline_value,
+            "recent": recent_value,
+            "change_ratio": change_ratio,
+        }
+    return result
+
+
+def build_throughput_trends(runs, recent_size=5, threshold=0.3):
+    """
+    (ota_id, started_at) 順に並んだ CrawlRun の値の辞書から、OTAごとの
+    スループットの推移と回帰判定を組み立てる。
+    """
+    runs_by_ota = defaultdict(list)
+    ota_names = {}
+    for run in runs:
+        ota_names[run["ota_id"]] = run["ota__name"]
+        runs_by_ota[run["ota_id"]].append(
+            {
+                "id": run["id"],
+                "hotel_name": run["crawl_target__hotel__name"],
+                "started_at": run["started_at"],
+                "duration_seconds": run["duration_seconds"],
+                "browser_seconds": run["browser_seconds"],
+                "pages_visited": run["pages_visited"],
+                "reviews_seen": run["reviews_seen"],
+                "bytes_downloaded": run["bytes_downloaded"],
+                **run_throughput(run),
+            }
+        )
+
+    results = []
+    for ota_id, points in runs_by_ota.items():
+        trend = {"ota_id": ota_id, "ota_name": ota_names[ota_id], "runs": points}
+        trend.update(detect_regression(points, recent_size, threshold))
+        results.append(trend)
+    return results
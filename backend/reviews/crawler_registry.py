@@ -0,0 +1,119 @@
+"""
+OTAごとのクローラーの登録簿。
+
+各OTAのクローラーは BaseCrawler のサブクラスとして @register で登録し、
+取得方法の特性 (CrawlerCapabilities) を宣言する。スケジューラー (crawl_scheduler) は
+この特性を見て、OTAごとに最も負荷の低い実行方法を選ぶ。
+
+クローラーのモジュールは selenium や undetected_chromedriver を読み込むため、
+Webサーバーや管理コマンドの起動時には import せず、収集関数はパスで持っておき
+クロールを実行するときに初めて読み込む。
+"""
+from dataclasses import dataclass
+
+from django.utils.module_loading import import_string
+
+
+@dataclass(frozen=True)
+class CrawlerCapabilities:
+    """クローラー (OTAのサイト) の取得方法の特性"""
+
+    # ブラウザを使わず、HTTPリクエストだけで口コミを取得できる
+    http_fetch: bool = False
+    # ページ番号などで任意の一覧ページに直接アクセスできる (「さらに表示」形式でない)
+    direct_pagination: bool = False
+    # ページの描画にブラウザ (Chrome) が必要
+    needs_browser: bool = True
+    # 一覧とは別に、口コミの詳細ページを開く段階がある
+    detail_pages: bool = False
+    # ヘッドレスモードで実行できる
+    headless: bool = True
+    # 同じOTAに対して同時に実行してよいクロールの数の目安
+    max_concurrency: int = 1
+
+
+class BaseCrawler:
+    """
+    OTAのクローラーの基底クラス。
+    サブクラスは ota_name (Ota.name) と scraper_path (収集関数のパス) を定義する。
+    収集関数は scrape(url, hotel_id, start_date_str, end_date_str) の形で呼び出され、
+    口コミデータ (辞書) のリストを返す。
+    """
+
+    ota_name = ""
+    scraper_path = ""
+    capabilities = CrawlerCapabilities()
+
+    def crawl(self, url, hotel_id, start_date_str=None, end_date_str=None):
+        scrape = import_string(self.scraper_path)
+        return scrape(
+            url=url,
+            hotel_id=hotel_id,
+            start_date_str=start_date_str,
+            end_date_str=end_date_str,
+        )
+
+    def __repr__(self):
+        return f"<{type(self).__name__}: {self.ota_name}>"
+
+
+# Ota.name -> クローラーのクラス
+_registry = {}
+
+
+def register(crawler_class):
+    """クローラーのクラスを登録するデコレーター"""
+    if not crawler_class.ota_name:
+        raise ValueError(f"{crawler_class.__name__} に ota_name が定義されていません。")
+    _registry[crawler_class.ota_name] = crawler_class
+    return crawler_class
+
+
+def get_crawler(ota_name):
+    """OTA名に対応するクローラーを返す。未登録の場合は None。"""
+    crawler_class = _registry.get(ota_name)
+    return crawler_class() if crawler_class else None
+
+
+def registered_crawlers():
+    """登録されている全てのクローラーを返す。"""
+    return [crawler_class() for crawler_class in _registry.values()]
+
+
+@register
+class RakutenTravelCrawler(BaseCrawler):
+    ota_name = "楽天トラベル"
+    scraper_path = "reviews.crawlers.rakuten_travel_crawler.scrape_rakuten_travel_reviews"
+    capabilities = CrawlerCapabilities(
+        direct_pagination=True, detail_pages=True, max_concurrency=2
+    )
+
+
+@register
+class JalanCrawler(BaseCrawler):
+    ota_name = "じゃらん"
+    scraper_path = "reviews.crawlers.jalan_crawler.scrape_jalan_reviews"
+    capabilities = CrawlerCapabilities(direct_pagination=True, max_concurrency=2)
+
+
+@register
+class IkyuCrawler(BaseCrawler):
+    ota_name = "一休"
+    scraper_path = "reviews.crawlers.ikyu_crawler.scrape_ikyu_reviews"
+    capabilities = CrawlerCapabilities(max_concurrency=2)
+
+
+@register
+class ExpediaCrawler(BaseCrawler):
+    ota_name = "Expedia"
+    scraper_path = "reviews.crawlers.expedia_crawler.scrape_expedia_reviews"
+    # Expediaはヘッドレスだと実行できず、ボット検知も厳しいため1件ずつ実行する
+    capabilities = CrawlerCapabilities(headless=False, max_concurrency=1)
+
+
+# Googleトラベルは現在クロール対象外
+# @register
+class GoogleTravelCrawler(BaseCrawler):
+    ota_name = "Googleトラベル"
+    scraper_path = "reviews.crawlers.google_travel_crawler.scrape_google_travel_reviews"
+    capabilities = CrawlerCapabilities(headless=False, max_concurrency=1)
@@ -1,23 +1,80 @@
-import time
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support.ui import Select
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import undetected_chromedriver as uc
 from datetime import datetime, date
 import logging
 from selenium import webdriver
+from ..archive import archive_page
+from ..browser_profiles import dialog_timeout, launch_chrome
 from ..normalizer import DataNormalizer
-from reviews.utils import detect_language, get_language_name_ja
-
-
-def scrape_expedia_reviews(url, start_date_str: str = None, end_date_str: str = None):
+from ..page_scripts import run_page_script
+from ..logging_utils import get_crawler_logger, log_review
+from ..metrics import instrument_webdriver
+from ..tracing import (
+    EXTRACTION,
+    NAVIGATION,
+    REVIEWS_EXTRACTED,
+    count,
+    count_page,
+    phase,
+    traced,
+    traced_sleep,
+)
+from reviews.utils import annotate_languages
+
+logger = get_crawler_logger("expedia")
+
+# 口コミ1件分の要素
+REVIEW_ITEM_SELECTOR = "div[data-stid^='product-reviews-list-item']"
+# 口コミ本文
+REVIEW_TEXT_SELECTOR = "div.uitk-expando-peek-inner > div.uitk-text"
+
+# 取り出し済みの口コミ要素に付ける属性
+REVIEW_EXTRACTED_ATTRIBUTE = "data-crawl-extracted"
+
+# まだ取り出していない口コミ要素の生の値をまとめて取り出し、取り出し済みの印を付ける。
+# prune が true の場合は、前回取り出した口コミ (アーカイブ済み) を先にプレースホルダーに
+# 置き換える。false の場合 (アーカイブからの再抽出) はプレースホルダー以外の全ての口コミが対象
+_EXTRACT_REVIEWS_SCRIPT = """
+const [itemSelector, textSelector, extractedAttribute, prune] = arguments;
+let selector = `${itemSelector}:not([${PLACEHOLDER_ATTRIBUTE}])`;
+if (prune) {
+    const state = window.__expediaCrawler || (window.__expediaCrawler = {extracted: []});
+    replaceWithPlaceholders(state.extracted.filter((el) => el.isConnected));
+    selector = `${itemSelector}:not([${extractedAttribute}])`;
+}
+const items = Array.from(document.querySelectorAll(selector));
+items.forEach((item) => item.setAttribute(extractedAttribute, ""));
+if (prune) {
+    window.__expediaCrawler.extracted = items;
+}
+return items.map((review) => {
+    const nameElement = review.querySelector("h4");
+    const authorInfo = nameElement ? nameElement.parentElement : null;
+    return {
+        rating: text(review.querySelector("h3.uitk-heading")),
+        reviewer_name: text(nameElement),
+        traveler_type: authorInfo ? text(authorInfo.querySelector("h4 + div")) : null,
+        review_date: authorInfo
+            ? text(xpathFirst(authorInfo, ".//div[contains(text(), '年')]"))
+            : null,
+        review_comment: text(review.querySelector(textSelector)),
+    };
+});
+"""
+
+
+def scrape_expedia_reviews(
+    url, hotel_id: str = None, start_date_str: str = None, end_date_str: str = None
+):
     """
     指定されたExpediaのホテルページから全ての口コミをスクレイピングする関数
 
     url: CrawlするURL。
+    hotel_id: ホテルのslug。他のOTAのクローラーと呼び出し方を揃えるためのもので、使用しない。
     start_date_str: 収集開始日 (YYYY-MM-DD形式の文字列)。この日付より古い口コミが見つかると停止。
     end_date_str: 収集終了日 (YYYY-MM-DD形式の文字列)。この日付より新しい口コミはスキップ。
     """
@@ -38,7 +95,8 @@ def scrape_expedia_reviews(url, start_date_str: str = None, end_date_str: str =
     # service = Service(ChromeDriverManager().install())
     # driver = webdriver.Chrome(options=chrome_options)
     # ブラウザドライバーのセットアップ
-    driver = uc.Chrome(options=chrome_options, version_main=140)
+    driver = launch_chrome("expedia", chrome_options, version_main=140)
+    instrument_webdriver(driver)
     driver.set_window_size(500, 500)
     # 処理が完了するまで最大で待機する時間（秒）
     wait = WebDriverWait(driver, 10)
@@ -48,9 +106,9 @@ def scrape_expedia_reviews(url, start_date_str: str = None, end_date_str: str =
     if start_date_str:
         try:
             start_date_obj = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            print(f"収集開始日を設定: {start_date_obj}")
+            logger.info(f"収集開始日を設定: {start_date_obj}")
         except ValueError:
-            print(
+            logger.warning(
                 f"エラー: 開始日の形式が不正です ('{start_date_str}')。処理を中断します。"
             )
             return []
@@ -59,262 +117,154 @@ def scrape_expedia_reviews(url, start_date_str: str = None, end_date_str: str =
     if end_date_str:
         try:
             end_date_obj = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-            print(f"収集終了日を設定: {end_date_obj}")
+            logger.info(f"収集終了日を設定: {end_date_obj}")
         except ValueError:
-            print(
+            logger.warning(
                 f"エラー: 終了日の形式が不正です ('{end_date_str}')。処理を中断します。"
             )
             return []
 
     all_reviews_data = []
     try:
-        print(f"アクセス中: {url}")
-        driver.get(url)
-        print(f"ページのタイトル: {driver.title}")
+        logger.info(f"アクセス中: {url}")
+        with phase(NAVIGATION):
+            driver.get(url)
+        logger.info(f"ページのタイトル: {driver.title}")
         try:
             # "すべて承諾" ボタン (ID: onetrust-accept-btn-handler) が表示されるまで待つ
-            accept_cookies_button = wait.until(
+            # (同意済みのプロファイルでは表示されないことが多いため、待ち時間を短縮)
+            accept_cookies_button = WebDriverWait(driver, dialog_timeout(driver, 10)).until(
                 EC.element_to_be_clickable((By.ID, "onetrust-accept-btn-handler"))
             )
-            print("Cookie同意ポップアップを検知しました。承諾しています...")
+            logger.info("Cookie同意ポップアップを検知しました。承諾しています...")
             driver.execute_script("arguments[0].click();", accept_cookies_button)
-            print("Cookie同意ポップアップが消えるのを待っています...")
+            logger.info("Cookie同意ポップアップが消えるのを待っています...")
             wait.until(
                 EC.invisibility_of_element_located((By.ID, "onetrust-group-container"))
             )
-            print("ポップアップが消えました。")
+            logger.info("ポップアップが消えました。")
         except TimeoutException:
-            print("Cookie同意ポップアップは表示されませんでした。")
+            logger.info("Cookie同意ポップアップは表示されませんでした。")
 
         # --- 日付選択のポップアップが表示された場合、閉じる ---
         try:
-            # "選択完了"ボタンが表示されるまで少し待つ (最大5秒)
-            close_date_button = WebDriverWait(driver, 5).until(
+            # "選択完了"ボタンが表示されるまで少し待つ (最大5秒, 使用済みのプロファイルでは短縮)
+            close_date_button = WebDriverWait(driver, dialog_timeout(driver, 5)).until(
                 EC.element_to_be_clickable(
                     (By.CSS_SELECTOR, "button[data-stid='apply-date-selector']")
                 )
             )
-            print("日付選択ポップアップを検知しました。閉じています...")
+            logger.info("日付選択ポップアップを検知しました。閉じています...")
             close_date_button.click()
-            time.sleep(1)  # 閉じるアニメーションのための待機
+            traced_sleep(1)  # 閉じるアニメーションのための待機
         except TimeoutException:
-            # 5秒待っても表示されなければ、ポップアップは無いと判断して次に進む
-            print("日付選択ポップアップは表示されませんでした。")
+            # 待っても表示されなければ、ポップアップは無いと判断して次に進む
+            logger.info("日付選択ポップアップは表示されませんでした。")
 
         # "口コミをすべて表示" をクリックしてレビュー表示
         try:
-            print("「口コミをすべて表示」ボタンを探しています...")
+            logger.info("「口コミをすべて表示」ボタンを探しています...")
             show_reviews_button = wait.until(
                 EC.element_to_be_clickable(
                     (By.CSS_SELECTOR, "button[data-stid='reviews-link']")
                 )
             )
-            print("ボタンをクリックして口コミを表示します。")
+            logger.info("ボタンをクリックして口コミを表示します。")
             show_reviews_button.click()
-            time.sleep(2)
+            traced_sleep(2)
         except TimeoutException:
-            print("「口コミをすべて表示」ボタンが表示されませんでした。")
+            logger.info("「口コミをすべて表示」ボタンが表示されませんでした。")
 
         try:
-            print("並び替え用のドロップダウンを探しています...")
+            logger.info("並び替え用のドロップダウンを探しています...")
 
             sort_dropdown_element = wait.until(
                 EC.presence_of_element_located((By.ID, "sortBy"))
             )
-            print("ドロップダウンが見つかりました。")
+            logger.info("ドロップダウンが見つかりました。")
             select_object = Select(sort_dropdown_element)
 
             # 表示されているテキスト「新着順」を指定して選択する
             select_object.select_by_value("urn:expediagroup:taxonomies:filters:reviews:sort_by_date")
 
-            print("並び替えを「新着順」に変更しました。")
+            logger.info("並び替えを「新着順」に変更しました。")
 
             # 並び替えが実行され、レビューリストが再読み込みされるのを待つ
             # time.sleep(3)
 
         except TimeoutException:
-            print("並び替え用のドロップダウンが見つかりませんでした。")
+            logger.info("並び替え用のドロップダウンが見つかりませんでした。")
         except Exception as e:
-            print(f"並び替え中に予期せぬエラーが発生しました: {e}")
+            logger.error(f"並び替え中に予期せぬエラーが発生しました: {e}")
             
         # 口コミモーダルが表示され、最初の口コミが読み込まれるまで待機
-        print("口コミの読み込みを待っています...")
+        logger.info("口コミの読み込みを待っています...")
         wait.until(
-            EC.visibility_of_element_located(
-                (By.CSS_SELECTOR, "div[data-stid^='product-reviews-list-item']")
-            )
+            EC.visibility_of_element_located((By.CSS_SELECTOR, REVIEW_ITEM_SELECTOR))
         )
-        time.sleep(5)  # レンダリングの安定化のため少し待機
+        traced_sleep(5)  # レンダリングの安定化のため少し待機
 
         # ループで「さらに表示」を押し続け、全口コミを取得
         processed_reviews_count = 0
+        page_count = 1
         stop_crawling = False
 
         while not stop_crawling:
-            # 現在表示されている口コミの親要素を全て取得
-            review_elements = driver.find_elements(
-                By.CSS_SELECTOR, "div[data-stid^='product-reviews-list-item']"
-            )
-            # 新しく読み込まれた口コミだけを処理対象にする
-            new_reviews = review_elements[processed_reviews_count:]
+            count_page(driver)
+            # 新しく読み込まれた口コミだけを、1回のスクリプト実行でまとめて取り出す。
+            # 前回までの口コミはプレースホルダーに置き換え、DOMが増え続けないようにする
+            new_reviews = extract_page_reviews(driver, prune=True)
             if not new_reviews:
-                print("新しい口コミが見つかりませんでした。5秒後に再試行します...")
-                time.sleep(5)  # 念のための待機
-                review_elements = driver.find_elements(
-                    By.CSS_SELECTOR, "div[data-stid^='product-reviews-list-item']"
-                )
-                new_reviews = review_elements[processed_reviews_count:]
+                logger.info("新しい口コミが見つかりませんでした。5秒後に再試行します...")
+                traced_sleep(5)  # 念のための待機
+                new_reviews = extract_page_reviews(driver, prune=True)
                 if not new_reviews:
-                    print("再試行しても新しい口コミがありません。処理を終了します。")
+                    logger.info("再試行しても新しい口コミがありません。処理を終了します。")
                     break
 
-            print(
-                f"新たに {len(new_reviews)} 件の口コミを処理します... (合計: {len(review_elements)}件)"
+            processed_reviews_count += len(new_reviews)
+            logger.info(
+                f"新たに {len(new_reviews)} 件の口コミを処理します... (合計: {processed_reviews_count}件)"
             )
 
-            for review in new_reviews:
-                try:
-                    # 評価 (例: "8/10 良い" -> "8")
-                    rating_text = review.find_element(
-                        By.CSS_SELECTOR, "h3.uitk-heading"
-                    ).text
-                    overall_score = rating_text.split("/")[0]
-
-                    # 投稿者と投稿日
-                    author_info = review.find_element(
-                        By.XPATH, ".//h4/.."
-                    )  # h4タグの親要素を取得
-                    reviewer_name = author_info.find_element(By.TAG_NAME, "h4").text
-                    # 旅行者タイプ
-                    original_traveler_type = ""
-                    try:
-                        traveler_type_element = author_info.find_element(
-                            By.CSS_SELECTOR, "h4 + div"
-                        )
-                        # 日付と区別するため、テキストに「年」が含まれていないことを確認
-                        if "年" not in traveler_type_element.text:
-                            original_traveler_type = traveler_type_element.text
-                    except NoSuchElementException:
-                        print("  -> 旅行者タイプの項目は見つかりませんでした。")
-
-                    normalized_data = normalizer.normalize_from_tags(
-                        original_traveler_type, "expedia"
-                    )
-
-                    review_date_str = author_info.find_element(
-                        By.XPATH, ".//div[contains(text(), '年')]"
-                    ).text
-                    review_datetime_obj = datetime.strptime(
-                        review_date_str, "%Y 年 %m 月 %d 日"
+            archive_page(driver, page_count)
+
+            chunk_reviews = []
+            for raw_review in new_reviews:
+                review_data = extract_review_data(raw_review, normalizer)
+                if not review_data:
+                    continue
+
+                review_date_obj = review_data.pop("posted_datetime_obj").date()
+                # --- 日付比較ロジック ---
+                # 【スキップ判定】終了日より新しい口コミはスキップ
+                if end_date_obj and review_date_obj > end_date_obj:
+                    logger.debug(
+                        "スキップ: 投稿日(%s)が終了日(%s)より新しいため。",
+                        review_date_obj,
+                        end_date_obj,
                     )
-                    review_date_obj = review_datetime_obj.date()
-                    review_date_for_db = review_date_obj.strftime("%Y-%m-%d")
-                    # --- 日付比較ロジック ---
-                    # 【スキップ判定】終了日より新しい口コミはスキップ
-                    if end_date_obj and review_date_obj > end_date_obj:
-                        print(
-                            f"  -> スキップ: 投稿日({review_date_obj})が終了日({end_date_obj})より新しいため。"
-                        )
-                        continue
-
-                    # 【停止判定】開始日より古い口コミが見つかったら停止
-                    if start_date_obj and review_date_obj < start_date_obj:
-                        print(
-                            f"  -> 停止: 投稿日({review_date_obj})が開始日({start_date_obj})より古いため。"
-                        )
-                        stop_crawling = True
-                        break
-                    print(f"  投稿日: {review_date_for_db} (処理対象)")
-
-                    # 口コミ本文
-                    review_comment = ""
-                    translated_review_comment = ""
-                    try:
-                        # オリジナル文の要素を特定
-                        original_text_element = review.find_element(
-                            By.CSS_SELECTOR,
-                            "div.uitk-expando-peek-inner > div.uitk-text",
-                        )
-                        review_comment = original_text_element.text
-
-                        # 翻訳
-                        translate_buttons = review.find_elements(
-                            By.XPATH, ".//button[text()='Google で翻訳']"
-                        )
-                        if translate_buttons:
-                            translate_buttons[0].click()
-
-                            try:
-                                wait = WebDriverWait(review, 5)
-                                wait.until(
-                                    lambda d: d.find_element(
-                                        By.CSS_SELECTOR,
-                                        "div.uitk-expando-peek-inner > div.uitk-text",
-                                    ).text
-                                    != review_comment
-                                )
-
-                                translated_review_comment = review.find_element(
-                                    By.CSS_SELECTOR,
-                                    "div.uitk-expando-peek-inner > div.uitk-text",
-                                ).text
-
-                            except TimeoutException:
-                                print("翻訳文の読み込みがタイムアウトしました。")
-
-                    except NoSuchElementException:
-                        review_comment = ""
-                        translated_review_comment = ""
-
-                    language_code = detect_language(review_comment)
-                    language_name = get_language_name_ja(language_code)
-                   
-
-                    review_data = {
-                        "overall_score": overall_score,
-                        "reviewer_name": reviewer_name,
-                        "review_date": review_date_for_db,
-                        "traveler_type": normalized_data.get("traveler_type"),
-                        "traveler_type_original": original_traveler_type,
-                        "purpose_of_visit": normalized_data.get("purpose"),
-                        "purpose_of_visit_original": original_traveler_type,
-                        "review_comment": review_comment.strip(),
-                        "translated_review_comment": translated_review_comment.strip(),
-                        "language_code": language_code,
-                        "review_language": language_name,
-                    }
-
-                    all_reviews_data.append(review_data)
-
-                    print("  --- 取得した口コミ情報 ---")
-                    print(f"  評価: {review_data['overall_score']}")
-                    print(f"  投稿者: {review_data['reviewer_name']}")
-                    print(f"  旅行タイプ: {review_data['traveler_type']}")
-                    print(
-                        f"  旅行タイプ（オリジナル）: {review_data['traveler_type_original']}"
-                    )
-                    print(f"  旅行目的: {review_data['purpose_of_visit']}")
-                    print(
-                        f"  旅行目的（オリジナル）: {review_data['purpose_of_visit_original']}"
-                    )
-                    print(f"  投稿日: {review_data['review_date']}")
-                    print(f"  言語: {review_data['review_language']}")
-                    print(f"  本文: {review_data['review_comment'][:50]}...")
-                    print(f"  言語コード: {review_data['language_code']}")
-                    if review_data[
-                        "translated_review_comment"
-                    ]:  # 翻訳文がある場合のみ表示
-                        print(
-                            f"  翻訳文: {review_data['translated_review_comment'][:50]}..."
-                        )
-                    print("-" * 30)
-
-                except Exception as e:
-                    print(
-                        f"口コミの解析中に予期せぬエラーが発生しました: {type(e).__name__}: {e}"
+                    continue
+
+                # 【停止判定】開始日より古い口コミが見つかったら停止
+                if start_date_obj and review_date_obj < start_date_obj:
+                    logger.info(
+                        "停止: 投稿日(%s)が開始日(%s)より古いため。",
+                        review_date_obj,
+                        start_date_obj,
                     )
+                    stop_crawling = True
+                    break
+                logger.debug("投稿日: %s (処理対象)", review_data["review_date"])
+                chunk_reviews.append(review_data)
 
-            processed_reviews_count = len(review_elements)
+            # 言語判定は読み込んだ口コミ単位でまとめて行う
+            annotate_languages(chunk_reviews)
+            count(REVIEWS_EXTRACTED, len(chunk_reviews))
+            for review_data in chunk_reviews:
+                log_review(logger, review_data)
+            all_reviews_data.extend(chunk_reviews)
+            page_count += 1
 
             # 「口コミをさらに表示する」ボタンを探してクリック
             try:
@@ -323,25 +273,110 @@ def scrape_expedia_reviews(url, start_date_str: str = None, end_date_str: str =
                 driver.execute_script(
                     "arguments[0].scrollIntoView(true);", load_more_button
                 )
-                time.sleep(1)
+                traced_sleep(1)
 
                 if load_more_button.is_enabled():
-                    print("「口コミをさらに表示する」をクリックします。")
+                    logger.info("「口コミをさらに表示する」をクリックします。")
                     load_more_button.click()
                     # 新しい口コミが読み込まれるのを待つ
-                    time.sleep(3)  # AJAXの読み込み時間として3秒待機
+                    traced_sleep(3)  # AJAXの読み込み時間として3秒待機
                 else:
-                    print("「さらに表示」ボタンが無効化されました。")
+                    logger.info("「さらに表示」ボタンが無効化されました。")
                     break
             except NoSuchElementException:
                 # ボタンが見つからなければ、それが最後のページ
-                print(
+                logger.info(
                     "「さらに表示」ボタンが見つかりません。全ての口コミを取得しました。"
                 )
                 break
 
     finally:
-        print("処理を終了し、ブラウザを閉じます。")
+        logger.info("処理を終了し、ブラウザを閉じます。")
         driver.quit()
 
     return all_reviews_data
+
+
+def reextract_page(driver, normalizer, hotel_id, page, detail_pages):
+    """
+    アーカイブから表示した口コミページ1枚分を、クロール時と同じ抽出処理で再抽出する。
+    前のページまでの口コミはプレースホルダーに置き換えて保存しているため、対象外になる
+    (置き換えを行う前のアーカイブには、前のページまでの口コミも含まれる)。
+    翻訳文は None のため、保存済みの値は上書きされない。
+    """
+    reviews = []
+    for raw_review in extract_page_reviews(driver):
+        review_data = extract_review_data(raw_review, normalizer)
+        if review_data:
+            del review_data["posted_datetime_obj"]
+            reviews.append(review_data)
+    return reviews
+
+
+@traced(EXTRACTION)
+def extract_page_reviews(driver, prune=False):
+    """
+    ページ内のまだ取り出していない口コミについて、生の値の辞書のリストを返す。
+    prune=True の場合は、前回取り出した口コミ要素をプレースホルダーに置き換えてから取り出す。
+    """
+    return run_page_script(
+        driver,
+        _EXTRACT_REVIEWS_SCRIPT,
+        REVIEW_ITEM_SELECTOR,
+        REVIEW_TEXT_SELECTOR,
+        REVIEW_EXTRACTED_ATTRIBUTE,
+        prune,
+    )
+
+
+def extract_review_data(raw_review, normalizer):
+    """
+    extract_page_reviews() で取り出したExpediaの口コミ1件分の生の値を正規化する関数。
+    翻訳文 (translated_review_comment) は None とし、translate_reviews コマンドで後から付与する。
+    Returns:
+        dict: 抽出した口コミデータ。抽出失敗時はNoneを返す。
+    """
+    try:
+        # 評価 (例: "8/10 良い" -> "8")
+        rating_text = raw_review["rating"]
+        reviewer_name = raw_review["reviewer_name"]
+        review_date_str = raw_review["review_date"]
+        if rating_text is None or reviewer_name is None or review_date_str is None:
+            raise ValueError("評価・投稿者・投稿日のいずれかが見つかりません。")
+        overall_score = rating_text.split("/")[0]
+
+        # 旅行者タイプ (日付と区別するため、テキストに「年」が含まれていないことを確認)
+        original_traveler_type = raw_review["traveler_type"] or ""
+        if "年" in original_traveler_type:
+            original_traveler_type = ""
+
+        normalized_data = normalizer.normalize_from_tags(
+            original_traveler_type, "expedia"
+        )
+
+        review_datetime_obj = datetime.strptime(review_date_str, "%Y 年 %m 月 %d 日")
+        review_date_for_db = review_datetime_obj.date().strftime("%Y-%m-%d")
+
+        # 口コミ本文
+        review_comment = raw_review["review_comment"] or ""
+
+        return {
+            "posted_datetime_obj": review_datetime_obj,
+            "overall_score": overall_score,
+            "reviewer_name": reviewer_name,
+            "review_date": review_date_for_db,
+            "traveler_type": normalized_data.get("traveler_type"),
+            "traveler_type_original": original_traveler_type,
+            "purpose_of_visit": normalized_data.get("purpose"),
+            "purpose_of_visit_original": original_traveler_type,
+            "review_comment": review_comment.strip(),
+            "translated_review_comment": None,
+        }
+
+    except Exception as e:
+        logger.error(
+            "口コミの解析中に予期せぬエラーが発生しました: %s: %s",
+            type(e).__name__,
+            e,
+        )
+        return None
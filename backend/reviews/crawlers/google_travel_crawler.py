@@ -1,78 +1,248 @@
 # google_travel_crawler.py
 
-import time
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException
 import undetected_chromedriver as uc
 from datetime import datetime, timedelta
 import re
-import pprint
+from django.utils import timezone
+from ..archive import archive_page
+from ..browser_profiles import launch_chrome, quit_chrome
 from ..normalizer import DataNormalizer
-from reviews.utils import normalize_score, detect_language, get_language_name_ja
+from ..page_scripts import expand_all, run_page_script
+from ..logging_utils import get_crawler_logger, log_review
+from ..metrics import instrument_webdriver
+from ..tracing import (
+    EXTRACTION,
+    NAVIGATION,
+    REVIEWS_EXTRACTED,
+    WAIT,
+    count,
+    count_page,
+    phase,
+    record_error,
+    traced,
+    traced_sleep,
+)
+from reviews.utils import normalize_score, annotate_languages
 import html
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.common.action_chains import ActionChains
 
-def parse_google_relative_date(relative_date_str: str) -> datetime:
-    """
-    Googleの相対的な日付文字列("a week ago", "3ヶ月前"など)をdatetimeオブジェクトに変換する。
-    """
-    now = datetime.now()
+logger = get_crawler_logger("google")
+
+# Googleのロゴを含む口コミ (TripAdvisor等の他サイトの口コミを除く) の要素
+REVIEW_ELEMENTS_XPATH = ".//img[contains(@src, 'googleg')]/ancestor::div[@data-ved][1]"
+
+# 収集済みの口コミ要素に付ける属性。値は口コミごとに安定したキー
+# (投稿者プロフィールのURL。取れない場合は data-ved)
+REVIEW_KEY_ATTRIBUTE = "data-crawl-key"
+# 未処理のキューに積まれている間だけ口コミ要素に付ける属性
+REVIEW_PENDING_ATTRIBUTE = "data-crawl-pending"
+
+# 未処理の口コミの「続きを読む」ボタン (展開済みの口コミのボタンを押し直さないため)
+EXPAND_BUTTON_XPATH = (
+    f"//div[@{REVIEW_PENDING_ATTRIBUTE}]//span[@role='button'"
+    " and (contains(., 'Read more') or contains(., '続きを読む'))]"
+)
+
+# スクロール後、新しい口コミが追加されるのを待つ最大時間 (ミリ秒)
+NEW_REVIEWS_TIMEOUT_MS = 8000
+
+# REVIEW_ELEMENTS_XPATH と同じ口コミ要素を、DOMに追加されたノードの中から拾う。
+# 既存の要素も初回に拾い、以降はキーで重複を除いて未処理のキューに積む
+_INSTALL_REVIEW_OBSERVER_SCRIPT = """
+const [keyAttribute, pendingAttribute] = arguments;
+if (window.__reviewCrawler) {
+    window.__reviewCrawler.observer.disconnect();
+}
+const state = {seen: new Set(), pending: [], extracted: [], observer: null};
+const collect = (root) => {
+    let logos = [];
+    if (root.matches && root.matches("img[src*='googleg']")) {
+        logos = [root];
+    } else if (root.querySelectorAll) {
+        logos = root.querySelectorAll("img[src*='googleg']");
+    }
+    for (const logo of logos) {
+        const review = logo.closest("div[data-ved]");
+        if (!review) continue;
+        const profileLink = review.querySelector("a[href*='/contrib/']");
+        const key = profileLink
+            ? profileLink.getAttribute("href")
+            : review.getAttribute("data-ved");
+        if (!key || state.seen.has(key)) continue;
+        state.seen.add(key);
+        review.setAttribute(keyAttribute, key);
+        review.setAttribute(pendingAttribute, "");
+        state.pending.push(review);
+    }
+};
+collect(document);
+state.observer = new MutationObserver((mutations) => {
+    for (const mutation of mutations) {
+        for (const node of mutation.addedNodes) {
+            if (node.nodeType === Node.ELEMENT_NODE) collect(node);
+        }
+    }
+});
+state.observer.observe(document.body, {childList: true, subtree: true});
+window.__reviewCrawler = state;
+"""
+
+# 未処理のキューに積まれた口コミを取り出し、生の値をまとめて返す。
+# 前回取り出した口コミ (アーカイブ済み) は先にプレースホルダーに置き換え、
+# スクロールを続けてもDOMが増え続けないようにする (キーは seen に残るため再収集されない)
+_EXTRACT_PENDING_REVIEWS_SCRIPT = """
+const pendingAttribute = arguments[0];
+const state = window.__reviewCrawler;
+replaceWithPlaceholders(state.extracted.filter((review) => review.isConnected));
+const reviews = state.pending;
+state.pending = [];
+state.extracted = reviews;
+reviews.forEach((review) => review.removeAttribute(pendingAttribute));
+const subScoreKeywords = [
+    ["rooms", "Rooms", "客室"],
+    ["service", "Service", "サービス"],
+    ["location", "Location", "地図"],
+];
+return reviews.map((review) => {
+    const ratingElement = review.querySelector("span[role='img']");
+    // 「続きを読む」で展開された後の完全な本文 (jsname='NwoMSd')
+    const fullComment = xpathFirst(review, ".//div[@jsname='NwoMSd']//span");
+    const subScores = {};
+    for (const [key, keywordEn, keywordJa] of subScoreKeywords) {
+        subScores[key] = text(xpathFirst(
+            review,
+            `.//div[contains(., '${keywordEn}') or contains(., '${keywordJa}')]`
+        ));
+    }
+    return {
+        score_text: text(xpathFirst(
+            review, ".//div[.//a[contains(@href, '/contrib/')]]/following-sibling::div"
+        )),
+        rating_label: ratingElement ? ratingElement.getAttribute("aria-label") : null,
+        reviewer_name: text(xpathFirst(
+            review, ".//a[contains(@href, '/contrib/') and text()]"
+        )),
+        // Googleアイコンの前のテキストノード ("3か月前、" など)
+        relative_date: xpathString(
+            review, ".//img[contains(@src, 'googleg')]/parent::span/preceding-sibling::text()"
+        ),
+        travel_info: text(xpathFirst(
+            review,
+            ".//img[contains(@src, 'googleg')]/ancestor::div[2]/following-sibling::div/div[1]/span"
+        )),
+        comment_html: fullComment ? fullComment.innerHTML : null,
+        // 完全な本文が無い場合は、表示されている本文 (短いレビュー or 省略版)
+        comment_text: fullComment ? null : text(xpathFirst(
+            review,
+            ".//span[not(.//*) and not(ancestor::a) and not(ancestor::*[@role='button'])"
+            + " and string-length(normalize-space()) > 15][1]"
+        )),
+        sub_scores: subScores,
+    };
+});
+"""
+
+# 新しい口コミがキューに積まれるか、タイムアウトするまで待ち、積まれた件数を返す
+_WAIT_NEW_REVIEWS_SCRIPT = """
+const timeoutMs = arguments[0];
+const done = arguments[arguments.length - 1];
+const startedAt = Date.now();
+const poll = () => {
+    const pending = window.__reviewCrawler.pending.length;
+    if (pending > 0 || Date.now() - startedAt > timeoutMs) {
+        done(pending);
+    } else {
+        setTimeout(poll, 100);
+    }
+};
+poll();
+"""
+
+
+# 相対日付の単位ごとの長さ。表示は切り捨てのため、実際の経過時間は
+# 「数量 × 単位」から「(数量 + 1) × 単位」の範囲にある ("1年前" は1〜2年前)
+RELATIVE_DATE_UNITS = {
+    "year": timedelta(days=365),
+    "month": timedelta(days=30),
+    "week": timedelta(weeks=1),
+    "day": timedelta(days=1),
+    "hour": timedelta(hours=1),
+    "minute": timedelta(minutes=1),
+}
+
+_JA_RELATIVE_DATE_PATTERNS = (
+    (re.compile(r"(\d+)\s*分前"), "minute"),
+    (re.compile(r"(\d+)\s*時間前"), "hour"),
+    (re.compile(r"(\d+)\s*日前"), "day"),
+    (re.compile(r"(\d+)\s*週間前"), "week"),
+    (re.compile(r"(\d+)\s*[かヶケカ]月前"), "month"),
+    (re.compile(r"(\d+)\s*年前"), "year"),
+)
+
+# 開始日より確実に古い口コミがこの件数連続したら、以降も古いと判断して収集を止める
+STOP_CONFIDENCE_COUNT = 3
+
+
+def _parse_relative_date(relative_date_str: str):
+    """相対日付の文字列を (数量, 単位) に分解する。解釈できない場合は None。"""
     relative_date_str = relative_date_str.lower().strip()
 
-    # 日本語と英語のパターンを正規表現で処理
-    # 例: "3 weeks ago", "a month ago", "5日前", "1年前"
+    # 例: "3 weeks ago", "a month ago"
     match = re.search(
-        r"(an?|a|\d+)\s+(year|month|week|day|hour|minute)s?", relative_date_str
+        r"(an?|\d+)\s+(year|month|week|day|hour|minute)s?", relative_date_str
     )
-    if not match:
-        match = re.search(r"(\d+)\s*日前", relative_date_str)
+    if match:
+        quantity_str, unit = match.group(1), match.group(2)
+        quantity = 1 if quantity_str in ["a", "an"] else int(quantity_str)
+        return quantity, unit
+
+    # 例: "5日前", "3ヶ月前", "1年前"
+    for pattern, unit in _JA_RELATIVE_DATE_PATTERNS:
+        match = pattern.search(relative_date_str)
         if match:
-            unit = "day"
-        else:
-            match = re.search(r"(\d+)\s*週間前", relative_date_str)
-            if match:
-                unit = "week"
-            else:
-                match = re.search(r"(\d+)\s*か月前", relative_date_str)
-                if match:
-                    unit = "month"
-                else:
-                    match = re.search(r"(\d+)\s*年前", relative_date_str)
-                    if match:
-                        unit = "year"
+            return int(match.group(1)), unit
+    return None
 
-    if match:
-        try:
-            quantity_str = match.group(1)
-            quantity = 1 if quantity_str in ["a", "an"] else int(quantity_str)
-
-            unit_str = match.group(2) if len(match.groups()) > 1 else unit
-
-            if "year" in unit_str:
-                return now - timedelta(days=365 * quantity)
-            if "month" in unit_str:
-                return now - timedelta(days=30 * quantity)  # 簡略化
-            if "week" in unit_str:
-                return now - timedelta(weeks=quantity)
-            if "day" in unit_str:
-                return now - timedelta(days=quantity)
-            if "hour" in unit_str:
-                return now - timedelta(hours=quantity)
-            if "minute" in unit_str:
-                return now - timedelta(minutes=quantity)
-        except (ValueError, IndexError):
-            pass  # パース失敗時はそのまま
-
-    # パターンに一致しない場合やパース失敗時は現在時刻を返す
-    print(
-        f"[警告] 相対日付のパースに失敗しました: '{relative_date_str}'。現在時刻を使用します。"
+
+def parse_google_relative_date(relative_date_str: str, now: datetime = None) -> datetime:
+    """
+    Googleの相対的な日付文字列("a week ago", "3ヶ月前"など)をdatetimeオブジェクトに変換する。
+    now には基準日時 (再抽出時はページの取得日時) を指定する。省略時は現在時刻。
+    """
+    now = now or datetime.now()
+    parsed = _parse_relative_date(relative_date_str)
+    if parsed:
+        quantity, unit = parsed
+        return now - RELATIVE_DATE_UNITS[unit] * quantity
+
+    # パターンに一致しない場合は現在時刻を返す
+    logger.warning(
+        "[警告] 相対日付のパースに失敗しました: '%s'。現在時刻を使用します。",
+        relative_date_str,
     )
     return now
 
 
+def relative_date_bounds(relative_date_str: str, now: datetime = None):
+    """
+    相対日付の文字列が表しうる投稿日時の範囲を (最も古い日時, 最も新しい日時) で返す。
+    "3日前" なら幅は1日だが、"1年前" なら1年の幅がある。解釈できない場合は None。
+    """
+    now = now or datetime.now()
+    parsed = _parse_relative_date(relative_date_str)
+    if not parsed:
+        return None
+    quantity, unit = parsed
+    unit_delta = RELATIVE_DATE_UNITS[unit]
+    # 月・年の長さの違いや四捨五入表示に備え、新しい側には半単位の余裕を持たせる
+    earliest = now - unit_delta * (quantity + 1)
+    latest = now - unit_delta * quantity + unit_delta / 2
+    return earliest, latest
+
+
 def scrape_google_travel_reviews(
     url: str,
     hotel_id: str,
@@ -105,12 +275,12 @@ def scrape_google_travel_reviews(
 
     options.add_experimental_option('prefs', prefs)
 
-    driver = uc.Chrome(options=options)
+    driver = launch_chrome("google", options)
+    instrument_webdriver(driver)
     driver.set_window_size(1200, 800)
     # driver.maximize_window()
     wait = WebDriverWait(driver, 10)
 
-    ota_name = "google"
     normalizer = DataNormalizer()
 
     start_date_obj, end_date_obj = None, None
@@ -125,20 +295,18 @@ def scrape_google_travel_reviews(
         except ValueError:
             return []
 
-    # 近似計算のズレを吸収するためのバッファ（ここでは90日）
-    date_buffer = timedelta(days=90)
-
     all_reviews_data = []
     stop_scraping = False
-    processed_review_ids = set()
+    page_count = 1
 
     try:
-        print(f"アクセス中: {url}")
-        driver.get(url)
-        time.sleep(3)  # ページの初期読み込み待機
+        logger.info(f"アクセス中: {url}")
+        with phase(NAVIGATION):
+            driver.get(url)
+        traced_sleep(3)  # ページの初期読み込み待機
 
         if "/search" in driver.current_url:
-            print("検索ページを検出しました。レビューセクションに直接移動します...")
+            logger.info("検索ページを検出しました。レビューセクションに直接移動します...")
             try:
                 # クラス名に依存せず、レビュー数(例: "(497)")のテキスト形式を元にリンクを特定するXPath
                 review_count_link_xpath = (
@@ -147,26 +315,26 @@ def scrape_google_travel_reviews(
                 review_count_link = wait.until(
                     EC.element_to_be_clickable((By.XPATH, review_count_link_xpath))
                 )
-                print("レビュー数リンクをクリックして、クチコミページに移動します...")
+                logger.info("レビュー数リンクをクリックして、クチコミページに移動します...")
                 driver.execute_script("arguments[0].click();", review_count_link)
-                time.sleep(4)
+                traced_sleep(4)
 
             except TimeoutException:
-                print(
+                logger.info(
                     "レビューページへのリンクが見つかりませんでした。ページ構成が変更された可能性があります。"
                 )
                 driver.quit()
                 return []
         try:
-            print("「新しい順」での並び替えを試みます...")
+            logger.info("「新しい順」での並び替えを試みます...")
             sort_button_xpath = "//div[@role='option' and (contains(., 'Most helpful')or contains(., '参考度の高い順'))]"
             sort_button = wait.until(
                 EC.element_to_be_clickable((By.XPATH, sort_button_xpath))
             )
-            time.sleep(1)
+            traced_sleep(1)
 
             sort_button.click()
-            time.sleep(1)
+            traced_sleep(1)
             newest_option = wait.until(
                 EC.element_to_be_clickable(
                     (
@@ -176,10 +344,10 @@ def scrape_google_travel_reviews(
                 )
             )
             newest_option.click()
-            print("並び替え後のクチコミ読み込みを待機しています...")
-            time.sleep(3)
+            logger.info("並び替え後のクチコミ読み込みを待機しています...")
+            traced_sleep(3)
         except TimeoutException:
-            print("並び替えボタンまたは「新しい順」オプションが見つかりませんでした。デフォルトの順序で続行します。")
+            logger.info("並び替えボタンまたは「新しい順」オプションが見つかりませんでした。デフォルトの順序で続行します。")
 
         # try:
         #     print("「Google」のみの表示に切り替えます...")
@@ -208,120 +376,96 @@ def scrape_google_travel_reviews(
         scrollable_div = None
         try:
 
-            print("スクロールコンテナの表示を待機します...")
+            logger.info("スクロールコンテナの表示を待機します...")
             scrollable_container_xpath = "//div[@jsname='UcPrk']"
             scrollable_div = WebDriverWait(driver, 10).until(
                 EC.visibility_of_element_located((By.XPATH, scrollable_container_xpath))
             )
-            print("コンテナを特定しました。スクレイピングを開始します。")
+            logger.info("コンテナを特定しました。スクレイピングを開始します。")
 
         except TimeoutException:
-            print(
+            logger.error(
                 "[致命的エラー] 「すべてのレビュー」ボタン、またはレビューコンテナの特定に失敗しました。"
             )
-            return
-
-        while not stop_scraping:
-
-            review_elements_xpath = (
-                ".//img[contains(@src, 'googleg')]/ancestor::div[@data-ved][1]"
-            )
-            review_elements = driver.find_elements(By.XPATH, review_elements_xpath)
-            print(f"ページ上で{len(review_elements)}件の口コミを検出しました。")
+            return []
 
-            # if not review_elements or len(review_elements) == len(processed_review_ids):
-            #     print("新しい口コミが見つかりませんでした。収集を終了します。")
-            #     break
+        # 以降は追加された口コミ要素だけを MutationObserver 経由で受け取る
+        driver.execute_script(
+            _INSTALL_REVIEW_OBSERVER_SCRIPT, REVIEW_KEY_ATTRIBUTE, REVIEW_PENDING_ATTRIBUTE
+        )
+        consecutive_old_reviews = 0
 
-            current_review_count = len(review_elements)
-            # last_height = driver.execute_script("return arguments[0].scrollHeight", scrollable_div)
+        while not stop_scraping:
+            count_page(driver)
 
-            last_processed_date = None
-            # まだ処理していないレビューだけを対象にする
-            new_reviews_to_process = [
-                el for el in review_elements if el.text not in processed_review_ids
-            ]
+            # 「続きを読む」はまとめて押し、全ての本文の展開を1回だけ待つ
+            expand_all(driver, EXPAND_BUTTON_XPATH)
 
-            print(f"未処理の口コミ {len(new_reviews_to_process)}件を処理します。")
+            raw_reviews = extract_page_reviews(driver)
+            logger.info(f"新たに追加された口コミ {len(raw_reviews)}件を処理します。")
 
-            for review_element in new_reviews_to_process:
-                review_text_content = review_element.text
-                # ここでも念のため二重チェック
-                if review_text_content in processed_review_ids:
+            for raw_review in raw_reviews:
+                data = extract_google_review_data(raw_review, normalizer)
+                if not data:
                     continue
-                processed_review_ids.add(review_text_content)
-
-                try:
-                    # レビュー要素内に、Googleロゴ画像が含まれているかを確認
-                    google_logo_xpath = ".//img[contains(@src, 'googleg')]"
-                    review_element.find_element(By.XPATH, google_logo_xpath)
-                    # 上の行で要素が見つかれば、Googleレビューと判断。見つからなければ例外が発生する。
-                except NoSuchElementException:
-                    # Googleロゴが見つからなかった場合、このレビューはスキップする
-                    print(
-                        "  [情報] Google以外のレビュー(TripAdvisor等)のためスキップします。"
-                    )
-                    continue  # 次のレビューに進む
 
-                data = extract_google_review_data(
-                    review_element, normalizer, hotel_id, ota_name, driver
-                )
-                if not data:
+                bounds = data["posted_bounds"]
+                if start_date_obj and bounds and bounds[1].date() < start_date_obj:
+                    # 相対日付の粒度を考慮しても開始日より古いことが確実な口コミ。
+                    # 新しい順に並んでいるため、一定件数続けば以降の口コミも全て古いと判断する
+                    consecutive_old_reviews += 1
+                    if consecutive_old_reviews >= STOP_CONFIDENCE_COUNT:
+                        logger.debug(
+                            "開始日より古い口コミが%d件続いたため、収集ループを停止します。(最終: %s)",
+                            consecutive_old_reviews,
+                            data["review_date"],
+                        )
+                        stop_scraping = True
+                        break
                     continue
+                consecutive_old_reviews = 0
 
-                last_processed_date = data["posted_datetime_obj"].date()
                 all_reviews_data.append(data)
+                count(REVIEWS_EXTRACTED)
 
-            if start_date_obj and last_processed_date:
-                if last_processed_date < (start_date_obj - date_buffer):
-                    print(
-                        f"収集バッファを超えました。収集ループを停止します。(最終処理日: {last_processed_date})"
-                    )
-                    stop_scraping = True
-
-
-        last_review_count = len(review_elements)
-        print("\n次の口コミチャンクの読み込みを試行します...")
-        actions = ActionChains(driver)
-        actions.move_to_element(scrollable_div).click()
-        for _ in range(3):
-            actions.send_keys(Keys.PAGE_DOWN)
-            time.sleep(0.3)
-        actions.perform()
-        print("  新しいコンテンツの読み込みを待機します...")
-        time.sleep(3.5)
-        current_review_count = len(
-            driver.find_elements(
-                By.XPATH,
-                ".//img[contains(@src, 'googleg')]/ancestor::div[@data-ved][1]",
-            )
-        )
-        if current_review_count > last_review_count:
-            print(
-                f"  成功！新しい口コミを読み込みました。(総数: {current_review_count}件)"
-            )
-        else:
-            print(
-                "  件数が変わりませんでした。ページの最下部と判断し、収集を終了します。"
+            # 「続きを読む」で本文を展開した後の状態を保存する
+            archive_page(driver, page_count)
+            page_count += 1
+
+            if stop_scraping:
+                break
+
+            logger.info("次の口コミチャンクの読み込みを試行します...")
+            driver.execute_script(
+                "arguments[0].scrollTop = arguments[0].scrollHeight;", scrollable_div
             )
-            stop_scraping = True
-            
+            with phase(WAIT):
+                new_count = driver.execute_async_script(
+                    _WAIT_NEW_REVIEWS_SCRIPT, NEW_REVIEWS_TIMEOUT_MS
+                )
+            if new_count:
+                logger.info(f"成功！新しい口コミを{new_count}件読み込みました。")
+            else:
+                logger.info(
+                    "新しい口コミが読み込まれませんでした。ページの最下部と判断し、収集を終了します。"
+                )
+                stop_scraping = True
 
     except Exception as e:
-        print(f"予期せぬエラーが発生しました: {e}")
+        logger.error(f"予期せぬエラーが発生しました: {e}")
+        record_error(e)
     finally:
-        print(
-            f"\nスクレイピングが完了しました。収集した口コミの総数: {len(all_reviews_data)}"
+        logger.info(
+            f"スクレイピングが完了しました。収集した口コミの総数: {len(all_reviews_data)}"
         )
-        if "driver" in locals() and driver.service.is_connectable():
-            driver.quit()
+        quit_chrome(driver)
 
     if not all_reviews_data:
-        print("\n収集したレビューはありません。")
+        logger.info("収集したレビューはありません。")
         return []
 
-    print(
-        f"\n収集が完了しました。全{len(all_reviews_data)}件のレビューを日付で絞り込みます..."
+    logger.info(
+        f"収集が完了しました。全{len(all_reviews_data)}件のレビューを日付で絞り込みます..."
     )
 
     filtered_reviews = []
@@ -338,58 +482,83 @@ def scrape_google_travel_reviews(
 
         # 絞り込み条件を通過したものだけを追加
         del review["posted_datetime_obj"]  # 最終データからは不要
+        del review["posted_bounds"]
         filtered_reviews.append(review)
 
-    print(f"絞り込みの結果、{len(filtered_reviews)}件のレビューが対象となりました。")
+    logger.info(f"絞り込みの結果、{len(filtered_reviews)}件のレビューが対象となりました。")
+    # 言語判定は絞り込み後の口コミに対してまとめて行う
+    annotate_languages(filtered_reviews)
     return filtered_reviews
 
 
-def extract_google_review_data(review_element, normalizer, hotel_id, ota_name, driver):
+def reextract_page(driver, normalizer, hotel_id, page, detail_pages):
+    """
+    アーカイブから表示した口コミページ1枚分を、クロール時と同じ抽出処理で再抽出する。
+    相対日付 ("3週間前" など) はページの取得日時を基準に解釈する。
+    """
+    reference_time = timezone.localtime(page.fetched_at).replace(tzinfo=None)
+    reviews = []
+    # クロール時と同じく、口コミごとの安定したキーで重複を除いた要素を受け取る
+    driver.execute_script(
+        _INSTALL_REVIEW_OBSERVER_SCRIPT, REVIEW_KEY_ATTRIBUTE, REVIEW_PENDING_ATTRIBUTE
+    )
+    # アーカイブは「続きを読む」で展開済みの状態のため、ボタンは押さない
+    for raw_review in extract_page_reviews(driver):
+        data = extract_google_review_data(
+            raw_review, normalizer, reference_time=reference_time
+        )
+        if data:
+            del data["posted_datetime_obj"]
+            del data["posted_bounds"]
+            reviews.append(data)
+    return reviews
 
-    def get_sub_score(keyword_en, keyword_ja):
-        # (このヘルパー関数は変更なし)
-        try:
-            xpath = (
-                f".//div[contains(., '{keyword_en}') or contains(., '{keyword_ja}')]"
-            )
-            element = review_element.find_element(By.XPATH, xpath)
-            score_text = element.text.strip()
-            match_slash = re.search(r"(\d+)/(\d+)", score_text)
-            if match_slash:
-                return float(match_slash.group(1))
-            match_dot = re.search(r"(\d\.\d)", score_text)
-            if match_dot:
-                return float(match_dot.group(1))
-            return None
-        except NoSuchElementException:
-            return None
 
+@traced(EXTRACTION)
+def extract_page_reviews(driver):
+    """
+    MutationObserver が未処理のキューに積んだ口コミを取り出し、
+    生の値の辞書のリストを返す。前回取り出した口コミ要素はプレースホルダーに置き換える。
+    """
+    return run_page_script(
+        driver, _EXTRACT_PENDING_REVIEWS_SCRIPT, REVIEW_PENDING_ATTRIBUTE
+    )
+
+
+def _parse_sub_score(score_text):
+    """"4/5" や "4.5" 形式のサブ評価のテキストから点数を取り出す。"""
+    if not score_text:
+        return None
+    match_slash = re.search(r"(\d+)/(\d+)", score_text)
+    if match_slash:
+        return float(match_slash.group(1))
+    match_dot = re.search(r"(\d\.\d)", score_text)
+    if match_dot:
+        return float(match_dot.group(1))
+    return None
+
+
+def extract_google_review_data(raw_review, normalizer, reference_time=None):
+    """
+    extract_page_reviews() で取り出したGoogleの口コミ1件分の生の値を正規化する。
+    reference_time は相対日付の基準日時 (省略時は現在時刻)。
+    """
     original_score_scale = 5
     try:
 
         overall_score_original_text = "0"  
-        try:
-            # "5/5" 形式のスコアを、位置関係を利用したXPathで取得
-            score_div_xpath = (
-                ".//div[.//a[contains(@href, '/contrib/')]]/following-sibling::div"
-            )
-            score_text = review_element.find_element(
-                By.XPATH, score_div_xpath
-            ).text  # "5/5" を取得
-
-            # スラッシュの左側を取得
+        score_text = raw_review["score_text"]
+        if score_text is not None:
+            # "5/5" 形式のスコアのスラッシュの左側を取得
             if "/" in score_text:
                 overall_score_original_text = score_text.split("/")[0].strip() 
-
-        except NoSuchElementException:
-
-            print(
-                "  [情報] '5/5' 形式の総合評価が見つかりません。星のaria-labelから取得します。"
-            )
-            rating_element = review_element.find_element(
-                By.XPATH, ".//span[@role='img']"
+        else:
+            logger.debug(
+                "[情報] '5/5' 形式の総合評価が見つかりません。星のaria-labelから取得します。"
             )
-            aria_label = rating_element.get_attribute("aria-label")
+            aria_label = raw_review["rating_label"]
+            if aria_label is None:
+                raise ValueError("総合評価が見つかりません。")
             score_match = re.search(r"(\d+)", aria_label)
             if score_match:
                 overall_score_original_text = score_match.group(1)
@@ -400,61 +569,39 @@ def extract_google_review_data(review_element, normalizer, hotel_id, ota_name, d
         )
 
         # 投稿者名
-        reviewer_name = review_element.find_element(
-            By.XPATH, ".//a[contains(@href, '/contrib/') and text()]"
-        ).text.strip()
-
-        # 投稿日時
-        time_str = ""
-        try:
-            # Googleアイコンを基点に、その前のテキストノードを取得
-            date_xpath = ".//img[contains(@src, 'googleg')]/parent::span/preceding-sibling::text()"
-            script = """
-                var xpathResult = document.evaluate(arguments[1], arguments[0], null, XPathResult.STRING_TYPE, null);
-                return xpathResult.stringValue;
-                """
-            time_str = driver.execute_script(script, review_element, date_xpath)
-
-            # "最終編集:" や "、" などの余分な文字列を削除
-            if time_str:
-                time_str = time_str.replace("最終編集:", "").replace("、", "").strip()
-
-        except NoSuchElementException:
-            print("  [警告] 投稿日時の取得に失敗しました。")
-
-        review_datetime = parse_google_relative_date(time_str)
+        reviewer_name = raw_review["reviewer_name"]
+        if reviewer_name is None:
+            raise ValueError("投稿者名が見つかりません。")
+
+        # 投稿日時 ("最終編集:" や "、" などの余分な文字列を削除)
+        time_str = raw_review["relative_date"] or ""
+        time_str = time_str.replace("最終編集:", "").replace("、", "").strip()
+        if not time_str:
+            logger.warning("[警告] 投稿日時の取得に失敗しました。")
+
+        reference_time = reference_time or datetime.now()
+        review_datetime = parse_google_relative_date(time_str, reference_time)
         review_date = review_datetime.strftime("%Y-%m-%d")
+        # 相対日付の粒度から見た投稿日時の範囲 (収集の停止判定に使う)
+        posted_bounds = relative_date_bounds(time_str, reference_time)
 
-        # 「続きを読む」ボタン
-        try:
-            more_button_xpath = ".//span[@role='button' and (contains(., 'Read more') or contains(., '続きを読む'))]"
-            more_button = review_element.find_element(By.XPATH, more_button_xpath)
-            driver.execute_script("arguments[0].click();", more_button)
-            time.sleep(0.5)
-        except NoSuchElementException:
-            pass
 
         original_purpose = None
         original_traveler_type = None
-        try:
-            # "Holiday ❘ Couple" のようなテキストを取得
-            travel_info_xpath = ".//img[contains(@src, 'googleg')]/ancestor::div[2]/following-sibling::div/div[1]/span"
-            travel_info_text = review_element.find_element(By.XPATH, travel_info_xpath).text.strip()
-
-            if '❘' in travel_info_text:
-                parts = [part.strip() for part in travel_info_text.split('❘')]
-                if len(parts) == 2:
-                    original_purpose = parts[0]
-                    original_traveler_type = parts[1]
-
-                elif len(parts) == 1:
-                    original_purpose = parts[0] # 片方だけの場合は目的に割り当てる
-            else:
-                original_purpose = travel_info_text 
-
-        except NoSuchElementException:
-            print("  [情報] 旅行タイプ/目的の情報は見つかりませんでした。")
-            pass
+        # "Holiday ❘ Couple" のようなテキスト
+        travel_info_text = raw_review["travel_info"]
+        if travel_info_text is None:
+            logger.debug("[情報] 旅行タイプ/目的の情報は見つかりませんでした。")
+        elif '❘' in travel_info_text:
+            parts = [part.strip() for part in travel_info_text.split('❘')]
+            if len(parts) == 2:
+                original_purpose = parts[0]
+                original_traveler_type = parts[1]
+
+            elif len(parts) == 1:
+                original_purpose = parts[0] # 片方だけの場合は目的に割り当てる
+        else:
+            original_purpose = travel_info_text 
 
         normalized_purpose = normalizer.normalize_purpose(
             original_purpose or original_traveler_type
@@ -464,32 +611,15 @@ def extract_google_review_data(review_element, normalizer, hotel_id, ota_name, d
         )
 
         # コメント本文
-        comment_full_html = ""
-        try:
-            # STEP 1: 【最優先】「続きを読む」で展開された後の「完全な本文」コンテナを探す
-            # この 'NwoMSd' は完全な本文が格納される目印として非常に信頼性が高い。
-            comment_span_xpath_full = ".//div[@jsname='NwoMSd']//span"
-            comment_span_element = review_element.find_element(
-                By.XPATH, comment_span_xpath_full
-            )
-            comment_full_html = comment_span_element.get_attribute("innerHTML")
-            # print("  [成功] パターン1: 完全な本文を取得しました。")
-
-        except NoSuchElementException:
+        # STEP 1: 【最優先】「続きを読む」で展開された後の「完全な本文」のHTML
+        comment_full_html = raw_review["comment_html"]
+        if comment_full_html is None:
             # STEP 2: 【フォールバック】完全な本文が見つからない場合、
-            # 表示されている本文（短いレビュー or 省略版）を汎用XPathで探す。
-            try:
-                comment_span_xpath_generic = ".//span[not(.//*) and not(ancestor::a) and not(ancestor::*[@role='button']) and string-length(normalize-space()) > 15][1]"
-                comment_span_element = review_element.find_element(
-                    By.XPATH, comment_span_xpath_generic
-                )
-                # comment_full_html = comment_span_element.get_attribute("innerHTML")
-                comment_full_html = comment_span_element.text
-                # print("  [成功] パターン2: 表示されている本文を取得しました。")
-
-            except NoSuchElementException:
+            # 表示されている本文（短いレビュー or 省略版）
+            comment_full_html = raw_review["comment_text"]
+            if comment_full_html is None:
                 # どちらのパターンでも見つからなかった場合
-                print("  [警告] いずれのパターンでも口コミ本文の取得に失敗しました。")
+                logger.warning("[警告] いずれのパターンでも口コミ本文の取得に失敗しました。")
 
         # 2. HTMLをクリーニングして、扱いやすいプレーンテキストに変換する
         def clean_html_to_text(html_string):
@@ -549,11 +679,8 @@ def extract_google_review_data(review_element, normalizer, hotel_id, ota_name, d
                 ].strip()
                 break
 
-        language_code = detect_language(review_comment)
-        language_name = get_language_name_ja(language_code)
-
         # --- 部屋 (Rooms) ---
-        rooms_score_original = get_sub_score("Rooms", "客室")
+        rooms_score_original = _parse_sub_score(raw_review["sub_scores"]["rooms"])
         rooms_score = None  # 正規化後のスコア (デフォルトはNone)
         if rooms_score_original is not None:
             rooms_score = normalize_score(
@@ -562,7 +689,7 @@ def extract_google_review_data(review_element, normalizer, hotel_id, ota_name, d
             )
 
         # --- サービス (Service) ---
-        service_score_original = get_sub_score("Service", "サービス")
+        service_score_original = _parse_sub_score(raw_review["sub_scores"]["service"])
         service_score = None
         if service_score_original is not None:
             service_score = normalize_score(
@@ -571,7 +698,7 @@ def extract_google_review_data(review_element, normalizer, hotel_id, ota_name, d
             )
 
         # --- ロケーション (Location) ---
-        location_score_original = get_sub_score("Location", "地図")
+        location_score_original = _parse_sub_score(raw_review["sub_scores"]["location"])
         location_score = None
         if location_score_original is not None:
             location_score = normalize_score(
@@ -581,6 +708,7 @@ def extract_google_review_data(review_element, normalizer, hotel_id, ota_name, d
 
         review_data = {
             "posted_datetime_obj": review_datetime,
+            "posted_bounds": posted_bounds,
             "overall_score": normalized_overall_score,
             "overall_score_original": overall_score_original_text,
             "original_score_scale": original_score_scale,
@@ -598,18 +726,11 @@ def extract_google_review_data(review_element, normalizer, hotel_id, ota_name, d
             "traveler_type_original": original_traveler_type,
             "purpose_of_visit": normalized_purpose,
             "purpose_of_visit_original": original_purpose,
-            "language_code": language_code,
-            "review_language": language_name,
         }
 
-        print("\n--- Extracted Data ---")
-        pprint.pprint(review_data)
-        print("----------------------\n")
+        log_review(logger, review_data)
 
-        # return review_data
-    except NoSuchElementException as e:
-        print(f"  [抽出エラー] 必須要素が見つかりませんでした: {e}")
-        return None
+        return review_data
     except (ValueError, IndexError, AttributeError) as e:
-        print(f"  [抽出エラー] データの解析または変換に失敗しました: {e}")
+        logger.warning("[抽出エラー] データの解析または変換に失敗しました: %s", e)
         return None
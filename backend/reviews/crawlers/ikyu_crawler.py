@@ -1,4 +1,3 @@
-import time
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -6,11 +5,64 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import undetected_chromedriver as uc
 from datetime import datetime
 import re
-import pprint
 from decimal import Decimal, InvalidOperation
 
+from ..archive import archive_page
+from ..browser_profiles import launch_chrome, quit_chrome
 from ..normalizer import DataNormalizer
-from reviews.utils import normalize_score, detect_language, get_language_name_ja
+from ..page_scripts import expand_all, run_page_script
+from ..logging_utils import get_crawler_logger, log_review
+from ..metrics import instrument_webdriver
+from ..tracing import (
+    EXTRACTION,
+    NAVIGATION,
+    REVIEWS_EXTRACTED,
+    count,
+    count_page,
+    phase,
+    record_error,
+    traced,
+    traced_sleep,
+)
+from reviews.utils import normalize_score, annotate_languages
+
+logger = get_crawler_logger("ikyu")
+
+# 口コミ1件分のコンテナ要素
+REVIEW_CONTAINER_SELECTOR = 'section[itemprop="reviewRating"]'
+
+# 口コミ本文の「すべてみる」ボタン
+EXPAND_BUTTON_XPATH = (
+    "//section[@itemprop='reviewRating']//button[contains(text(), 'すべてみる')]"
+)
+
+# ページ内の全ての口コミについて、生の値をまとめて取り出す
+_EXTRACT_REVIEWS_SCRIPT = """
+const [containerSelector] = arguments;
+const itemTexts = (items) => items.map((item) => text(item));
+return Array.from(document.querySelectorAll(containerSelector)).map((review) => {
+    const subScores = xpathAll(
+        review, './/ul[li/span[contains(text(), "客室・アメニティ")]]/li'
+    ).map((item) => [
+        text(item.querySelector("span:first-child")),
+        text(item.querySelector("span:last-child")),
+    ]);
+    const stayInfoContainer = review.querySelector("ul.bg-gray-100");
+    return {
+        reviewer_name: text(review.querySelector("span.text-st-link")),
+        review_date: text(review.querySelector('span[itemprop="datePublished"]')),
+        overall_score: text(review.querySelector('span[itemprop="ratingValue"]')),
+        sub_scores: subScores,
+        stay_info: itemTexts(
+            xpathAll(review, './/ul[li/svg/path[contains(@d, "M9 44q")]]/li')
+        ),
+        stay_info_container: stayInfoContainer
+            ? itemTexts(Array.from(stayInfoContainer.querySelectorAll("li")))
+            : null,
+        review_comment: text(review.querySelector('p[itemprop="reviewBody"]')),
+    };
+});
+"""
 
 
 def scrape_ikyu_reviews(
@@ -29,7 +81,8 @@ def scrape_ikyu_reviews(
     options.add_argument("--disable-gpu")
     options.add_argument("--disable-popup-blocking")
 
-    driver = uc.Chrome(options=options)
+    driver = launch_chrome("ikyu", options)
+    instrument_webdriver(driver)
     driver.set_window_size(1280, 800)
     wait = WebDriverWait(driver, 10)
 
@@ -40,18 +93,18 @@ def scrape_ikyu_reviews(
     if start_date_str:
         try:
             start_date_obj = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            print(f"収集開始日を設定: {start_date_obj}")
+            logger.info(f"収集開始日を設定: {start_date_obj}")
         except ValueError:
-            print(f"エラー: 開始日の形式が不正です ('{start_date_str}')。")
+            logger.warning(f"エラー: 開始日の形式が不正です ('{start_date_str}')。")
             return []
 
     end_date_obj = None
     if end_date_str:
         try:
             end_date_obj = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-            print(f"収集終了日を設定: {end_date_obj}")
+            logger.info(f"収集終了日を設定: {end_date_obj}")
         except ValueError:
-            print(f"エラー: 終了日の形式が不正です ('{end_date_str}')。")
+            logger.warning(f"エラー: 終了日の形式が不正です ('{end_date_str}')。")
             return []
 
     all_reviews_data = []
@@ -59,22 +112,23 @@ def scrape_ikyu_reviews(
     stop_scraping = False
 
     try:
-        print(f"アクセス中: {url}")
-        driver.get(url)
+        logger.info(f"アクセス中: {url}")
+        with phase(NAVIGATION):
+            driver.get(url)
 
         # === レビューページへの移動と並び替え ===
-        print("レビュータブをクリックします...")
+        logger.info("レビュータブをクリックします...")
         # gaclickid属性が変更されにくいと判断し、セレクタとして使用
         review_tab_selector = 'a[gaclickid="PcGuidePage/Review"]'
         wait.until(
             EC.element_to_be_clickable((By.CSS_SELECTOR, review_tab_selector))
         ).click()
-        print("レビューページに移動しました。")
+        logger.info("レビューページに移動しました。")
 
         # ページの読み込みを待機
-        time.sleep(5)
+        traced_sleep(5)
 
-        print("「新しい順」で並び替えます...")
+        logger.info("「新しい順」で並び替えます...")
         # aria-label属性で並び替えボタンを特定
         sort_button_selector = 'button[aria-label="新しい順"]'
         sort_button = wait.until(
@@ -84,75 +138,75 @@ def scrape_ikyu_reviews(
         # すでに選択されているか確認 (data-selected="true"ならクリックしない)
         if sort_button.get_attribute("data-selected") != "true":
             sort_button.click()
-            print("並び替えを実行しました。")
-            time.sleep(2)  # 並び替え後の読み込み待機
+            logger.info("並び替えを実行しました。")
+            traced_sleep(2)  # 並び替え後の読み込み待機
         else:
-            print("すでに「新しい順」にソートされています。")
+            logger.info("すでに「新しい順」にソートされています。")
 
         # === 口コミ収集のメインループ ===
         while not stop_scraping:
-            print(f"\n--- {page_count}ページ目の口コミを収集中 ---")
-
-            # 動的クラス名に対応するため前方一致セレクタを使用
-            review_container_selector = 'section[itemprop="reviewRating"]'
+            count_page(driver)
+            logger.info(f"--- {page_count}ページ目の口コミを収集中 ---")
 
             try:
                 wait.until(
                     EC.presence_of_all_elements_located(
-                        (By.CSS_SELECTOR, review_container_selector)
+                        (By.CSS_SELECTOR, REVIEW_CONTAINER_SELECTOR)
                     )
                 )
             except TimeoutException:
-                print("このページに口コミが見つかりませんでした。収集を終了します。")
+                logger.info("このページに口コミが見つかりませんでした。収集を終了します。")
                 break
 
-            review_elements = driver.find_elements(
-                By.CSS_SELECTOR, review_container_selector
-            )
-            print(f"{len(review_elements)}件の口コミを発見。")
+            # 「すべてみる」はページ内でまとめて押し、全ての本文の展開を1回だけ待つ
+            expand_all(driver, EXPAND_BUTTON_XPATH)
+
+            raw_reviews = extract_page_reviews(driver)
+            logger.info(f"{len(raw_reviews)}件の口コミを発見。")
 
-            if not review_elements:
-                print("このページに口コミはありません。収集を終了します。")
+            if not raw_reviews:
+                logger.info("このページに口コミはありません。収集を終了します。")
                 break
 
+            page_reviews = []
             # --- 1ページ内の各口コミを処理 ---
-            for review_element in review_elements:
-
-                try:
-                    more_button = review_element.find_element(
-                        By.XPATH, ".//button[contains(text(), 'すべてみる')]"
-                    )
-                    driver.execute_script("arguments[0].click();", more_button)
-                    time.sleep(0.5)  # テキストが展開されるのを待つ
-                except NoSuchElementException:
-                    pass
-
-                data = extract_review_data(
-                    review_element, normalizer, hotel_id, ota_name
-                )
+            for raw_review in raw_reviews:
+                data = extract_review_data(raw_review, normalizer, hotel_id, ota_name)
                 if not data:
-                    print("[失敗] この口コミからはデータを抽出できませんでした。")
+                    logger.warning("[失敗] この口コミからはデータを抽出できませんでした。")
                     continue
 
                 review_date_obj = data["posted_datetime_obj"].date()
 
                 if end_date_obj and review_date_obj > end_date_obj:
-                    print(
-                        f"スキップ: 投稿日({review_date_obj})が終了日({end_date_obj})より新しいため。"
+                    logger.debug(
+                        "スキップ: 投稿日(%s)が終了日(%s)より新しいため。",
+                        review_date_obj,
+                        end_date_obj,
                     )
                     continue
 
                 if start_date_obj and review_date_obj < start_date_obj:
-                    print(
-                        f"停止: 投稿日({review_date_obj})が開始日({start_date_obj})より古いため、収集を終了します。"
+                    logger.info(
+                        "停止: 投稿日(%s)が開始日(%s)より古いため、収集を終了します。",
+                        review_date_obj,
+                        start_date_obj,
                     )
                     stop_scraping = True
                     break
 
-                print(f" 投稿日: {data['review_date']} (処理対象)")
+                logger.debug("投稿日: %s (処理対象)", data['review_date'])
                 del data["posted_datetime_obj"]
-                # all_reviews_data.append(data)
-                pprint.pprint(data)
+                page_reviews.append(data)
+
+            # 言語判定はページ単位でまとめて行う
+            annotate_languages(page_reviews)
+            count(REVIEWS_EXTRACTED, len(page_reviews))
+            for data in page_reviews:
+                log_review(logger, data)
+            # all_reviews_data.extend(page_reviews)
+            # 「すべてみる」で本文を展開した後の状態を保存する
+            archive_page(driver, page_count)
 
             if stop_scraping:
                 break
@@ -166,39 +220,67 @@ def scrape_ikyu_reviews(
                 driver.execute_script(
                     "arguments[0].scrollIntoView({block: 'center'});", load_more_button
                 )
-                time.sleep(0.5)  # スクロール後の安定待機
+                traced_sleep(0.5)  # スクロール後の安定待機
 
                 load_more_button.click()
 
-                print(
+                logger.info(
                     "「続きをみる」をクリックしました。新しい口コミの読み込みを待機します..."
                 )
                 page_count += 1
-                time.sleep(
+                traced_sleep(
                     3
                 )  # 新しいコンテンツが読み込まれるのを待つ (必要に応じて調整)
 
             except NoSuchElementException:
                 # ボタンが見つからなければ、全ての口コミを読み込んだと判断
-                print(
+                logger.info(
                     "「続きをみる」ボタンが見つかりません。すべての口コミを読み込みました。"
                 )
                 break  # ループを終了
 
               
     except Exception as e:
-        print(f"予期せぬエラーが発生しました: {e}")
+        logger.error(f"予期せぬエラーが発生しました: {e}")
+        record_error(e)
     finally:
-        print("\nブラウザを終了します。")
-        if "driver" in locals() and driver.service.is_connectable():
-            driver.quit()
+        logger.info("ブラウザを終了します。")
+        quit_chrome(driver)
 
     return all_reviews_data
 
 
-def extract_review_data(review_element, normalizer, hotel_id, ota_name):
+def reextract_page(driver, normalizer, hotel_id, page, detail_pages):
     """
-    一休.comの単一レビュー要素からデータを抽出する関数
+    アーカイブから表示した口コミページ1枚分を、クロール時と同じ抽出処理で再抽出する。
+    「続きをみる」で追記される形式のため、前のページまでの口コミも含まれる。
+    """
+    reviews = []
+    for raw_review in extract_page_reviews(driver):
+        data = extract_review_data(raw_review, normalizer, hotel_id, "ikyu")
+        if data:
+            del data["posted_datetime_obj"]
+            reviews.append(data)
+    return reviews
+
+
+@traced(EXTRACTION)
+def extract_page_reviews(driver):
+    """ページ内の全ての口コミについて、生の値の辞書のリストを返す。"""
+    return run_page_script(driver, _EXTRACT_REVIEWS_SCRIPT, REVIEW_CONTAINER_SELECTOR)
+
+
+def _required(raw_review, key):
+    """生の値から必須項目を取り出す。見つからなかった場合は ValueError を送出する。"""
+    value = raw_review[key]
+    if value is None:
+        raise ValueError(f"必須項目 '{key}' が見つかりません。")
+    return value
+
+
+def extract_review_data(raw_review, normalizer, hotel_id, ota_name):
+    """
+    extract_page_reviews() で取り出した一休.comの口コミ1件分の生の値を正規化する関数
     """
     original_score_scale = 5
     # --- 変数の初期化 ---
@@ -220,62 +302,40 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name):
     review_datetime, review_date,  review_comment = None, None, None
     stay_date_for_db = None
     normalized_room_type, original_room_type = None, None
-    language_code, language_name = None, None
     try:
         ### 投稿者名 ###
-        reviewer_name = review_element.find_element(
-            By.CSS_SELECTOR, "span.text-st-link"
-        ).text.strip()
+        reviewer_name = _required(raw_review, "reviewer_name")
 
         ### 投稿日 ###
-        date_str_raw = review_element.find_element(
-            By.CSS_SELECTOR, 'span[itemprop="datePublished"]'
-        ).text.strip()
+        date_str_raw = _required(raw_review, "review_date")
         date_str = re.sub(r"投稿日[:：]\s*", "", date_str_raw)
         review_datetime = datetime.strptime(date_str, "%Y/%m/%d")
         review_date = review_datetime.strftime("%Y-%m-%d")
 
         ### 総合評価 ###
-        score_element = review_element.find_element(
-            By.CSS_SELECTOR, 'span[itemprop="ratingValue"]'
-        )
-        overall_score_original = score_element.text.strip()
+        overall_score_original = _required(raw_review, "overall_score")
         normalized_overall_score = normalize_score(
             overall_score_original, original_score_scale
         )
 
         ### サブ評価項目 ###
-        sub_score_elements = review_element.find_elements(
-            By.XPATH, './/ul[li/span[contains(text(), "客室・アメニティ")]]/li'
-        )
-        for item in sub_score_elements:
-            try:
-                category = item.find_element(
-                    By.CSS_SELECTOR, "span:first-child"
-                ).text.strip()
-                score_text = item.find_element(
-                    By.CSS_SELECTOR, "span:last-child"
-                ).text.strip()
-                if "客室・アメニティ" in category:
-                    room_score_original = score_text
-                elif "接客・サービス" in category:
-                    service_score_original = score_text
-                elif "温泉・お風呂" in category:
-                    bath_score_original = score_text
-                elif "お食事" in category:
-                    food_score_original = score_text
-                elif "施設・設備" in category:
-                    facilities_score_original = score_text
-                elif "満足度" in category: 
-                    satisfaction_score_original = score_text
-            except NoSuchElementException:
+        for category, score_text in raw_review["sub_scores"]:
+            if category is None or score_text is None:
                 continue
-
-        stay_info_items = review_element.find_elements(
-            By.XPATH, './/ul[li/svg/path[contains(@d, "M9 44q")]]/li'
-        )
-        for item in stay_info_items:
-            item_text = item.text.strip()
+            if "客室・アメニティ" in category:
+                room_score_original = score_text
+            elif "接客・サービス" in category:
+                service_score_original = score_text
+            elif "温泉・お風呂" in category:
+                bath_score_original = score_text
+            elif "お食事" in category:
+                food_score_original = score_text
+            elif "施設・設備" in category:
+                facilities_score_original = score_text
+            elif "満足度" in category: 
+                satisfaction_score_original = score_text
+
+        for item_text in raw_review["stay_info"]:
             if "～" in item_text:
                 match = re.search(r"(\d{4}/\d{1,2}/\d{1,2})", item_text)
                 if match:
@@ -286,16 +346,13 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name):
             elif not re.search(r"(\d+名|朝食付|夕食付)", item_text):
                 original_room_type = item_text
 
-        try:
-            stay_info_container = review_element.find_element(
-                By.CSS_SELECTOR, 'ul.bg-gray-100'
-            )
-            # コンテナ内のすべての<li>要素を取得
-            stay_info_items = stay_info_container.find_elements(By.TAG_NAME, "li")
-
-            for item in stay_info_items:
-                item_text = item.text.strip()
-
+        # コンテナ (ul.bg-gray-100) 内のすべての<li>要素のテキスト
+        stay_info_items = raw_review["stay_info_container"]
+        if stay_info_items is None:
+            # 宿泊関連情報ブロック自体が存在しないレビューもある
+            logger.debug("宿泊関連情報ブロックが見つかりませんでした。")
+        else:
+            for item_text in stay_info_items:
                 # パターン1: 宿泊日を特定する ("～"が含まれるか、日付形式に一致するか)
                 if "～" in item_text:
                     # 正規表現で "YYYY/M/D" の形式の日付部分だけを安全に抽出
@@ -315,18 +372,8 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name):
                 else:
                     original_room_type = item_text
 
-        except NoSuchElementException:
-            # 宿泊情報ブロック自体が存在しないレビューもあるため、エラーは握りつぶす
-            print("宿泊関連情報ブロックが見つかりませんでした。")
-            pass
-
         ### コメント本文 ###
-        review_comment = review_element.find_element(
-            By.CSS_SELECTOR, 'p[itemprop="reviewBody"]'
-        ).text.strip()
-
-        language_code = detect_language(review_comment)
-        language_name = get_language_name_ja(language_code)
+        review_comment = _required(raw_review, "review_comment")
 
         # --- データ処理・正規化 ---
 
@@ -376,11 +423,9 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name):
             "stay_date": stay_date_for_db,
             "room_type": normalized_room_type,
             "room_type_original": original_room_type,
-            "language_code": language_code,
-            "review_language": language_name,
         }
         return review_data
 
     except Exception as e:
-        print(f"口コミの解析中に予期せぬエラーが発生しました: {e}")
+        logger.error("口コミの解析中に予期せぬエラーが発生しました: %s", e)
         return None
@@ -1,4 +1,3 @@
-import time
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -6,16 +5,48 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import undetected_chromedriver as uc
 from datetime import datetime
 import re
-import pprint
 from decimal import Decimal, InvalidOperation
 
+from ..archive import archive_page
+from ..browser_profiles import dialog_timeout, launch_chrome, quit_chrome
+from ..browser_watchdog import BrowserWatchdog
 from ..normalizer import DataNormalizer 
+from ..logging_utils import get_crawler_logger, log_review
+from ..metrics import instrument_webdriver
+from ..tracing import (
+    EXTRACTION,
+    NAVIGATION,
+    REVIEWS_EXTRACTED,
+    count,
+    count_page,
+    phase,
+    record_error,
+    traced,
+    traced_sleep,
+)
 from reviews.utils import (
     normalize_score,
-    detect_language,
-    get_language_name_ja
+    annotate_languages
 )
 
+logger = get_crawler_logger("jalan")
+
+# 口コミ1件分のコンテナ要素
+REVIEW_CONTAINER_SELECTOR = "div.jlnpc-kuchikomiCassette__contWrap"
+
+
+def build_chrome_options():
+    """Chromeの起動オプション。起動し直すたびに新しいオブジェクトを作る。"""
+    options = uc.ChromeOptions()
+    options.add_argument("--lang=ja-JP")
+    # サイトによってはヘッドレスモードがブロックされるため、必要に応じて有効化
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-popup-blocking")
+    return options
+
 
 def scrape_jalan_reviews(url: str, hotel_id: str, start_date_str: str = None, end_date_str: str = None):
     """
@@ -31,16 +62,9 @@ def scrape_jalan_reviews(url: str, hotel_id: str, start_date_str: str = None, en
         list: 収集した口コミデータのリスト。各要素は辞書型。
     """
     # === WebDriverのセットアップ ===
-    options = uc.ChromeOptions()
-    options.add_argument("--lang=ja-JP")
-    # サイトによってはヘッドレスモードがブロックされるため、必要に応じて有効化
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-popup-blocking")
-
-    driver = uc.Chrome(options=options)
+    driver = launch_chrome("jalan", build_chrome_options())
+    watchdog = BrowserWatchdog("jalan", build_chrome_options)
+    instrument_webdriver(driver)
     driver.set_window_size(1280, 800)
     wait = WebDriverWait(driver, 10) 
 
@@ -51,18 +75,18 @@ def scrape_jalan_reviews(url: str, hotel_id: str, start_date_str: str = None, en
     if start_date_str:
         try:
             start_date_obj = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            print(f"収集開始日を設定: {start_date_obj}")
+            logger.info(f"収集開始日を設定: {start_date_obj}")
         except ValueError:
-            print(f"エラー: 開始日の形式が不正です ('{start_date_str}')。")
+            logger.warning(f"エラー: 開始日の形式が不正です ('{start_date_str}')。")
             return []
 
     end_date_obj = None
     if end_date_str:
         try:
             end_date_obj = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-            print(f"収集終了日を設定: {end_date_obj}")
+            logger.info(f"収集終了日を設定: {end_date_obj}")
         except ValueError:
-            print(f"エラー: 終了日の形式が不正です ('{end_date_str}')。")
+            logger.warning(f"エラー: 終了日の形式が不正です ('{end_date_str}')。")
             return []
 
     all_reviews_data = []
@@ -70,19 +94,20 @@ def scrape_jalan_reviews(url: str, hotel_id: str, start_date_str: str = None, en
     stop_scraping = False
 
     try:
-        print(f"アクセス中: {url}")
-        driver.get(url)
+        logger.info(f"アクセス中: {url}")
+        with phase(NAVIGATION):
+            driver.get(url)
 
-        # クッキー同意バナーを閉じる
+        # クッキー同意バナーを閉じる (同意済みのプロファイルでは待ち時間を短縮)
         try:
-            cookie_close_button = wait.until(
+            cookie_close_button = WebDriverWait(driver, dialog_timeout(driver, 10)).until(
                 EC.element_to_be_clickable((By.ID, "jln-kv__cookie-policy-close"))
             )
-            print("クッキー同意バナーを検知しました。閉じています...")
+            logger.info("クッキー同意バナーを検知しました。閉じています...")
             cookie_close_button.click()
-            time.sleep(1)
+            traced_sleep(1)
         except TimeoutException:
-            print("クッキー同意バナーは表示されませんでした。")
+            logger.info("クッキー同意バナーは表示されませんでした。")
 
         # 「投稿日の新しい順」に並び替え
         # try:
@@ -101,46 +126,61 @@ def scrape_jalan_reviews(url: str, hotel_id: str, start_date_str: str = None, en
 
         # === 口コミ収集のメインループ (ページが続く限り実行) ===
         while not stop_scraping:
-            print(f"\n--- {page_count}ページ目の口コミを収集中 ---")
-
-            review_container_selector = "div.jlnpc-kuchikomiCassette__contWrap"
+            count_page(driver)
+            logger.info(f"--- {page_count}ページ目の口コミを収集中 ---")
 
             try:
-                wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, review_container_selector)))
+                wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, REVIEW_CONTAINER_SELECTOR)))
             except TimeoutException:
-                print("口コミが見つかりませんでした。")
+                logger.info("口コミが見つかりませんでした。")
                 break
 
-            review_elements = driver.find_elements(By.CSS_SELECTOR, review_container_selector)
+            review_elements = driver.find_elements(By.CSS_SELECTOR, REVIEW_CONTAINER_SELECTOR)
 
-            print(f"{len(review_elements)}件の口コミを発見。")
+            logger.info(f"{len(review_elements)}件の口コミを発見。")
 
             if not review_elements:
-                print("このページに口コミはありません。収集を終了します。")
+                logger.info("このページに口コミはありません。収集を終了します。")
                 break
 
+            page_reviews = []
             # === 1ページ内の各口コミを処理 ===
             for review_element in review_elements:
                 data = extract_review_data(review_element, normalizer, hotel_id, ota_name)
                 if not data:
-                    print("[失敗] この口コミからはデータを抽出できませんでした。")
+                    logger.warning("[失敗] この口コミからはデータを抽出できませんでした。")
                     continue
 
                 review_date_obj = data["posted_datetime_obj"].date()
 
                 if end_date_obj and review_date_obj > end_date_obj:
-                    print(f"スキップ: 投稿日({review_date_obj})が終了日({end_date_obj})より新しいため。")
+                    logger.debug(
+                        "スキップ: 投稿日(%s)が終了日(%s)より新しいため。",
+                        review_date_obj,
+                        end_date_obj,
+                    )
                     continue
 
                 if start_date_obj and review_date_obj < start_date_obj:
-                    print(f"停止: 投稿日({review_date_obj})が開始日({start_date_obj})より古いため、収集を終了します。")
+                    logger.info(
+                        "停止: 投稿日(%s)が開始日(%s)より古いため、収集を終了します。",
+                        review_date_obj,
+                        start_date_obj,
+                    )
                     stop_scraping = True
                     break # このページのループを抜ける
 
-                print(f" 投稿日: {data['review_date']} (処理対象)")
+                logger.debug("投稿日: %s (処理対象)", data['review_date'])
                 del data["posted_datetime_obj"] # DB保存に不要な一時オブジェクトを削除
-                all_reviews_data.append(data)
-                pprint.pprint(data)
+                page_reviews.append(data)
+
+            # 言語判定はページ単位でまとめて行う
+            annotate_languages(page_reviews)
+            count(REVIEWS_EXTRACTED, len(page_reviews))
+            for data in page_reviews:
+                log_review(logger, data)
+            all_reviews_data.extend(page_reviews)
+            archive_page(driver, page_count)
 
             if stop_scraping:
                 break # メインループを抜ける
@@ -158,28 +198,46 @@ def scrape_jalan_reviews(url: str, hotel_id: str, start_date_str: str = None, en
                 driver.execute_script(
                     "arguments[0].scrollIntoView({block: 'center'});", next_button
                 )
-                time.sleep(0.5)
+                traced_sleep(0.5)
 
                 next_button.click()
                 page_count += 1
-                time.sleep(2)  # ページ遷移が完了するのを待つ
+                traced_sleep(2)  # ページ遷移が完了するのを待つ
             except (NoSuchElementException, TimeoutException):
-                print(
+                logger.info(
                     "「次へ」ボタンが見つからないかクリックできません。最終ページに到達しました。"
                 )
                 break
 
+            # ページの切り替わりで、メモリが増えたChromeを起動し直して同じページから再開する
+            recycled_driver = watchdog.after_page(driver)
+            if recycled_driver is not driver:
+                driver = recycled_driver
+                wait = WebDriverWait(driver, 10)
+
     except Exception as e:
-        print(f"予期せぬエラーが発生しました: {e}")
+        logger.error(f"予期せぬエラーが発生しました: {e}")
+        record_error(e)
 
     finally:
-        print("\nブラウザを終了します。")
-        if 'driver' in locals() and driver.service.is_connectable():
-            driver.quit()
+        logger.info("ブラウザを終了します。")
+        quit_chrome(driver)
 
     return all_reviews_data
 
 
+def reextract_page(driver, normalizer, hotel_id, page, detail_pages):
+    """アーカイブから表示した口コミ一覧ページ1枚分を、クロール時と同じ抽出処理で再抽出する。"""
+    reviews = []
+    for review_element in driver.find_elements(By.CSS_SELECTOR, REVIEW_CONTAINER_SELECTOR):
+        data = extract_review_data(review_element, normalizer, hotel_id, "jalan")
+        if data:
+            del data["posted_datetime_obj"]
+            reviews.append(data)
+    return reviews
+
+
+@traced(EXTRACTION)
 def extract_review_data(review_element, normalizer, hotel_id, ota_name):
     """
     単一のレビュー要素からデータを抽出する関数 (現在の 'jlnpc-' レイアウト専用)
@@ -199,7 +257,6 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name):
     normalized_traveler_type, original_traveler_type = None, None
     normalized_purpose, original_purpose = None, None
     normalized_room_type, original_room_type = None, None
-    language_code, language_name = None, None
 
     try:
         ### 総合評価 ###
@@ -306,7 +363,7 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name):
             review_date = review_datetime.strftime("%Y-%m-%d")
 
         except (NoSuchElementException, ValueError) as e:
-            print(f"  [警告] 日付の取得または解析に失敗しました: {e}")
+            logger.warning("[警告] 日付の取得または解析に失敗しました: %s", e)
             review_datetime = None
             review_date = None
 
@@ -334,9 +391,6 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name):
             By.CSS_SELECTOR, "p.jlnpc-kuchikomiCassette__postBody"
         ).text.strip()
 
-        language_code = detect_language(comment_text)
-        language_name = get_language_name_ja(language_code)
-
         # === 正規化と辞書への格納 ===
         normalized_traveler_type = normalizer.normalize_traveler_type(
             original_traveler_type, ota_name
@@ -377,11 +431,9 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name):
             "purpose_of_visit_original": original_purpose,
             "room_type": normalized_room_type,
             "room_type_original": original_room_type,
-            "language_code": language_code,
-            "review_language": language_name,
         }
         return review_data
 
     except Exception as e:
-        print(f"口コミの解析中に予期せぬエラーが発生しました: {e}")
+        logger.error("口コミの解析中に予期せぬエラーが発生しました: %s", e)
         return None
@@ -1,4 +1,3 @@
-import time
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
@@ -6,9 +5,43 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 import undetected_chromedriver as uc
 from datetime import datetime
 import re
-import pprint
+from ..archive import archive_page, open_archived_page
+from ..browser_profiles import launch_chrome, quit_chrome
+from ..browser_watchdog import BrowserWatchdog
+from ..models import ArchivedPage
 from ..normalizer import DataNormalizer
-from reviews.utils import normalize_score, detect_language, get_language_name_ja
+from ..logging_utils import get_crawler_logger, log_review
+from ..metrics import instrument_webdriver
+from ..tracing import (
+    EXTRACTION,
+    NAVIGATION,
+    REVIEWS_EXTRACTED,
+    count,
+    count_page,
+    phase,
+    record_error,
+    traced,
+    traced_sleep,
+)
+from reviews.utils import normalize_score, annotate_languages
+
+logger = get_crawler_logger("rakuten")
+
+# 口コミ1件分のコンテナ要素のクラス名
+REVIEW_CONTAINER_CLASS = "commentBox"
+
+
+def build_chrome_options():
+    """Chromeの起動オプション。起動し直すたびに新しいオブジェクトを作る。"""
+    options = uc.ChromeOptions()
+    options.add_argument("--lang=ja-JP")
+    # サイトによってはヘッドレスモードがブロックされるため、必要に応じて有効化
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--disable-popup-blocking")
+    return options
 
 
 def scrape_rakuten_travel_reviews(
@@ -29,16 +62,9 @@ def scrape_rakuten_travel_reviews(
         list: 収集した口コミデータのリスト。各要素は辞書型。
     """
     # === WebDriverのセットアップ===
-    options = uc.ChromeOptions()
-    options.add_argument("--lang=ja-JP")
-    # サイトによってはヘッドレスモードがブロックされるため、必要に応じて有効化
-    options.add_argument("--headless")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--disable-gpu")
-    options.add_argument("--disable-popup-blocking")
-
-    driver = uc.Chrome(options=options)
+    driver = launch_chrome("rakuten", build_chrome_options())
+    watchdog = BrowserWatchdog("rakuten", build_chrome_options)
+    instrument_webdriver(driver)
     driver.set_window_size(500, 500)
     wait = WebDriverWait(driver, 10)
 
@@ -49,18 +75,18 @@ def scrape_rakuten_travel_reviews(
     if start_date_str:
         try:
             start_date_obj = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            print(f"収集開始日を設定: {start_date_obj}")
+            logger.info(f"収集開始日を設定: {start_date_obj}")
         except ValueError:
-            print(f"エラー: 開始日の形式が不正です ('{start_date_str}')。")
+            logger.warning(f"エラー: 開始日の形式が不正です ('{start_date_str}')。")
             return []
 
     end_date_obj = None
     if end_date_str:
         try:
             end_date_obj = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-            print(f"収集終了日を設定: {end_date_obj}")
+            logger.info(f"収集終了日を設定: {end_date_obj}")
         except ValueError:
-            print(f"エラー: 終了日の形式が不正です ('{end_date_str}')。")
+            logger.warning(f"エラー: 終了日の形式が不正です ('{end_date_str}')。")
             return []
 
     all_reviews_data = []
@@ -68,10 +94,11 @@ def scrape_rakuten_travel_reviews(
     stop_scraping = False
 
     try:
-        print(f"アクセス中: {url}")
-        driver.get(url)
+        logger.info(f"アクセス中: {url}")
+        with phase(NAVIGATION):
+            driver.get(url)
         try:
-            print("「最新の投稿順」に並び替えます...")
+            logger.info("「最新の投稿順」に並び替えます...")
 
             # 1. 「最新の投稿順」のリンクが見つかるまで待機し、取得する
             sort_button = wait.until(
@@ -82,14 +109,16 @@ def scrape_rakuten_travel_reviews(
             sort_button.click()
 
             # 3. クリックによるページの再読み込みが完了し、口コミが表示されるまで待機
-            print("ページの再読み込みを待機しています...")
+            logger.info("ページの再読み込みを待機しています...")
             wait.until(
-                EC.presence_of_all_elements_located((By.CLASS_NAME, "commentBox"))
+                EC.presence_of_all_elements_located(
+                    (By.CLASS_NAME, REVIEW_CONTAINER_CLASS)
+                )
             )
-            print("並び替えが完了しました。")
+            logger.info("並び替えが完了しました。")
 
         except TimeoutException:
-            print(
+            logger.warning(
                 "「最新の投稿順」ボタンが見つからないか、並び替え後のページ読み込みに失敗しました。"
             )
             # 並び替えに失敗した場合は、処理を中断するか、そのまま続行するかを決定
@@ -99,63 +128,87 @@ def scrape_rakuten_travel_reviews(
 
         # === 口コミ収集のメインループ (ページが続く限り実行) ===
         while not stop_scraping:
-            print(f"\n--- {page_count}ページ目の口コミを収集中 ---")
+            count_page(driver)
+            logger.info(f"--- {page_count}ページ目の口コミを収集中 ---")
 
             # 口コミのコンテナ要素が読み込まれるまで待機
             try:
                 wait.until(
-                    EC.presence_of_all_elements_located((By.CLASS_NAME, "commentBox"))
+                    EC.presence_of_all_elements_located(
+                        (By.CLASS_NAME, REVIEW_CONTAINER_CLASS)
+                    )
                 )
             except TimeoutException:
-                print("口コミが見つかりませんでした。")
+                logger.info("口コミが見つかりませんでした。")
                 break
 
-            review_elements = driver.find_elements(By.CLASS_NAME, "commentBox")
-            print(f"{len(review_elements)}件の口コミを発見。")
+            review_elements = driver.find_elements(By.CLASS_NAME, REVIEW_CONTAINER_CLASS)
+            logger.info(f"{len(review_elements)}件の口コミを発見。")
 
             if not review_elements:
-                print("このページに口コミはありません。収集を終了します。")
+                logger.info("このページに口コミはありません。収集を終了します。")
                 break
 
             last_review_date_on_page = None
+            page_reviews = []
             # === 1ページ内の各口コミを処理 ===
             for review_element in review_elements:
                 data = extract_review_data(
-                    review_element, normalizer, hotel_id, ota_name, driver, wait
+                    review_element,
+                    normalizer,
+                    hotel_id,
+                    ota_name,
+                    driver,
+                    wait,
+                    page_number=page_count,
                 )
                 if not data:
-                    print("[失敗] この口コミからはデータを抽出できませんでした。")
+                    logger.warning("[失敗] この口コミからはデータを抽出できませんでした。")
                     continue
 
                 review_date_obj = data["posted_datetime_obj"].date()
                 last_review_date_on_page = review_date_obj
 
                 if end_date_obj and review_date_obj > end_date_obj:
-                    print(
-                        f"スキップ: 投稿日({review_date_obj})が終了日({end_date_obj})より新しいため。"
+                    logger.debug(
+                        "スキップ: 投稿日(%s)が終了日(%s)より新しいため。",
+                        review_date_obj,
+                        end_date_obj,
                     )
                     continue
 
                 # 【停止判定】開始日より古い口コミが見つかったら停止
                 if start_date_obj and review_date_obj < start_date_obj:
-                    print(
-                        f"停止: 投稿日({review_date_obj})が開始日({start_date_obj})より古いため、収集を終了します。"
+                    logger.info(
+                        "停止: 投稿日(%s)が開始日(%s)より古いため、収集を終了します。",
+                        review_date_obj,
+                        start_date_obj,
                     )
-                    driver.quit()
-                    return all_reviews_data
+                    stop_scraping = True
+                    break
 
-                print(f" 投稿日: {data['review_date']} (処理対象)")
+                logger.debug("投稿日: %s (処理対象)", data['review_date'])
                 del data["posted_datetime_obj"]
-                all_reviews_data.append(data)
-                pprint.pprint(data)
+                page_reviews.append(data)
+
+            # 言語判定はページ単位でまとめて行う
+            annotate_languages(page_reviews)
+            count(REVIEWS_EXTRACTED, len(page_reviews))
+            for data in page_reviews:
+                log_review(logger, data)
+            all_reviews_data.extend(page_reviews)
+            archive_page(driver, page_count)
+
+            if stop_scraping:
+                break
 
             if (
                 end_date_obj
                 and last_review_date_on_page
                 and last_review_date_on_page > end_date_obj
             ):
-                print(
-                    f"\nページの最後のレビュー日({last_review_date_on_page})が終了日({end_date_obj})より新しいため、これ以上ページを遡る必要はありません。"
+                logger.info(
+                    f"ページの最後のレビュー日({last_review_date_on_page})が終了日({end_date_obj})より新しいため、これ以上ページを遡る必要はありません。"
                 )
                 break
             # === ページネーション処理 ===
@@ -166,33 +219,82 @@ def scrape_rakuten_travel_reviews(
                 )
                 driver.execute_script("arguments[0].click();", next_button)
                 page_count += 1
-                time.sleep(2)  # ページ遷移のための待機
+                traced_sleep(2)  # ページ遷移のための待機
             except (TimeoutException, NoSuchElementException):
-                print("「次の15件」ボタンが見つかりません。最終ページに到達しました。")
+                logger.info("「次の15件」ボタンが見つかりません。最終ページに到達しました。")
                 break  # ループを終了
 
+            # ページの切り替わりで、メモリが増えたChromeを起動し直して同じページから再開する
+            recycled_driver = watchdog.after_page(driver)
+            if recycled_driver is not driver:
+                driver = recycled_driver
+                wait = WebDriverWait(driver, 10)
+
     except Exception as e:
-        print(f"予期せぬエラーが発生しました: {e}")
-        if "driver" in locals() and driver.service.is_connectable():
-            driver.quit()
+        logger.error(f"予期せぬエラーが発生しました: {e}")
+        record_error(e)
+        quit_chrome(driver)
         return all_reviews_data
 
-    print("\nブラウザを終了します。")
+    logger.info("ブラウザを終了します。")
     driver.quit()
     return all_reviews_data
 
 
-def extract_review_data(review_element, normalizer, hotel_id, ota_name, driver, wait):
+def reextract_page(driver, normalizer, hotel_id, page, detail_pages):
+    """
+    アーカイブから表示した口コミ一覧ページ1枚分を、クロール時と同じ抽出処理で再抽出する。
+    サブスコアはアーカイブ済みの詳細ページ ({URL: ArchivedPage}) から取得する。
+    """
+    wait = WebDriverWait(driver, 2)
+    reviews = []
+    for review_element in driver.find_elements(By.CLASS_NAME, REVIEW_CONTAINER_CLASS):
+        data = extract_review_data(
+            review_element,
+            normalizer,
+            hotel_id,
+            "rakuten",
+            driver,
+            wait,
+            detail_pages=detail_pages,
+        )
+        if data:
+            del data["posted_datetime_obj"]
+            reviews.append(data)
+    return reviews
+
+
+@traced(EXTRACTION)
+def extract_review_data(
+    review_element,
+    normalizer,
+    hotel_id,
+    ota_name,
+    driver,
+    wait,
+    page_number=None,
+    detail_pages=None,
+):
     """
     単一のレビュー要素から必要なデータを抽出し、詳細ページからサブスコアも取得する関数
     Args:
         review_element: 口コミ1件分のコンテナ要素 (WebElement)
         driver: SeleniumのWebDriverオブジェクト
         wait: WebDriverWaitオブジェクト
+        page_number: 一覧のページ番号 (詳細ページのアーカイブに記録する)
+        detail_pages: 再抽出時のみ指定する {詳細ページのURL: ArchivedPage}。
+            指定した場合、詳細ページはネットワークではなくアーカイブから表示する。
     Returns:
         dict: 抽出した口コミデータ。抽出失敗時はNoneを返す。
     """
     original_score_scale = 5
+    # --- 変数の初期化 (詳細ページに無い項目は None のまま) ---
+    normalized_service_score, service_score_original = None, None
+    normalized_location_score, location_score_original = None, None
+    normalized_room_score, room_score_original = None, None
+    normalized_facilities_score, facilities_score_original = None, None
+    normalized_bath_score, bath_score_original = None, None
+    normalized_food_score, food_score_original = None, None
 
     main_window = driver.current_window_handle
 
@@ -243,7 +345,7 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name, driver,
 
             except Exception as e:
                 # パースに失敗してもエラーとせず、元のテキストを名前として扱う
-                print(f"    [情報] 投稿者情報のパースに失敗しました: {e}")
+                logger.debug("[情報] 投稿者情報のパースに失敗しました: %s", e)
                 reviewer_name = user_full_text
 
         # 投稿日時
@@ -262,8 +364,6 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name, driver,
             By.CSS_SELECTOR, "p.commentSentence"
         ).text.strip()
 
-        language_code = detect_language(comment_text)
-        language_name = get_language_name_ja(language_code)
         # nationality_info = infer_nationality_from_language(language_code)
         # --- 旅行目的、同伴者、宿泊年月の抽出 ---
         purpose_items = review_element.find_elements(
@@ -285,7 +385,7 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name, driver,
             original_room_type = room_type_element.text.strip().strip("【】")
             # original_room_type = room_type_element.text.strip()
         except NoSuchElementException:
-            print("    [情報] この口コミには「ご利用のお部屋」情報がありませんでした。")
+            logger.debug("[情報] この口コミには「ご利用のお部屋」情報がありませんでした。")
             pass
 
         stay_month_str = purpose_data.get("宿泊年月")  # 例: "2024年08月"
@@ -299,7 +399,7 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name, driver,
                     "%Y-%m-%d"
                 )  # "YYYY-MM-DD"形式の文字列
             except ValueError:
-                print(f"[警告] 宿泊年月のフォーマットが不正です: '{stay_month_str}'")
+                logger.warning("[警告] 宿泊年月のフォーマットが不正です: '%s'", stay_month_str)
         original_traveler_type = purpose_data.get("同伴者")
         original_purpose = purpose_data.get("旅行の目的")
 
@@ -321,17 +421,32 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name, driver,
             )
             detail_url = detail_link_element.get_attribute("href")
 
-            # 2. 新しいタブで詳細ページを開く
-            driver.execute_script("window.open(arguments[0], '_blank');", detail_url)
+            with phase(NAVIGATION):
+                if detail_pages is None:
+                    # 2. 新しいタブで詳細ページを開く
+                    driver.execute_script(
+                        "window.open(arguments[0], '_blank');", detail_url
+                    )
 
-            # 3. 新しいタブが開くまで待機し、そちらに切り替える
-            wait.until(EC.number_of_windows_to_be(2))
-            driver.switch_to.window(driver.window_handles[1])
+                    # 3. 新しいタブが開くまで待機し、そちらに切り替える
+                    wait.until(EC.number_of_windows_to_be(2))
+                    driver.switch_to.window(driver.window_handles[1])
+                else:
+                    # 再抽出時はアーカイブ済みの詳細ページを新しいタブで表示する
+                    # (アーカイブに無い場合は KeyError となり、サブスコアなしで続行)
+                    detail_page = detail_pages[detail_url]
+                    driver.switch_to.new_window("tab")
+                    open_archived_page(driver, detail_page)
+
+                # 4. 詳細ページでサブスコアの要素が読み込まれるのを待つ
+                wait.until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, "ul.rateDetail"))
+                )
 
-            # 4. 詳細ページでサブスコアの要素が読み込まれるのを待つ
-            wait.until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "ul.rateDetail"))
-            )
+            if detail_pages is None:
+                archive_page(
+                    driver, page_number, ArchivedPage.PageKind.DETAIL, url=detail_url
+                )
 
             # 5. サブスコアを抽出
             score_elements = driver.find_elements(
@@ -379,8 +494,8 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name, driver,
                 except NoSuchElementException:
                     continue
 
-        except (TimeoutException, NoSuchElementException, IndexError) as e:
-            print(f"    [情報] サブスコアの取得に失敗しました: {e}")
+        except (TimeoutException, NoSuchElementException, IndexError, KeyError) as e:
+            logger.debug("[情報] サブスコアの取得に失敗しました: %s", e)
             # サブスコアが取得できなくても、エラーとせず処理を続行
 
         finally:
@@ -419,19 +534,17 @@ def extract_review_data(review_element, normalizer, hotel_id, ota_name, driver,
             "purpose_of_visit_original": original_purpose,
             "room_type": normalized_room_type,
             "room_type_original": original_room_type,
-            "language_code": language_code,
-            "review_language": language_name,
         }
         return review_data
 
     except NoSuchElementException as e:
-        print(f"必須要素が見つかりませんでした: {e}")
+        logger.debug("必須要素が見つかりませんでした: %s", e)
         if len(driver.window_handles) > 1:
             driver.close()
             driver.switch_to.window(main_window)
         return None
     except (ValueError, IndexError) as e:
-        print(f"データの変換または解析に失敗しました: {e}")
+        logger.warning("データの変換または解析に失敗しました: %s", e)
         if len(driver.window_handles) > 1:
             driver.close()
             driver.switch_to.window(main_window)
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+from .models import CrawlTarget
+
+logger = logging.getLogger(__name__)
+
+
+class ExportCache:
+    """
+    生成済みのエクスポートファイルをディスク上に保存するキャッシュ。
+
+    キーには (ホテル, OTA ID, 期間, 形式) に加えて、対象CrawlTargetごとの
+    data_version を含めるため、口コミが保存・更新されると自動的に別キーとなる。
+    合計サイズが上限を超えた場合は、最終アクセスが古いファイルから削除する (LRU)。
+    """
+
+    FILE_SUFFIX = ".bin"
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = Path(cache_dir or settings.EXPORT_CACHE_DIR)
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else settings.EXPORT_CACHE_MAX_BYTES
+        )
+        self._lock = threading.Lock()
+
+    def make_key(
+        self, hotel_id, ota_ids, start_date, end_date, file_format, data_versions
+    ) -> str:
+        """キャッシュキー (兼ETag) となるSHA-256文字列を生成する。"""
+        key_source = {
+            "hotel": hotel_id,
+            "ota_ids": sorted(int(ota_id) for ota_id in ota_ids or []),
+            "start_date": start_date or "",
+            "end_date": end_date or "",
+            "format": file_format,
+            # [(CrawlTarget ID, data_version), ...]
+            "versions": sorted(data_versions),
+        }
+        serialized = json.dumps(key_source, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.FILE_SUFFIX}"
+
+    def get(self, key: str):
+        """キャッシュ済みファイルのパスを返す。存在しない場合は None。"""
+        path = self._path_for(key)
+        try:
+            # LRU判定のため最終アクセス時刻を更新する
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, data: bytes) -> Path:
+        """データをアトミックに書き込み、必要であれば古いファイルを削除する。"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path_for(key)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+        return path
+
+    def evict(self):
+        """合計サイズが上限を超えている間、最終アクセスが古い順に削除する。"""
+        with self._lock:
+            entries = []
+            total_size = 0
+            for path in self.cache_dir.glob(f"*{self.FILE_SUFFIX}"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+            if total_size <= self.max_bytes:
+                return
+
+            entries.sort(key=lambda entry: entry[0])
+            for _, size, path in entries:
+                if total_size <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total_size -= size
+                    logger.info(f"エクスポートキャッシュを削除しました: {path.name}")
+                except FileNotFoundError:
+                    continue
+
+
+def get_data_versions(hotel, ota_ids=None):
+    """対象ホテル (とOTA) のCrawlTargetごとの (ID, data_version) を返す。"""
+    targets = CrawlTarget.objects.filter(hotel=hotel)
+    if ota_ids:
+        targets = targets.filter(ota__id__in=ota_ids)
+    return list(targets.order_by("id").values_list("id", "data_version"))
+
+
+export_cache = ExportCache()
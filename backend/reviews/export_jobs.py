@@ -0,0 +1,187 @@
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .metrics import EXPORT_BYTES, EXPORT_DURATION
+from .models import ExportJob
+from .services import write_reviews_xlsx
+
+logger = logging.getLogger(__name__)
+
+# エクスポートジョブ専用のスレッドプール。クロール等のコマンドと共有すると、
+# 長時間のクロールでワーカーが埋まり、ジョブが PENDING のまま実行されなくなる。
+_executor = None
+_executor_lock = threading.Lock()
+
+# 未完了のジョブの heartbeat_at を更新するスレッド (ジョブを初めて登録したときに起動する)
+_heartbeat_thread = None
+
+# 期限切れのジョブを最後に削除した日時 (削除は EXPORT_JOB_PURGE_INTERVAL_MINUTES ごとに行う)
+_last_purged_at = None
+_purge_lock = threading.Lock()
+
+_UNFINISHED_STATUSES = [ExportJob.JobStatus.PENDING, ExportJob.JobStatus.RUNNING]
+
+
+def get_export_job_dir() -> Path:
+    export_dir = Path(settings.EXPORT_JOB_DIR)
+    export_dir.mkdir(parents=True, exist_ok=True)
+    return export_dir
+
+
+def current_worker_id():
+    """このプロセスを表すID ("ホスト名:PID")。fork した子プロセスでも正しい値になるよう毎回求める。"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _heartbeat_loop():
+    """このプロセスが持つ未完了のジョブの heartbeat_at を定期的に更新する。"""
+    while True:
+        time.sleep(settings.EXPORT_JOB_HEARTBEAT_SECONDS)
+        try:
+            ExportJob.objects.filter(
+                worker_id=current_worker_id(), status__in=_UNFINISHED_STATUSES
+            ).update(heartbeat_at=timezone.now())
+        except Exception:
+            logger.warning("エクスポートジョブの生存確認日時を更新できませんでした。", exc_info=True)
+        finally:
+            connections.close_all()
+
+
+def submit_export_job(job_id):
+    """
+    エクスポートジョブを専用のスレッドプールで実行する。
+    ジョブにはこのプロセスを実行プロセスとして記録し、完了するまで生存確認日時を更新し続ける。
+    """
+    global _executor, _heartbeat_thread
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EXPORT_JOB_WORKERS, thread_name_prefix="export"
+            )
+        if _heartbeat_thread is None or not _heartbeat_thread.is_alive():
+            _heartbeat_thread = threading.Thread(
+                target=_heartbeat_loop, name="export-heartbeat", daemon=True
+            )
+            _heartbeat_thread.start()
+    ExportJob.objects.filter(pk=job_id).update(
+        worker_id=current_worker_id(), heartbeat_at=timezone.now()
+    )
+    return _executor.submit(run_export_job, job_id)
+
+
+def run_export_job(job_id):
+    """
+    エクスポートジョブを実行し、成果物をファイルとして書き出す。
+    この関数がスレッドプール上で直接実行される。
+    """
+    try:
+        job = ExportJob.objects.select_related("hotel").get(pk=job_id)
+        job.status = ExportJob.JobStatus.RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=["status", "started_at"])
+
+        output_path = get_export_job_dir() / f"{job.id}.{job.file_format}"
+
+        def report_progress(rows_written, total_rows):
+            # 進捗は行数のみを更新し、モデル全体の保存は行わない
+            ExportJob.objects.filter(pk=job.pk).update(
+                rows_written=rows_written, total_rows=total_rows
+            )
+
+        with EXPORT_DURATION.labels("job").time():
+            rows_written = write_reviews_xlsx(
+                output_path,
+                hotel=job.hotel,
+                ota_ids=job.ota_ids,
+                start_date=job.start_date,
+                end_date=job.end_date,
+                progress_callback=report_progress,
+            )
+        file_size = output_path.stat().st_size
+        EXPORT_BYTES.labels("job").observe(file_size)
+
+        finished_at = timezone.now()
+        ExportJob.objects.filter(pk=job.pk).update(
+            status=ExportJob.JobStatus.SUCCESS,
+            rows_written=rows_written,
+            file_path=str(output_path),
+            file_size=file_size,
+            finished_at=finished_at,
+            expires_at=finished_at + timedelta(hours=settings.EXPORT_JOB_TTL_HOURS),
+        )
+        logger.info(f"エクスポートジョブ {job_id} が完了しました。({rows_written}行)")
+
+    except Exception as e:
+        logger.error(f"エクスポートジョブ {job_id} の実行中にエラー", exc_info=True)
+        ExportJob.objects.filter(pk=job_id).update(
+            status=ExportJob.JobStatus.FAILURE,
+            error_message=str(e),
+            finished_at=timezone.now(),
+        )
+    finally:
+        # エクスポート用の接続 (サーバーサイドカーソル) も含めて閉じる
+        connections.close_all()
+
+
+def purge_expired_export_jobs() -> int:
+    """有効期限切れのジョブと成果物ファイルを削除し、削除件数を返す。"""
+    expired_jobs = ExportJob.objects.filter(expires_at__lte=timezone.now())
+    for file_path in expired_jobs.exclude(file_path="").values_list(
+        "file_path", flat=True
+    ):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+    deleted_count, _ = expired_jobs.delete()
+    return deleted_count
+
+
+def purge_expired_export_jobs_if_due() -> int:
+    """
+    中断されたジョブを失敗にし、前回の削除から EXPORT_JOB_PURGE_INTERVAL_MINUTES 以上
+    経っていれば、期限切れのジョブを削除する。ジョブのAPIが呼ばれるたびに実行する。
+    """
+    global _last_purged_at
+    fail_interrupted_export_jobs()
+    now = timezone.now()
+    interval = timedelta(minutes=settings.EXPORT_JOB_PURGE_INTERVAL_MINUTES)
+    with _purge_lock:
+        if _last_purged_at is not None and now - _last_purged_at < interval:
+            return 0
+        _last_purged_at = now
+    return purge_expired_export_jobs()
+
+
+def fail_interrupted_export_jobs() -> int:
+    """
+    生存確認日時が EXPORT_JOB_STALE_SECONDS 以上更新されていない未完了のジョブを失敗にする。
+    ジョブはプロセス内のスレッドで実行されるため、プロセスが終了すると
+    実行中・待機中のジョブは再開されず、ステータスが更新されないまま残る。
+    他のプロセスで実行中のジョブは生存確認日時が更新され続けるため、対象にならない。
+    """
+    stale_before = timezone.now() - timedelta(seconds=settings.EXPORT_JOB_STALE_SECONDS)
+    interrupted_count = ExportJob.objects.filter(
+        Q(heartbeat_at__lt=stale_before)
+        # 実行プロセスを記録する前に登録されたジョブは登録日時で判定する
+        | Q(heartbeat_at__isnull=True, created_at__lt=stale_before),
+        status__in=_UNFINISHED_STATUSES,
+    ).update(
+        status=ExportJob.JobStatus.FAILURE,
+        error_message="サーバーの再起動によりジョブが中断されました。",
+        finished_at=timezone.now(),
+    )
+    if interrupted_count:
+        logger.warning(f"中断されたエクスポートジョブ {interrupted_count} 件を失敗にしました。")
+    return interrupted_count
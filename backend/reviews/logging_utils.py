@@ -0,0 +1,50 @@
+import json
+import logging
+import random
+
+from django.conf import settings
+
+# LogRecord が標準で持つ属性。これ以外の属性 (extra で渡された値) をJSONに含める
+_RESERVED_RECORD_ATTRS = set(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", (), None))
+) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """ログレコードを1行のJSONとして出力するフォーマッター"""
+
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def get_crawler_logger(ota_key):
+    """OTAごとのロガー (reviews.crawlers.<OTAキー>) を返す。"""
+    return logging.getLogger(f"reviews.crawlers.{ota_key}")
+
+
+def log_review(logger, review_data):
+    """
+    抽出した口コミ1件分の内容をDEBUGレベルで記録する。
+    DEBUGが無効な場合は何もせず、有効な場合も REVIEW_LOG_SAMPLE_RATE の割合だけ記録する。
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= settings.REVIEW_LOG_SAMPLE_RATE:
+        return
+    logger.debug(
+        "口コミを抽出しました (投稿日: %s, 投稿者: %s)",
+        review_data.get("review_date"),
+        review_data.get("reviewer_name"),
+        extra={"review": review_data},
+    )
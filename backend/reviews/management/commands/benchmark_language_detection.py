@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reviews import utils
+from reviews.models import Review
+
+
+class Command(BaseCommand):
+    help = (
+        "保存済みの口コミ本文を使って、言語判定の処理時間を計測します。"
+        "1件ずつ cld2 で判定する従来方式と、バッチ判定 (文字種判定 + メモ化) を比較します。"
+    )
+    #  python manage.py benchmark_language_detection --limit 5000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=5000,
+            help="計測に使う口コミの最大件数 (デフォルト: 5000)",
+        )
+
+    def handle(self, *args, **options):
+        texts = list(
+            Review.objects.exclude(review_comment__isnull=True)
+            .exclude(review_comment="")
+            .order_by("-id")
+            .values_list("review_comment", flat=True)[: options["limit"]]
+        )
+        if not texts:
+            self.stdout.write(self.style.WARNING("計測対象の口コミがありません。"))
+            return
+
+        self.stdout.write(f"{len(texts)}件の口コミで計測します。")
+
+        # 従来方式: 1件ずつ cld2 で判定する
+        started = time.perf_counter()
+        baseline_codes = [utils._detect_with_cld2(text) for text in texts]
+        baseline_seconds = time.perf_counter() - started
+
+        # バッチ判定 (キャッシュが空の状態)
+        utils._language_cache.clear()
+        started = time.perf_counter()
+        batch_codes = utils.detect_languages(texts)
+        cold_seconds = time.perf_counter() - started
+
+        # バッチ判定 (キャッシュ済みの状態)
+        started = time.perf_counter()
+        utils.detect_languages(texts)
+        warm_seconds = time.perf_counter() - started
+
+        script_resolved = sum(
+            1 for text in texts if utils._detect_by_script(text)[0]
+        )
+        matched = sum(
+            1 for baseline, batch in zip(baseline_codes, batch_codes) if baseline == batch
+        )
+
+        def per_text_us(seconds):
+            return seconds / len(texts) * 1_000_000
+
+        self.stdout.write(
+            f"  従来方式 (cld2):        {baseline_seconds:.3f}秒 ({per_text_us(baseline_seconds):.1f}µs/件)"
+        )
+        self.stdout.write(
+            f"  バッチ判定 (初回):      {cold_seconds:.3f}秒 ({per_text_us(cold_seconds):.1f}µs/件)"
+        )
+        self.stdout.write(
+            f"  バッチ判定 (キャッシュ): {warm_seconds:.3f}秒 ({per_text_us(warm_seconds):.1f}µs/件)"
+        )
+        self.stdout.write(
+            f"  文字種のみで判定: {script_resolved}/{len(texts)}件"
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"判定結果の一致率: {matched / len(texts):.1%} ({matched}/{len(texts)}件)"
+            )
+        )
@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Webサーバーの起動時 (URL設定の読み込みまで) に import されてはいけないモジュール
+FORBIDDEN_MODULES = ["selenium", "undetected_chromedriver", "pandas", "openpyxl"]
+
+# django.setup() の後に URL設定 (= 全てのビュー) を読み込む
+_BOOT_SCRIPT = (
+    "import importlib, django; django.setup(); "
+    "from django.conf import settings; importlib.import_module(settings.ROOT_URLCONF)"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "python -X importtime でアプリケーションの起動 (django.setup() と URL設定の読み込み) "
+        "にかかる import 時間を計測します。クローラーやエクスポート用の重いモジュールが "
+        "起動時に読み込まれている場合や、合計時間が上限を超えた場合はエラーで終了します。"
+    )
+    # python manage.py check_import_time
+    # python manage.py check_import_time --max-ms 800 --top 20
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-ms",
+            type=float,
+            default=1500,
+            help="起動時の import 時間の合計の上限 (ミリ秒, デフォルト: 1500)",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=10,
+            help="import 時間の長い順に表示するモジュールの数 (デフォルト: 10)",
+        )
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _BOOT_SCRIPT],
+            capture_output=True,
+            text=True,
+            env=os.environ.copy(),
+        )
+        if result.returncode != 0:
+            raise CommandError(f"起動処理の実行に失敗しました:\n{result.stderr}")
+
+        # 各行は "import time: self [us] | cumulative | <インデント>モジュール名"
+        imports = []
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:"):
+                continue
+            _, cumulative, name = line[len("import time:") :].split("|")
+            if not cumulative.strip().isdigit():
+                continue  # ヘッダー行
+            depth = (len(name) - len(name.lstrip())) // 2
+            imports.append((name.strip(), int(cumulative), depth))
+
+        # 最上位の import の累積時間の合計が、起動時の import 時間の合計になる
+        total_ms = sum(cumulative for _, cumulative, depth in imports if depth == 0) / 1000
+        loaded = {name for name, _, _ in imports}
+        forbidden = [
+            module
+            for module in FORBIDDEN_MODULES
+            if any(name == module or name.startswith(module + ".") for name in loaded)
+        ]
+
+        self.stdout.write(f"起動時の import 時間: {total_ms:.0f}ms ({len(imports)}モジュール)")
+        slowest = sorted(
+            (item for item in imports if item[0].startswith(("reviews", "config"))),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        for name, cumulative, _ in slowest[: options["top"]]:
+            self.stdout.write(f"  {cumulative / 1000:8.1f}ms  {name}")
+
+        errors = []
+        if forbidden:
+            errors.append(f"起動時に読み込まれてはいけないモジュールがあります: {', '.join(forbidden)}")
+        if total_ms > options["max_ms"]:
+            errors.append(f"import 時間が上限を超えました: {total_ms:.0f}ms > {options['max_ms']:.0f}ms")
+        if errors:
+            raise CommandError("\n".join(errors))
+        self.stdout.write(self.style.SUCCESS("import 時間のチェックに成功しました。"))
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.remote_webdriver import (
+    RemoteWebDriverUnavailable,
+    fetch_statuses,
+    rank_endpoints,
+    start_remote_chrome,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "SELENIUM_REMOTE_URLS の各エンドポイントの /status を取得し、空きスロットの数と、"
+        "クローラーがセッションを作成する順番を表示します。"
+        "--open-session を指定すると、実際にセッションを作成して終了するまでを確認します。"
+    )
+    # python manage.py check_webdriver_endpoints
+    # python manage.py check_webdriver_endpoints --urls http://localhost:4444 --open-session
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--urls",
+            nargs="+",
+            default=None,
+            help="確認するエンドポイントのURL。指定がない場合は settings.SELENIUM_REMOTE_URLS。",
+        )
+        parser.add_argument(
+            "--open-session",
+            action="store_true",
+            help="最も空きの多いエンドポイントにセッションを作成し、about:blank を開いて終了します。",
+        )
+
+    def handle(self, *args, **options):
+        if options["urls"]:
+            settings.SELENIUM_REMOTE_URLS = options["urls"]
+        urls = [url.rstrip("/") for url in settings.SELENIUM_REMOTE_URLS]
+        if not urls:
+            raise CommandError(
+                "エンドポイントが設定されていません。SELENIUM_REMOTE_URLS か --urls を指定してください。"
+            )
+
+        statuses = fetch_statuses(urls)
+        for endpoint in statuses:
+            if endpoint.ready:
+                self.stdout.write(
+                    f"  {endpoint.url}: 空きスロット {endpoint.free_slots}/{endpoint.total_slots}"
+                )
+            else:
+                reason = endpoint.error or "ready ではありません"
+                self.stdout.write(self.style.WARNING(f"  {endpoint.url}: 利用不可 ({reason})"))
+
+        ranked = rank_endpoints(statuses)
+        if not ranked:
+            raise CommandError("利用できるエンドポイントがありません。")
+        self.stdout.write(
+            "セッションを作成する順番: " + " > ".join(endpoint.url for endpoint in ranked)
+        )
+
+        if options["open_session"]:
+            from selenium import webdriver
+
+            chrome_options = webdriver.ChromeOptions()
+            chrome_options.add_argument("--no-sandbox")
+            chrome_options.add_argument("--disable-dev-shm-usage")
+            try:
+                driver = start_remote_chrome(chrome_options)
+            except RemoteWebDriverUnavailable as e:
+                raise CommandError(str(e))
+            try:
+                driver.get("about:blank")
+                self.stdout.write(
+                    f"{driver.remote_url} にセッションを作成しました。"
+                    f"(セッションID: {driver.session_id})"
+                )
+            finally:
+                driver.quit()
+
+        self.stdout.write(self.style.SUCCESS("エンドポイントの確認が完了しました。"))
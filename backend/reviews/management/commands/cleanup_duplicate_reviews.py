@@ -1,8 +1,8 @@
 from django.core.management.base import BaseCommand
-from django.db.models import Count
+from django.db.models import Count, F
 from django.db import transaction
 
-from reviews.models import Review 
+from reviews.models import CrawlTarget, Review 
 
 class Command(BaseCommand):
     help = (
@@ -59,6 +59,7 @@ class Command(BaseCommand):
         self.stdout.write(f"{len(duplicates)} 件の重複グループが見つかりました。")
 
         total_deleted_count = 0
+        affected_target_ids = set()
 
         for i, group in enumerate(duplicates):
             count = group.pop("count")
@@ -92,8 +93,15 @@ class Command(BaseCommand):
                 )
                 if not is_dry_run:
                     review.delete()
+                    affected_target_ids.add(review.crawl_target_id)
                 total_deleted_count += 1
 
+        if affected_target_ids:
+            # エクスポートキャッシュを無効化する
+            CrawlTarget.objects.filter(id__in=affected_target_ids).update(
+                data_version=F("data_version") + 1
+            )
+
         self.stdout.write("=" * 40)
         self.stdout.write(self.style.SUCCESS("処理が完了しました。"))
         if is_dry_run:
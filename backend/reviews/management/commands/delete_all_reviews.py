@@ -1,8 +1,9 @@
 import sys
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import F
 
-from reviews.models import Review, ReviewScore 
+from reviews.models import CrawlTarget, Review, ReviewScore 
 
 
 class Command(BaseCommand):
@@ -69,6 +70,9 @@ class Command(BaseCommand):
                 f"  {model.__name__} の全 {deleted_count} 件のデータを削除しました。"
             )
 
+        # エクスポートキャッシュを無効化する
+        CrawlTarget.objects.update(data_version=F("data_version") + 1)
+
         self.stdout.write(self.style.SUCCESS("=" * 60))
         self.stdout.write(
             self.style.SUCCESS("すべてのレビュー関連データの削除が完了しました。")
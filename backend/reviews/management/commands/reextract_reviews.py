@@ -0,0 +1,225 @@
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from reviews.models import ArchivedPage, Hotel
+from reviews.normalizer import OTA_NAME_TO_KEY
+from reviews.reextraction import REEXTRACTORS, init_worker, reextract_chunk
+from reviews.services import save_reviews_to_db
+
+
+class Command(BaseCommand):
+    help = (
+        "アーカイブ済みのHTMLに現在の抽出処理を適用し、口コミを再抽出してDBを更新します。"
+        "ページは複数のワーカープロセスで並列に解析し、DBへの書き込みはこのプロセスが行います。"
+        "ページはローカルのアーカイブから表示するため、ネットワークには接続しません。"
+    )
+    # python manage.py reextract_reviews
+    # python manage.py reextract_reviews --otas 楽天トラベル --workers 8 --chunk-size 10
+    # python manage.py reextract_reviews --hotel "ノボテル奈良" --latest-only --dry-run
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hotel",
+            type=str,
+            default=None,
+            help="対象ホテルの名前。指定がない場合は全ホテルが対象。",
+        )
+        parser.add_argument(
+            "--otas",
+            nargs="+",
+            default=None,
+            help="対象のOTA名のリスト (例: 楽天トラベル 一休)。指定がない場合は全OTAが対象。",
+        )
+        parser.add_argument(
+            "--run",
+            type=int,
+            default=None,
+            help="対象のクロール実行 (CrawlRun) のID。",
+        )
+        parser.add_argument(
+            "--latest-only",
+            action="store_true",
+            help="クロール対象ごとに、最新の実行のページのみを再抽出します。",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="ワーカープロセス数。各ワーカーがブラウザを1つ起動します (デフォルト: CPUコア数)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=20,
+            help="ワーカーに1回で渡す一覧ページの数 (デフォルト: 20)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="抽出件数の報告のみ行い、データベースへの書き込みは行いません。",
+        )
+
+    def handle(self, *args, **options):
+        workers = options["workers"]
+        chunk_size = options["chunk_size"]
+        is_dry_run = options["dry_run"]
+        if workers <= 0:
+            raise CommandError("--workers には1以上の値を指定してください。")
+        if chunk_size <= 0:
+            raise CommandError("--chunk-size には1以上の値を指定してください。")
+
+        pages = ArchivedPage.objects.select_related(
+            "crawl_target__ota", "crawl_target__hotel"
+        )
+        if options["hotel"]:
+            try:
+                hotel = Hotel.objects.get(name=options["hotel"])
+            except Hotel.DoesNotExist:
+                raise CommandError(f"ホテル '{options['hotel']}' がDBに登録されていません。")
+            pages = pages.filter(crawl_target__hotel=hotel)
+        if options["otas"]:
+            pages = pages.filter(crawl_target__ota__name__in=options["otas"])
+        if options["run"]:
+            pages = pages.filter(crawl_run_id=options["run"])
+
+        # クロール対象 -> 実行ID -> ページのリスト (実行・ページ番号の昇順)
+        pages_by_target = defaultdict(lambda: defaultdict(list))
+        targets = {}
+        for page in pages.order_by("crawl_target_id", "crawl_run_id", "page_number", "id"):
+            targets[page.crawl_target_id] = page.crawl_target
+            pages_by_target[page.crawl_target_id][page.crawl_run_id].append(page)
+
+        if not pages_by_target:
+            self.stdout.write(self.style.WARNING("再抽出の対象となるページがありません。"))
+            return
+
+        if is_dry_run:
+            self.stdout.write(
+                self.style.WARNING(
+                    "=== ドライランモードで実行します (データベースの変更は行われません) ==="
+                )
+            )
+
+        # ワーカーはフォークで起動されるため、DB接続を引き継がないよう先に閉じておく
+        connections.close_all()
+
+        started = time.perf_counter()
+        self.total_pages = 0
+        self.total_reviews = 0
+        failed_targets = set()
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as executor:
+            futures = {}
+            remaining_chunks = defaultdict(int)
+            for target_id, pages_by_run in pages_by_target.items():
+                target = targets[target_id]
+                ota_key = OTA_NAME_TO_KEY.get(target.ota.name)
+                if ota_key not in REEXTRACTORS:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"'{target.ota.name}' に対応する抽出処理がないため、{target} をスキップします。"
+                        )
+                    )
+                    continue
+
+                runs = list(pages_by_run.values())
+                if options["latest_only"]:
+                    runs = runs[-1:]
+
+                for run_index, run_pages in enumerate(runs):
+                    list_pages = [
+                        page
+                        for page in run_pages
+                        if page.kind == ArchivedPage.PageKind.LIST
+                    ]
+                    for chunk_index, start in enumerate(
+                        range(0, len(list_pages), chunk_size)
+                    ):
+                        chunk = list_pages[start : start + chunk_size]
+                        # 詳細ページは一覧と同じページ番号で記録されているため、チャンク分だけ渡す
+                        page_numbers = {page.page_number for page in chunk}
+                        detail_pages = {
+                            page.url: page
+                            for page in run_pages
+                            if page.kind == ArchivedPage.PageKind.DETAIL
+                            and page.page_number in page_numbers
+                        }
+                        future = executor.submit(
+                            reextract_chunk,
+                            ota_key,
+                            target.hotel.slug,
+                            chunk,
+                            detail_pages,
+                        )
+                        futures[future] = (target_id, run_index, chunk_index)
+                        remaining_chunks[target_id] += 1
+
+            # 完了したチャンクから順に受け取り、クロール対象の全チャンクが揃ったら書き込む
+            results_by_target = defaultdict(dict)
+            for future in as_completed(futures):
+                target_id, run_index, chunk_index = futures[future]
+                remaining_chunks[target_id] -= 1
+                try:
+                    results_by_target[target_id][(run_index, chunk_index)] = future.result()
+                except Exception as e:
+                    failed_targets.add(target_id)
+                    self.stderr.write(f"  {targets[target_id]} の再抽出に失敗しました: {e}")
+
+                if remaining_chunks[target_id] == 0:
+                    chunk_results = results_by_target.pop(target_id, {})
+                    if target_id not in failed_targets:
+                        self._write_target(
+                            targets[target_id], chunk_results, is_dry_run, started
+                        )
+
+        elapsed = max(time.perf_counter() - started, 0.001)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"再抽出が完了しました。ページ: {self.total_pages}件, 口コミ: {self.total_reviews}件 "
+                f"({elapsed:.1f}秒, {self.total_pages / elapsed:.1f}ページ/秒, "
+                f"{self.total_reviews / elapsed:.1f}件/秒)"
+            )
+        )
+        if failed_targets:
+            raise CommandError(f"{len(failed_targets)}件のクロール対象で再抽出に失敗しました。")
+
+    def _write_target(self, target, chunk_results, is_dry_run, started):
+        """
+        1つのクロール対象の全チャンクの結果をまとめ、口コミを保存する。
+        「さらに表示」形式のOTAでは同じ口コミが実行内の複数のページに現れるため、
+        実行内では最初に現れたものを、実行をまたいでは後の実行のものを採用する。
+        """
+        reviews_by_key = {}
+        run_reviews = {}
+        current_run_index = None
+        for (run_index, _), page_results in sorted(chunk_results.items()):
+            if run_index != current_run_index:
+                reviews_by_key.update(run_reviews)
+                run_reviews = {}
+                current_run_index = run_index
+            for _, reviews in page_results:
+                self.total_pages += 1
+                for review_data in reviews:
+                    key = (
+                        review_data.get("reviewer_name"),
+                        review_data.get("review_date"),
+                        review_data.get("review_comment"),
+                    )
+                    run_reviews.setdefault(key, review_data)
+        reviews_by_key.update(run_reviews)
+
+        reviews_list = list(reviews_by_key.values())
+        self.total_reviews += len(reviews_list)
+        if reviews_list and not is_dry_run:
+            save_reviews_to_db(reviews_list, target)
+
+        elapsed = max(time.perf_counter() - started, 0.001)
+        self.stdout.write(
+            f"  {target}: {len(reviews_list)}件の口コミを再抽出しました。"
+            f" (累計 {self.total_pages}ページ, {self.total_pages / elapsed:.1f}ページ/秒)"
+        )
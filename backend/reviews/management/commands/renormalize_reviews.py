@@ -0,0 +1,185 @@
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from reviews.models import CrawlTarget, Hotel, Review
+from reviews.normalizer import OTA_NAME_TO_KEY, DataNormalizer
+from reviews.utils import normalize_score_column
+
+# 再正規化で書き換える可能性のあるフィールド
+NORMALIZED_FIELDS = ["traveler_type", "purpose_of_visit", "room_type"]
+
+
+class Command(BaseCommand):
+    help = (
+        "保存済みの口コミの *_original の値を、現在の mapping_config.yaml で再正規化します。"
+        "値が変わった行のみを bulk_update で書き戻します。"
+    )
+    # python manage.py renormalize_reviews
+    # python manage.py renormalize_reviews --hotel "ノボテル奈良" --otas 楽天トラベル --dry-run
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hotel",
+            type=str,
+            default=None,
+            help="対象ホテルの名前。指定がない場合は全ホテルが対象。",
+        )
+        parser.add_argument(
+            "--otas",
+            nargs="+",
+            default=None,
+            help="対象のOTA名のリスト (例: 楽天トラベル 一休)。指定がない場合は全OTAが対象。",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=5000,
+            help="1回に読み込む口コミの件数 (デフォルト: 5000)",
+        )
+        parser.add_argument(
+            "--scores",
+            action="store_true",
+            help="総合評価点 (overall_score) も元のスコアと評価尺度から再計算します。",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="変更件数の報告のみ行い、データベースへの書き込みは行いません。",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        recalculate_scores = options["scores"]
+        is_dry_run = options["dry_run"]
+        if chunk_size <= 0:
+            raise CommandError("--chunk-size には1以上の値を指定してください。")
+
+        reviews = Review.objects.all()
+        if options["hotel"]:
+            try:
+                hotel = Hotel.objects.get(name=options["hotel"])
+            except Hotel.DoesNotExist:
+                raise CommandError(f"ホテル '{options['hotel']}' がDBに登録されていません。")
+            reviews = reviews.filter(crawl_target__hotel=hotel)
+        if options["otas"]:
+            reviews = reviews.filter(crawl_target__ota__name__in=options["otas"])
+
+        update_fields = list(NORMALIZED_FIELDS)
+        if recalculate_scores:
+            update_fields.append("overall_score")
+
+        if is_dry_run:
+            self.stdout.write(
+                self.style.WARNING(
+                    "=== ドライランモードで実行します (データベースの変更は行われません) ==="
+                )
+            )
+
+        normalizer = DataNormalizer()
+        # (OTAキー, ホテルslug, 旅行形態, 目的, 部屋タイプ) -> 正規化結果
+        # 元の値は重複が非常に多いため、ユニークな組み合わせごとに1回だけ正規化する
+        normalized_cache = {}
+
+        started = time.perf_counter()
+        last_id = 0
+        scanned_count = 0
+        changed_count = 0
+        changed_target_ids = set()
+
+        while True:
+            rows = list(
+                reviews.filter(id__gt=last_id)
+                .order_by("id")
+                .values(
+                    "id",
+                    "crawl_target_id",
+                    "crawl_target__ota__name",
+                    "crawl_target__hotel__slug",
+                    "traveler_type_original",
+                    "purpose_of_visit_original",
+                    "room_type_original",
+                    "original_score_scale",
+                    "overall_score_original",
+                    "overall_score",
+                    *NORMALIZED_FIELDS,
+                )[:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1]["id"]
+            scanned_count += len(rows)
+
+            # --- 1. ユニークな元の値の組み合わせだけを正規化 ---
+            keys = []
+            for row in rows:
+                key = (
+                    OTA_NAME_TO_KEY.get(row["crawl_target__ota__name"]),
+                    row["crawl_target__hotel__slug"],
+                    row["traveler_type_original"],
+                    row["purpose_of_visit_original"],
+                    row["room_type_original"],
+                )
+                if key not in normalized_cache:
+                    normalized_cache[key] = normalizer.normalize_review_fields(*key)
+                keys.append(key)
+
+            # --- 2. 総合評価点は評価尺度ごとに列単位で再計算 ---
+            new_scores = {}
+            if recalculate_scores:
+                rows_by_scale = defaultdict(list)
+                for row in rows:
+                    if row["original_score_scale"] and row["overall_score_original"]:
+                        rows_by_scale[row["original_score_scale"]].append(row)
+                for scale, scale_rows in rows_by_scale.items():
+                    scores = normalize_score_column(
+                        [row["overall_score_original"] for row in scale_rows], scale
+                    )
+                    for row, score in zip(scale_rows, scores):
+                        if score is not None:
+                            new_scores[row["id"]] = score
+
+            # --- 3. 値が変わった行のみを書き戻す ---
+            now = timezone.now()
+            changed_reviews = []
+            for row, key in zip(rows, keys):
+                new_values = dict(normalized_cache[key])
+                if row["id"] in new_scores:
+                    new_values["overall_score"] = new_scores[row["id"]]
+                if all(row[field] == value for field, value in new_values.items()):
+                    continue
+                review = Review(id=row["id"], updated_at=now, **new_values)
+                if "overall_score" not in new_values:
+                    review.overall_score = row["overall_score"]
+                changed_reviews.append(review)
+                changed_target_ids.add(row["crawl_target_id"])
+
+            changed_count += len(changed_reviews)
+            if changed_reviews and not is_dry_run:
+                with transaction.atomic():
+                    Review.objects.bulk_update(
+                        changed_reviews, update_fields + ["updated_at"]
+                    )
+
+            self.stdout.write(
+                f"  ID {last_id} まで処理: 読込 {scanned_count}件 / 変更 {changed_count}件"
+            )
+
+        if changed_target_ids and not is_dry_run:
+            # エクスポートキャッシュを無効化するため、データバージョンを加算する
+            CrawlTarget.objects.filter(pk__in=changed_target_ids).update(
+                data_version=F("data_version") + 1
+            )
+
+        elapsed = time.perf_counter() - started
+        action = "変更対象" if is_dry_run else "更新"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"再正規化が完了しました。読込: {scanned_count}件, {action}: {changed_count}件, "
+                f"ユニークな組み合わせ: {len(normalized_cache)}件 ({elapsed:.1f}秒)"
+            )
+        )
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.browser_profiles import profile_root, reset_profiles
+from reviews.normalizer import OTA_NAME_TO_KEY
+
+
+class Command(BaseCommand):
+    help = (
+        "クローラーが使い回している永続的なChromeプロファイルを削除します。"
+        "プロファイルが壊れてChromeが起動しない場合や、Cookieをやり直したい場合に使います。"
+        "クロール中のプロファイルは削除されません。"
+    )
+    # python manage.py reset_chrome_profiles
+    # python manage.py reset_chrome_profiles --otas Expedia じゃらん
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--otas",
+            nargs="+",
+            default=None,
+            help="対象のOTA名のリスト (例: Expedia じゃらん)。指定がない場合は全OTAが対象。",
+        )
+
+    def handle(self, *args, **options):
+        ota_keys = None
+        if options["otas"]:
+            unknown = [name for name in options["otas"] if name not in OTA_NAME_TO_KEY]
+            if unknown:
+                raise CommandError(
+                    f"不明なOTA名です: {', '.join(unknown)} "
+                    f"(指定できるOTA: {', '.join(OTA_NAME_TO_KEY)})"
+                )
+            ota_keys = [OTA_NAME_TO_KEY[name] for name in options["otas"]]
+
+        removed, busy = reset_profiles(ota_keys)
+        root = profile_root()
+        for path in removed:
+            self.stdout.write(f"  削除: {path.relative_to(root)}")
+        for path in busy:
+            self.stdout.write(
+                self.style.WARNING(f"  使用中のためスキップ: {path.relative_to(root)}")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Chromeプロファイルの削除が完了しました。削除: {len(removed)}件, "
+                f"スキップ: {len(busy)}件"
+            )
+        )
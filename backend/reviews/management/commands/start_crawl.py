@@ -2,21 +2,42 @@ from django.core.management.base import BaseCommand, CommandError
 from reviews.models import CrawlTarget, Hotel, Ota
 
 from django.utils import timezone
+from reviews.crawl_scheduler import plan_crawl, run_crawl_plan
 from reviews.services import run_crawl_and_save
 
 # from reviews.utils.excel_exporter import export_dataframe_to_excel
 
+# クロール結果として更新する CrawlTarget のフィールド。
+# data_version は save_reviews_to_db が F() で加算するため、保存し直して古い値に戻さないようにする
+CRAWL_STATUS_FIELDS = ["last_crawl_status", "last_crawl_message", "last_crawled_at"]
+
 
 class Command(BaseCommand):
-    help = "指定されたホテルの口コミ情報をクロールしてDBに保存します。"
+    help = (
+        "指定されたホテル (--all-hotels の場合は全ホテル) の口コミ情報をクロールしてDBに保存します。"
+        "--group-by-ota を指定すると、同じOTAのクロール対象を1つのブラウザで続けて処理します。"
+    )
     # python manage.py start_crawl "ノボテル奈良"
     # python manage.py start_crawl "ノボテル奈良" --start-date 2025-04-01 --end-date 2024-07-30
+    # python manage.py start_crawl --all-hotels --group-by-ota --otas 楽天トラベル
 
     def add_arguments(self, parser):
         parser.add_argument(
             "hotel_name",
             type=str,
-            help="クロール対象のホテルの名前 (例: 'ノボテル奈良')",
+            nargs="?",
+            default=None,
+            help="クロール対象のホテルの名前 (例: 'ノボテル奈良')。--all-hotels の場合は不要。",
+        )
+        parser.add_argument(
+            "--all-hotels",
+            action="store_true",
+            help="登録されている全てのホテルのクロール対象を処理します。",
+        )
+        parser.add_argument(
+            "--group-by-ota",
+            action="store_true",
+            help="OTAごとにクロール対象をまとめ、1つのブラウザを使い回して順番に処理します。",
         )
         parser.add_argument(
             "--otas",
@@ -50,26 +71,40 @@ class Command(BaseCommand):
             default=True,  # デフォルトでは True (Excel出力を行う)
             help="処理後のExcelファイルへの口コミ出力を行わないようにします (デフォルトは出力する)。",
         )
+        parser.add_argument(
+            "--max-browsers",
+            type=int,
+            default=None,
+            help="同時に起動するブラウザの数の上限。指定がない場合は settings.CRAWL_MAX_BROWSERS。",
+        )
 
     def handle(self, *args, **options):
         hotel_name = options["hotel_name"]
+        all_hotels = options["all_hotels"]
         otas = options["otas"]
         ota_ids = options["ota_ids"]
         start_date = options["start_date"]
         end_date = options["end_date"]
 
-        try:
+        if all_hotels == bool(hotel_name):
+            raise CommandError("ホテル名か --all-hotels のどちらか一方を指定してください。")
 
-            hotel_master = Hotel.objects.get(name=hotel_name)
+        if all_hotels:
+            hotel_name = "全ホテル"
+            crawl_targets = CrawlTarget.objects.all()
+        else:
+            try:
 
-        except Hotel.DoesNotExist:
-            raise CommandError(
-                f"ホテルマスター '{hotel_name}' がDBに登録されていません。"
-                f'先に `register_hotel "{hotel_name}"` コマンドで登録してください。'
-            )
+                hotel_master = Hotel.objects.get(name=hotel_name)
 
-        crawl_targets = CrawlTarget.objects.filter(hotel=hotel_master).select_related(
-            "ota"
+            except Hotel.DoesNotExist:
+                raise CommandError(
+                    f"ホテルマスター '{hotel_name}' がDBに登録されていません。"
+                    f'先に `register_hotel "{hotel_name}"` コマンドで登録してください。'
+                )
+            crawl_targets = CrawlTarget.objects.filter(hotel=hotel_master)
+        crawl_targets = crawl_targets.select_related("hotel", "ota").order_by(
+            "ota__name", "hotel__name"
         )
 
         ota_filter_msg = ""
@@ -86,6 +121,8 @@ class Command(BaseCommand):
 
         if not crawl_targets.exists():
             ota_filter_msg = f" (OTA: {', '.join(otas)})" if otas else ""
+            if all_hotels:
+                raise CommandError(f"クロール対象{ota_filter_msg}が登録されていません。")
             raise CommandError(
                 f"ホテル '{hotel_name}' はマスターに存在しますが、クロール対象{ota_filter_msg}が設定されていません。"
                 f"`add_crawl_target` コマンドで対象を追加してください。"
@@ -93,41 +130,73 @@ class Command(BaseCommand):
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"--- 処理開始: {hotel_name} ({crawl_targets.count()}件のOTAが対象) ---"
+                f"--- 処理開始: {hotel_name} ({crawl_targets.count()}件のクロール対象) ---"
             )
         )
 
-        # --- 3. OTAごとのループ処理 ---
-        for target in crawl_targets:
+        # --- 3. OTAごとの実行計画 ---
+        # クローラーの特性から実行方法を決め、負荷の大きい対象から順に実行する
+        jobs, unsupported = plan_crawl(crawl_targets)
+        for target in unsupported:
+            message = f"'{target.ota.name}' に対応するクローラーがありません。"
+            target.last_crawl_status = CrawlTarget.CrawlStatus.SUCCESS
+            target.last_crawl_message = message
+            target.last_crawled_at = timezone.now()
+            target.save(update_fields=CRAWL_STATUS_FIELDS)
+            self.stdout.write(
+                self.style.WARNING(f"\n▶ スキップ: {target.hotel.name} {message}")
+            )
+        for job in jobs:
+            target = job.target
             self.stdout.write(
-                f"\n▶ 処理中: {target.ota.name} "
-                f"(Hotel ID: {hotel_master.id}, CrawlTarget ID: {target.id})"
+                f"\n▶ 実行予定: {target.hotel.name} / {target.ota.name} "
+                f"(Hotel ID: {target.hotel_id}, CrawlTarget ID: {target.id}, "
+                f"実行方法: {job.strategy})"
             )
             target.last_crawl_status = CrawlTarget.CrawlStatus.PENDING
             target.last_crawl_message = "クロール処理を待機中です..."
-            target.save()
-            
-            try:
-                success, message = run_crawl_and_save(
-                    target, start_date, end_date, hotel_slug=hotel_master.slug
-                )
+            target.save(update_fields=["last_crawl_status", "last_crawl_message"])
 
+        # --- 4. 実行 ---
+        # --group-by-ota の場合は、OTAごとに1つのブラウザで全ホテルを順番に処理する
+        def run_job(job):
+            return run_crawl_and_save(
+                job.target, start_date, end_date, hotel_slug=job.target.hotel.slug
+            )
+
+        results = run_crawl_plan(
+            jobs,
+            run_job,
+            max_browsers=options["max_browsers"],
+            group_by_ota=options["group_by_ota"],
+        )
+        failures = []
+        for job, result in results:
+            target = job.target
+            label = f"{target.hotel.name} / {target.ota.name}"
+            if isinstance(result, Exception):
+                target.last_crawl_status = CrawlTarget.CrawlStatus.FAILURE
+                target.last_crawl_message = f"コマンド実行中に予期せぬエラーが発生: {str(result)}"
+                self.stdout.write(self.style.ERROR(f"\n■ {label} エラー: {result}"))
+            else:
+                success, message = result
                 target.last_crawl_status = (
                     CrawlTarget.CrawlStatus.SUCCESS
                     if success
                     else CrawlTarget.CrawlStatus.FAILURE
                 )
                 target.last_crawl_message = message
-                target.last_crawled_at = timezone.now()
-                target.save()
-                self.stdout.write(f"  結果: {message}")
-            except Exception as e:
-                    target.last_crawl_status = CrawlTarget.CrawlStatus.FAILURE
-                    target.last_crawl_message = f"コマンド実行中に予期せぬエラーが発生: {str(e)}"
-                    self.stdout.write(self.style.ERROR(f"  エラー: {e}"))
-            finally:
-
-                    target.last_crawled_at = timezone.now()
-                    target.save()
-        
+                self.stdout.write(f"\n■ {label} 結果: {message}")
+            if target.last_crawl_status == CrawlTarget.CrawlStatus.FAILURE:
+                failures.append(label)
+            target.last_crawled_at = timezone.now()
+            target.save(update_fields=CRAWL_STATUS_FIELDS)
+
+        # --- 5. クロール対象ごとの結果の集計 ---
+        self.stdout.write(
+            f"\n成功: {len(jobs) - len(failures)}件, 失敗: {len(failures)}件, "
+            f"スキップ: {len(unsupported)}件"
+        )
+        for label in failures:
+            self.stdout.write(self.style.ERROR(f"  失敗: {label}"))
         self.stdout.write(self.style.SUCCESS("\n--- 全ての処理が完了しました。 ---"))
@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.models import Hotel, TranslationCache
+from reviews.translation import (
+    TranslationError,
+    content_hash,
+    get_translation_backend,
+    pending_translation_reviews,
+    translate_reviews,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "日本語以外の口コミのうち翻訳文が未設定のものを、翻訳バックエンドでまとめて翻訳します。"
+        "翻訳結果は原文ごとにキャッシュされ、同じ本文は1回だけ翻訳されます。"
+    )
+    # python manage.py translate_reviews
+    # python manage.py translate_reviews --otas Expedia --batch-size 100
+    # python manage.py translate_reviews --hotel "ノボテル奈良" --dry-run
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hotel",
+            type=str,
+            default=None,
+            help="対象ホテルの名前。指定がない場合は全ホテルが対象。",
+        )
+        parser.add_argument(
+            "--otas",
+            nargs="+",
+            default=None,
+            help="対象のOTA名のリスト (例: Expedia Googleトラベル)。指定がない場合は全OTAが対象。",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="1回に読み込んで翻訳する口コミの件数 (デフォルト: 50)",
+        )
+        parser.add_argument(
+            "--backend",
+            type=str,
+            default=None,
+            help="翻訳バックエンドのクラスのパス。指定がない場合は settings.TRANSLATION_BACKEND。",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="翻訳待ちの件数の報告のみ行い、翻訳やデータベースへの書き込みは行いません。",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size <= 0:
+            raise CommandError("--batch-size には1以上の値を指定してください。")
+
+        reviews = pending_translation_reviews()
+        if options["hotel"]:
+            try:
+                hotel = Hotel.objects.get(name=options["hotel"])
+            except Hotel.DoesNotExist:
+                raise CommandError(f"ホテル '{options['hotel']}' がDBに登録されていません。")
+            reviews = reviews.filter(crawl_target__hotel=hotel)
+        if options["otas"]:
+            reviews = reviews.filter(crawl_target__ota__name__in=options["otas"])
+
+        if options["dry_run"]:
+            self._report_pending(reviews)
+            return
+
+        try:
+            backend = get_translation_backend(options["backend"])
+        except (ImportError, ImproperlyConfigured) as e:
+            raise CommandError(f"翻訳バックエンドを初期化できません: {e}")
+
+        started = time.perf_counter()
+        try:
+            stats = translate_reviews(reviews, backend=backend, batch_size=batch_size)
+        except TranslationError as e:
+            raise CommandError(f"翻訳に失敗しました: {e}")
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"翻訳が完了しました。口コミ: {stats['reviews']}件, "
+                f"キャッシュ利用: {stats['cache_hits']}件, 翻訳: {stats['translated']}件 "
+                f"({elapsed:.1f}秒)"
+            )
+        )
+
+    def _report_pending(self, reviews):
+        hashes = {
+            content_hash(comment)
+            for comment in reviews.values_list("review_comment", flat=True).iterator()
+        }
+        cached = TranslationCache.objects.filter(
+            target_language=settings.TRANSLATION_TARGET_LANGUAGE,
+            content_sha256__in=list(hashes),
+        ).count()
+        self.stdout.write(
+            self.style.WARNING(
+                "=== ドライランモードで実行します (データベースの変更は行われません) ==="
+            )
+        )
+        self.stdout.write(
+            f"翻訳待ちの口コミ: {reviews.count()}件, ユニークな本文: {len(hashes)}件 "
+            f"(うちキャッシュ済み: {cached}件)"
+        )
@@ -0,0 +1,137 @@
+"""
+Prometheus 形式の運用メトリクス。
+
+複数プロセス (gunicorn のワーカーなど) で動かす場合は、プロセス起動前に
+環境変数 PROMETHEUS_MULTIPROC_DIR に書き込み可能な空ディレクトリを指定する。
+各プロセスのメトリクスはそのディレクトリのファイルに書き出され、
+/metrics へのリクエスト時に集計される。
+終了したワーカーのゲージのファイルは、gunicorn.conf.py の child_exit で削除する
+(gunicorn 以外で動かす場合は、プロセスの終了時に multiprocess.mark_process_dead(pid) を呼ぶ)。
+ディレクトリはサーバーの起動ごとに空にしておくこと。
+"""
+import os
+import time
+
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from .tracing import BROWSER_LAUNCH, PAGES, REVIEWS_EXTRACTED, WEBDRIVER, current_trace
+
+# --- クロール ---
+PAGES_FETCHED = Counter(
+    "crawler_pages_fetched_total", "取得した口コミ一覧ページ数", ["ota"]
+)
+REVIEWS_EXTRACTED_TOTAL = Counter(
+    "crawler_reviews_extracted_total", "クローラーが抽出した口コミ数", ["ota"]
+)
+REVIEWS_SAVED = Counter(
+    "crawler_reviews_saved_total",
+    "DB保存結果ごとの口コミ数 (result: new / updated / skipped)",
+    ["ota", "result"],
+)
+CRAWL_DURATION = Histogram(
+    "crawler_crawl_duration_seconds",
+    "クロール1回あたりの所要時間",
+    ["ota", "status"],
+    buckets=(10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200),
+)
+BROWSER_LAUNCHES = Counter(
+    "crawler_browser_launches_total", "ブラウザ (Chrome) の起動回数", ["ota"]
+)
+WEBDRIVER_COMMAND_LATENCY = Histogram(
+    "crawler_webdriver_command_seconds",
+    "WebDriverコマンド1回あたりの応答時間",
+    ["command"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+# --- クロール用スレッドプール ---
+EXECUTOR_QUEUED = Gauge(
+    "crawler_executor_queued_tasks",
+    "スレッドプールで実行待ちのコマンド数",
+    multiprocess_mode="livesum",
+)
+EXECUTOR_RUNNING = Gauge(
+    "crawler_executor_running_tasks",
+    "スレッドプールで実行中のコマンド数",
+    multiprocess_mode="livesum",
+)
+
+# --- エクスポート ---
+EXPORT_DURATION = Histogram(
+    "export_duration_seconds",
+    "エクスポートファイルの生成時間 (mode: sync / job)",
+    ["mode"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+EXPORT_BYTES = Histogram(
+    "export_file_bytes",
+    "生成したエクスポートファイルのサイズ",
+    ["mode"],
+    buckets=(1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8),
+)
+
+
+def observe_crawl_run(ota_name, trace, success):
+    """1回分のクロールのトレースから、クロール関連のメトリクスを記録する。"""
+    PAGES_FETCHED.labels(ota_name).inc(trace.counters.get(PAGES, 0))
+    REVIEWS_EXTRACTED_TOTAL.labels(ota_name).inc(
+        trace.counters.get(REVIEWS_EXTRACTED, 0)
+    )
+    BROWSER_LAUNCHES.labels(ota_name).inc(trace.phase_counts.get(BROWSER_LAUNCH, 0))
+    CRAWL_DURATION.labels(ota_name, "success" if success else "failure").observe(
+        trace.total_seconds
+    )
+
+
+def observe_saved_reviews(ota_name, saved_count, updated_count, skipped_count):
+    REVIEWS_SAVED.labels(ota_name, "new").inc(saved_count)
+    REVIEWS_SAVED.labels(ota_name, "updated").inc(updated_count)
+    REVIEWS_SAVED.labels(ota_name, "skipped").inc(skipped_count)
+
+
+def instrument_webdriver(driver):
+    """
+    WebDriverインスタンスの execute をラップし、コマンドごとの応答時間を記録する。
+    WebElement の操作も親ドライバーの execute を経由するため、まとめて計測される。
+    セッションで使い回すドライバーは、2回目以降は何もしない。
+    """
+    if getattr(driver, "_instrumented", False):
+        return driver
+    original_execute = driver.execute
+
+    def execute(driver_command, params=None):
+        started = time.perf_counter()
+        try:
+            return original_execute(driver_command, params)
+        finally:
+            elapsed = time.perf_counter() - started
+            WEBDRIVER_COMMAND_LATENCY.labels(driver_command).observe(elapsed)
+            trace = current_trace()
+            if trace is not None:
+                # ブラウザ側の処理待ち時間として実行履歴にも計上する
+                trace.add_phase(WEBDRIVER, elapsed)
+
+    driver.execute = execute
+    driver._instrumented = True
+    return driver
+
+
+def metrics_view(request):
+    """Prometheus のスクレイプ用エンドポイント"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        # 全プロセスのメトリクスファイルを集計する
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
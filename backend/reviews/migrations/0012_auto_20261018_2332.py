@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 23:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0011_crawltarget_hotel_id_in_ota'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawltarget',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0, help_text='口コミデータが保存・更新されるたびに加算される。エクスポートキャッシュの無効化に利用。', verbose_name='データバージョン'),
+        ),
+        migrations.AlterField(
+            model_name='reviewscore',
+            name='category',
+            field=models.CharField(choices=[('LOCATION', '立地'), ('SERVICE', 'サービス'), ('CLEANLINESS', '清潔感'), ('FACILITIES', '施設'), ('ROOM', '客室'), ('BATH', '風呂'), ('FOOD', '食事'), ('BREAKFAST', '朝食'), ('DINNER', '夕食'), ('SATISFACTION', '満足度')], max_length=20, verbose_name='評価項目'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.25 on 2026-10-18 23:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0012_auto_20261018_2332'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('ota_ids', models.JSONField(blank=True, default=list, verbose_name='OTA IDリスト')),
+                ('start_date', models.DateField(blank=True, null=True, verbose_name='開始日')),
+                ('end_date', models.DateField(blank=True, null=True, verbose_name='終了日')),
+                ('file_format', models.CharField(default='xlsx', max_length=10, verbose_name='出力形式')),
+                ('status', models.CharField(choices=[('PENDING', '待機中'), ('RUNNING', '処理中'), ('SUCCESS', '完了'), ('FAILURE', '失敗')], default='PENDING', max_length=10, verbose_name='ステータス')),
+                ('rows_written', models.PositiveIntegerField(default=0, verbose_name='書き込み済み行数')),
+                ('total_rows', models.PositiveIntegerField(blank=True, null=True, verbose_name='総行数')),
+                ('file_path', models.CharField(blank=True, max_length=512, verbose_name='成果物のパス')),
+                ('file_size', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ファイルサイズ')),
+                ('error_message', models.TextField(blank=True, null=True, verbose_name='エラー詳細')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='登録日時')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='開始日時')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='完了日時')),
+                ('expires_at', models.DateTimeField(blank=True, help_text='この日時を過ぎると成果物は削除される', null=True, verbose_name='有効期限')),
+                ('hotel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='reviews.hotel', verbose_name='ホテル')),
+            ],
+            options={
+                'verbose_name': 'エクスポートジョブ',
+                'verbose_name_plural': 'エクスポートジョブ',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
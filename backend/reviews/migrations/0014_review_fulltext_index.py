@@ -0,0 +1,30 @@
+from django.db import migrations
+
+INDEX_NAME = "review_comment_fulltext"
+
+
+def add_fulltext_index(apps, schema_editor):
+    # ngramパーサーによるFULLTEXTインデックスはMySQL専用
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(
+        f"ALTER TABLE reviews_review ADD FULLTEXT INDEX {INDEX_NAME} "
+        "(review_comment, translated_review_comment) WITH PARSER ngram"
+    )
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    schema_editor.execute(f"ALTER TABLE reviews_review DROP INDEX {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0013_exportjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
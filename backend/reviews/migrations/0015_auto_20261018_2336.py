@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 23:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0014_review_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['crawl_target', 'review_date', 'id'], name='review_target_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['review_date', 'id'], name='review_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 23:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0015_auto_20261018_2336'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CrawlRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', '処理中'), ('SUCCESS', '成功'), ('FAILURE', '失敗'), ('NEVER_RUN', '未実行')], max_length=10, verbose_name='ステータス')),
+                ('message', models.TextField(blank=True, null=True, verbose_name='結果メッセージ')),
+                ('started_at', models.DateTimeField(verbose_name='開始日時')),
+                ('finished_at', models.DateTimeField(verbose_name='終了日時')),
+                ('duration_seconds', models.FloatField(verbose_name='所要時間（秒）')),
+                ('phase_timings', models.JSONField(blank=True, default=dict, help_text='{"フェーズ名": {"seconds": 秒数, "count": 回数}} の形式', verbose_name='フェーズ別所要時間')),
+                ('counters', models.JSONField(blank=True, default=dict, verbose_name='カウンター')),
+                ('crawl_target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='crawl_runs', to='reviews.crawltarget', verbose_name='クロール対象')),
+            ],
+            options={
+                'verbose_name': 'クロール実行履歴',
+                'verbose_name_plural': 'クロール実行履歴',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='crawlrun',
+            index=models.Index(fields=['crawl_target', 'started_at'], name='crawlrun_target_started_idx'),
+        ),
+    ]
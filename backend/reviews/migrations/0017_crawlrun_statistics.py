@@ -0,0 +1,79 @@
+# Generated by Django 3.2.25 on 2026-10-18 23:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_statistics(apps, schema_editor):
+    """既存の実行履歴に、crawl_target のOTAとカウンターから集計列を埋める"""
+    CrawlRun = apps.get_model("reviews", "CrawlRun")
+    for run in CrawlRun.objects.select_related("crawl_target").iterator():
+        run.ota_id = run.crawl_target.ota_id
+        run.pages_visited = run.counters.get("pages", 0)
+        run.reviews_seen = run.counters.get("reviews_extracted", 0)
+        run.browser_seconds = run.phase_timings.get("browser_launch", {}).get(
+            "seconds", 0
+        )
+        run.save(
+            update_fields=["ota", "pages_visited", "reviews_seen", "browser_seconds"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0016_crawlrun'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crawlrun',
+            name='browser_seconds',
+            field=models.FloatField(default=0, help_text='ブラウザ起動とWebDriverコマンドの応答待ちの合計', verbose_name='ブラウザ処理時間（秒）'),
+        ),
+        migrations.AddField(
+            model_name='crawlrun',
+            name='bytes_downloaded',
+            field=models.PositiveBigIntegerField(default=0, help_text='Resource Timing API による概算', verbose_name='受信バイト数'),
+        ),
+        migrations.AddField(
+            model_name='crawlrun',
+            name='error_class',
+            field=models.CharField(blank=True, help_text='例外のクラス名', max_length=100, null=True, verbose_name='エラー種別'),
+        ),
+        migrations.AddField(
+            model_name='crawlrun',
+            name='ota',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='crawl_runs', to='reviews.ota', verbose_name='OTA'),
+        ),
+        migrations.AddField(
+            model_name='crawlrun',
+            name='pages_visited',
+            field=models.PositiveIntegerField(default=0, verbose_name='訪問ページ数'),
+        ),
+        migrations.AddField(
+            model_name='crawlrun',
+            name='reviews_new',
+            field=models.PositiveIntegerField(default=0, verbose_name='新規口コミ数'),
+        ),
+        migrations.AddField(
+            model_name='crawlrun',
+            name='reviews_seen',
+            field=models.PositiveIntegerField(default=0, verbose_name='抽出口コミ数'),
+        ),
+        migrations.AddField(
+            model_name='crawlrun',
+            name='reviews_skipped',
+            field=models.PositiveIntegerField(default=0, verbose_name='スキップ口コミ数'),
+        ),
+        migrations.AddField(
+            model_name='crawlrun',
+            name='reviews_updated',
+            field=models.PositiveIntegerField(default=0, verbose_name='更新口コミ数'),
+        ),
+        migrations.AddIndex(
+            model_name='crawlrun',
+            index=models.Index(fields=['ota', 'started_at'], name='crawlrun_ota_started_idx'),
+        ),
+        migrations.RunPython(populate_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-18 23:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0017_crawlrun_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField(verbose_name='ページ番号')),
+                ('kind', models.CharField(choices=[('LIST', '口コミ一覧'), ('DETAIL', '口コミ詳細')], default='LIST', max_length=10, verbose_name='種別')),
+                ('url', models.CharField(blank=True, max_length=2000, verbose_name='URL')),
+                ('content_sha256', models.CharField(db_index=True, max_length=64, verbose_name='HTMLのSHA-256')),
+                ('size', models.PositiveIntegerField(verbose_name='サイズ（圧縮前のバイト数）')),
+                ('fetched_at', models.DateTimeField(verbose_name='取得日時')),
+                ('crawl_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_pages', to='reviews.crawlrun', verbose_name='クロール実行')),
+                ('crawl_target', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_pages', to='reviews.crawltarget', verbose_name='クロール対象')),
+            ],
+            options={
+                'verbose_name': 'アーカイブ済みページ',
+                'verbose_name_plural': 'アーカイブ済みページ',
+                'ordering': ['crawl_target', 'crawl_run', 'page_number', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedpage',
+            index=models.Index(fields=['crawl_target', 'crawl_run', 'page_number'], name='archivedpage_target_run_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0018_archivedpage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_sha256', models.CharField(max_length=64, verbose_name='原文のSHA-256')),
+                ('target_language', models.CharField(max_length=10, verbose_name='翻訳先の言語コード')),
+                ('source_language', models.CharField(blank=True, max_length=10, null=True, verbose_name='原文の言語コード')),
+                ('translated_text', models.TextField(verbose_name='翻訳文')),
+                ('backend', models.CharField(max_length=100, verbose_name='翻訳バックエンド')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='作成日時')),
+            ],
+            options={
+                'verbose_name': '翻訳キャッシュ',
+                'verbose_name_plural': '翻訳キャッシュ',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='translationcache',
+            constraint=models.UniqueConstraint(fields=('content_sha256', 'target_language'), name='unique_translation_per_content'),
+        ),
+    ]
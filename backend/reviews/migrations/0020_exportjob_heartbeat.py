@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0019_translationcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='一定時間更新されない未完了のジョブは、プロセスの終了で中断されたものとみなす', null=True, verbose_name='生存確認日時'),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='worker_id',
+            field=models.CharField(blank=True, max_length=255, verbose_name='実行プロセス'),
+        ),
+    ]
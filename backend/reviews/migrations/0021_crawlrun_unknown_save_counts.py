@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:42
+
+from django.db import migrations, models
+
+
+def mark_unknown_save_counts(apps, schema_editor):
+    """
+    DB保存結果の内訳を記録する前 (0017 より前) の実行履歴は、内訳を不明 (NULL) にする。
+    記録を始めた後の実行では、保存処理が動くと counters に reviews_new が必ず入る。
+    口コミを抽出したのに counters に reviews_new が無い実行履歴が対象。
+    """
+    CrawlRun = apps.get_model("reviews", "CrawlRun")
+    unknown_ids = [
+        run.id
+        for run in CrawlRun.objects.filter(reviews_seen__gt=0).only("id", "counters").iterator()
+        if "reviews_new" not in (run.counters or {})
+    ]
+    CrawlRun.objects.filter(id__in=unknown_ids).update(
+        reviews_new=None, reviews_updated=None, reviews_skipped=None
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0020_exportjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='crawlrun',
+            name='reviews_new',
+            field=models.PositiveIntegerField(blank=True, default=0, null=True, verbose_name='新規口コミ数'),
+        ),
+        migrations.AlterField(
+            model_name='crawlrun',
+            name='reviews_skipped',
+            field=models.PositiveIntegerField(blank=True, default=0, null=True, verbose_name='スキップ口コミ数'),
+        ),
+        migrations.AlterField(
+            model_name='crawlrun',
+            name='reviews_updated',
+            field=models.PositiveIntegerField(blank=True, default=0, null=True, verbose_name='更新口コミ数'),
+        ),
+        migrations.RunPython(mark_unknown_save_counts, migrations.RunPython.noop),
+    ]
@@ -145,6 +145,11 @@ class CrawlTarget(models.Model):
         blank=True,
         help_text="このホテルの口コミ一覧ページのURL",
     )
+    data_version = models.PositiveIntegerField(
+        "データバージョン",
+        default=0,
+        help_text="口コミデータが保存・更新されるたびに加算される。エクスポートキャッシュの無効化に利用。",
+    )
 
     created_at = models.DateTimeField("登録日時", auto_now_add=True)
     updated_at = models.DateTimeField("更新日時", auto_now=True)
@@ -308,6 +313,14 @@ class Review(models.Model):
         verbose_name = "口コミ情報"
         verbose_name_plural = "口コミ情報"
         ordering = ["-review_date"]
+        indexes = [
+            # キーセットページネーション (review_date, id) 用の複合インデックス
+            models.Index(
+                fields=["crawl_target", "review_date", "id"],
+                name="review_target_date_id_idx",
+            ),
+            models.Index(fields=["review_date", "id"], name="review_date_id_idx"),
+        ]
 
     def __str__(self):
 
@@ -351,3 +364,229 @@ class ReviewScore(models.Model):
 
     def __str__(self):
         return f"{self.review} - {self.get_category_display()}: {self.score}"
+
+
+# -----------------------------------------------------------------------------
+# ExportJobモデル: 非同期エクスポート処理の状態と成果物を管理
+# -----------------------------------------------------------------------------
+class ExportJob(models.Model):
+    """バックグラウンドで実行されるエクスポート処理のジョブ情報を格納するモデル"""
+
+    class JobStatus(models.TextChoices):
+        PENDING = "PENDING", "待機中"
+        RUNNING = "RUNNING", "処理中"
+        SUCCESS = "SUCCESS", "完了"
+        FAILURE = "FAILURE", "失敗"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    hotel = models.ForeignKey(
+        Hotel,
+        verbose_name="ホテル",
+        on_delete=models.CASCADE,
+        related_name="export_jobs",
+    )
+    ota_ids = models.JSONField("OTA IDリスト", default=list, blank=True)
+    start_date = models.DateField("開始日", null=True, blank=True)
+    end_date = models.DateField("終了日", null=True, blank=True)
+    file_format = models.CharField("出力形式", max_length=10, default="xlsx")
+
+    status = models.CharField(
+        "ステータス",
+        max_length=10,
+        choices=JobStatus.choices,
+        default=JobStatus.PENDING,
+    )
+    rows_written = models.PositiveIntegerField("書き込み済み行数", default=0)
+    total_rows = models.PositiveIntegerField("総行数", null=True, blank=True)
+    file_path = models.CharField("成果物のパス", max_length=512, blank=True)
+    file_size = models.PositiveBigIntegerField("ファイルサイズ", null=True, blank=True)
+    error_message = models.TextField("エラー詳細", null=True, blank=True)
+
+    created_at = models.DateTimeField("登録日時", auto_now_add=True)
+    started_at = models.DateTimeField("開始日時", null=True, blank=True)
+    finished_at = models.DateTimeField("完了日時", null=True, blank=True)
+    expires_at = models.DateTimeField(
+        "有効期限",
+        null=True,
+        blank=True,
+        help_text="この日時を過ぎると成果物は削除される",
+    )
+    # ジョブを実行するプロセス ("ホスト名:PID") と、そのプロセスが生存を最後に記録した日時
+    worker_id = models.CharField("実行プロセス", max_length=255, blank=True)
+    heartbeat_at = models.DateTimeField(
+        "生存確認日時",
+        null=True,
+        blank=True,
+        help_text="一定時間更新されない未完了のジョブは、プロセスの終了で中断されたものとみなす",
+    )
+
+    class Meta:
+        verbose_name = "エクスポートジョブ"
+        verbose_name_plural = "エクスポートジョブ"
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"ExportJob ({self.id}) for {self.hotel.name}: {self.status}"
+
+    @property
+    def is_expired(self):
+        return self.expires_at is not None and self.expires_at <= timezone.now()
+
+
+# -----------------------------------------------------------------------------
+# CrawlRunモデル: クロール1回ごとの実行結果と計測値を記録
+# -----------------------------------------------------------------------------
+class CrawlRun(models.Model):
+    """クロール1回分の実行結果と、フェーズごとの所要時間を格納するモデル"""
+
+    crawl_target = models.ForeignKey(
+        CrawlTarget,
+        verbose_name="クロール対象",
+        on_delete=models.CASCADE,
+        related_name="crawl_runs",
+    )
+    # OTA別の推移を crawl_target を結合せずに引けるよう非正規化して持つ
+    ota = models.ForeignKey(
+        Ota,
+        verbose_name="OTA",
+        on_delete=models.CASCADE,
+        related_name="crawl_runs",
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        "ステータス",
+        max_length=10,
+        choices=CrawlTarget.CrawlStatus.choices,
+    )
+    message = models.TextField("結果メッセージ", blank=True, null=True)
+    error_class = models.CharField(
+        "エラー種別", max_length=100, blank=True, null=True, help_text="例外のクラス名"
+    )
+    started_at = models.DateTimeField("開始日時")
+    finished_at = models.DateTimeField("終了日時")
+    duration_seconds = models.FloatField("所要時間（秒）")
+    browser_seconds = models.FloatField(
+        "ブラウザ処理時間（秒）",
+        default=0,
+        help_text="ブラウザ起動とWebDriverコマンドの応答待ちの合計",
+    )
+    pages_visited = models.PositiveIntegerField("訪問ページ数", default=0)
+    reviews_seen = models.PositiveIntegerField("抽出口コミ数", default=0)
+    # DB保存結果の内訳。記録を始める前の実行履歴では不明 (NULL)
+    reviews_new = models.PositiveIntegerField("新規口コミ数", default=0, null=True, blank=True)
+    reviews_updated = models.PositiveIntegerField("更新口コミ数", default=0, null=True, blank=True)
+    reviews_skipped = models.PositiveIntegerField("スキップ口コミ数", default=0, null=True, blank=True)
+    bytes_downloaded = models.PositiveBigIntegerField(
+        "受信バイト数", default=0, help_text="Resource Timing API による概算"
+    )
+    phase_timings = models.JSONField(
+        "フェーズ別所要時間",
+        default=dict,
+        blank=True,
+        help_text='{"フェーズ名": {"seconds": 秒数, "count": 回数}} の形式',
+    )
+    counters = models.JSONField("カウンター", default=dict, blank=True)
+
+    class Meta:
+        verbose_name = "クロール実行履歴"
+        verbose_name_plural = "クロール実行履歴"
+        ordering = ["-started_at"]
+        indexes = [
+            models.Index(
+                fields=["crawl_target", "started_at"],
+                name="crawlrun_target_started_idx",
+            ),
+            models.Index(
+                fields=["ota", "started_at"],
+                name="crawlrun_ota_started_idx",
+            ),
+        ]
+
+    @property
+    def reviews_per_minute(self):
+        """1分あたりの抽出口コミ数 (スループット)"""
+        if not self.duration_seconds:
+            return None
+        return self.reviews_seen * 60 / self.duration_seconds
+
+    def __str__(self):
+        return f"CrawlRun ({self.crawl_target}) at {self.started_at}: {self.status}"
+
+
+class ArchivedPage(models.Model):
+    """
+    クロール中に取得したページのHTMLの記録。
+    HTML本体は reviews.archive のストアに SHA-256 をキーとして圧縮保存され、
+    同じ内容のページは複数の実行から共有される。
+    """
+
+    class PageKind(models.TextChoices):
+        LIST = "LIST", "口コミ一覧"
+        DETAIL = "DETAIL", "口コミ詳細"
+
+    crawl_target = models.ForeignKey(
+        CrawlTarget,
+        verbose_name="クロール対象",
+        on_delete=models.CASCADE,
+        related_name="archived_pages",
+    )
+    crawl_run = models.ForeignKey(
+        CrawlRun,
+        verbose_name="クロール実行",
+        on_delete=models.SET_NULL,
+        related_name="archived_pages",
+        null=True,
+        blank=True,
+    )
+    page_number = models.PositiveIntegerField("ページ番号")
+    kind = models.CharField(
+        "種別", max_length=10, choices=PageKind.choices, default=PageKind.LIST
+    )
+    url = models.CharField("URL", max_length=2000, blank=True)
+    content_sha256 = models.CharField("HTMLのSHA-256", max_length=64, db_index=True)
+    size = models.PositiveIntegerField("サイズ（圧縮前のバイト数）")
+    fetched_at = models.DateTimeField("取得日時")
+
+    class Meta:
+        verbose_name = "アーカイブ済みページ"
+        verbose_name_plural = "アーカイブ済みページ"
+        ordering = ["crawl_target", "crawl_run", "page_number", "id"]
+        indexes = [
+            models.Index(
+                fields=["crawl_target", "crawl_run", "page_number"],
+                name="archivedpage_target_run_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"ArchivedPage ({self.crawl_target}) #{self.page_number}: {self.content_sha256[:12]}"
+
+
+class TranslationCache(models.Model):
+    """
+    口コミ本文の翻訳結果のキャッシュ。
+    原文の SHA-256 と翻訳先の言語をキーとし、同じ本文は1回だけ翻訳する。
+    """
+
+    content_sha256 = models.CharField("原文のSHA-256", max_length=64)
+    target_language = models.CharField("翻訳先の言語コード", max_length=10)
+    source_language = models.CharField(
+        "原文の言語コード", max_length=10, null=True, blank=True
+    )
+    translated_text = models.TextField("翻訳文")
+    backend = models.CharField("翻訳バックエンド", max_length=100)
+    created_at = models.DateTimeField("作成日時", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "翻訳キャッシュ"
+        verbose_name_plural = "翻訳キャッシュ"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_sha256", "target_language"],
+                name="unique_translation_per_content",
+            )
+        ]
+
+    def __str__(self):
+        return f"TranslationCache ({self.target_language}): {self.content_sha256[:12]}"
@@ -3,6 +3,8 @@ from pathlib import Path
 import re
 from functools import lru_cache
 
+from .tracing import NORMALIZATION, traced
+
 BASE_DIR = Path(__file__).resolve().parent
 CONFIG_PATH = BASE_DIR / "mapping_config.yaml"
 
@@ -12,6 +14,17 @@ TRAVELER_TYPE_PRIORITY = ["家族", "カップル・夫婦", "友達", "一人"]
 # レジャー目的を推定するための旅行形態リスト
 LEISURE_DERIVED_TRAVELER_TYPES = ["家族", "カップル・夫婦", "友達", "一人"]
 
+# Ota.name -> mapping_config.yaml / クローラー内で使うOTAキー
+OTA_NAME_TO_KEY = {
+    "楽天トラベル": "rakuten",
+    "じゃらん": "jalan",
+    "一休": "ikyu",
+    "Googleトラベル": "google",
+    "Expedia": "expedia",
+}
+# 旅行形態と目的を1つのタグ文字列から判定するOTA
+TAG_BASED_OTA_KEYS = {"expedia"}
+
 
 class DataNormalizer:
 
@@ -50,11 +63,13 @@ class DataNormalizer:
                 reverse_map[original_value] = normalized_value
         return reverse_map
 
+    @traced(NORMALIZATION)
     def normalize_traveler_type(self, original_value):
         if not original_value:
             return None
         return self.traveler_type_reverse_map.get(original_value, "その他")
 
+    @traced(NORMALIZATION)
     def normalize_purpose(self, original_value):
         if not original_value:
             return None
@@ -79,6 +94,7 @@ class DataNormalizer:
         pattern_list.sort(key=lambda x: len(x[0]), reverse=True)
         return pattern_list
 
+    @traced(NORMALIZATION)
     def normalize_from_tags(self, tags_input, ota_name=None):
         """
         【修正版】タグのリストまたは文字列から、旅行タイプと目的を正規化する。
@@ -160,6 +176,7 @@ class DataNormalizer:
         except KeyError:
             return []
 
+    @traced(NORMALIZATION)
     def normalize_room_type(self, original_room_name, hotel_slug, ota_name):
         """
         元の部屋名を、ホテルとOTAに合わせて正規化する（部分一致）。
@@ -178,3 +195,33 @@ class DataNormalizer:
 
         # どのパターンにもマッチしなかった場合は、元の名前をそのまま返す
         return original_room_name
+
+    def normalize_review_fields(
+        self,
+        ota_key,
+        hotel_slug,
+        traveler_type_original,
+        purpose_of_visit_original,
+        room_type_original,
+    ):
+        """
+        保存済みの *_original の値から、正規化済みの旅行形態・目的・部屋タイプを求める。
+        クローラーと同じ規則を適用するため、再正規化 (renormalize_reviews) で利用する。
+        """
+        if ota_key in TAG_BASED_OTA_KEYS:
+            tags = self.normalize_from_tags(traveler_type_original, ota_key)
+            traveler_type = tags["traveler_type"]
+            purpose_of_visit = tags["purpose"]
+        else:
+            traveler_type = self.normalize_traveler_type(traveler_type_original)
+            purpose_of_visit = self.normalize_purpose(
+                purpose_of_visit_original or traveler_type_original
+            )
+
+        return {
+            "traveler_type": traveler_type,
+            "purpose_of_visit": purpose_of_visit,
+            "room_type": self.normalize_room_type(
+                room_type_original, hotel_slug, ota_key
+            ),
+        }
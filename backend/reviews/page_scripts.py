@@ -0,0 +1,109 @@
+"""
+ブラウザ内で実行するJavaScriptの共通処理。
+
+Chromeでの描画が必要なOTA (Expedia, 一休, Google) では、口コミの各項目を
+Pythonから要素ごとに find_element で辿るとWebDriverの往復が口コミ件数 × 項目数
+だけ発生する。各クローラーはページ内の口コミの生の値をまとめて取り出すスクリプトを
+持ち、run_page_script() で1回の execute_script として実行する。正規化はPython側で行う。
+省略された本文の展開も、expand_all() でページ内のボタンをまとめて押して1回だけ待つ。
+
+「さらに表示」やスクロールで口コミが追記され続けるOTA (Expedia, Google) では、
+取り出し済みの口コミ要素を replaceWithPlaceholders() で中身の無いプレースホルダーに
+置き換え、DOMの大きさ (ブラウザのメモリと検索のコスト) を口コミ件数に比例させない。
+"""
+from .tracing import WAIT, phase
+
+# 取り出し済みの口コミを置き換えたプレースホルダーに付ける属性
+PLACEHOLDER_ATTRIBUTE = "data-crawl-placeholder"
+
+# 各スクリプトの先頭に付ける補助関数
+_JS_HELPERS = f'const PLACEHOLDER_ATTRIBUTE = "{PLACEHOLDER_ATTRIBUTE}";' + """
+function text(el) {
+    return el ? el.innerText.trim() : null;
+}
+function xpathFirst(context, xpath) {
+    return document.evaluate(
+        xpath, context, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+    ).singleNodeValue;
+}
+function xpathAll(context, xpath) {
+    const result = document.evaluate(
+        xpath, context, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+    );
+    const nodes = [];
+    for (let i = 0; i < result.snapshotLength; i++) {
+        nodes.push(result.snapshotItem(i));
+    }
+    return nodes;
+}
+function xpathString(context, xpath) {
+    return document.evaluate(
+        xpath, context, null, XPathResult.STRING_TYPE, null
+    ).stringValue;
+}
+// 要素の子孫を全て取り除き、同じ高さの空のプレースホルダーにする。
+// 要素自体は残すため、ページ側のスクリプトが持つ参照やスクロール位置は崩れない
+function replaceWithPlaceholders(elements) {
+    // レイアウトの再計算を1回にするため、高さを先にまとめて読み取る
+    const heights = elements.map((el) => el.offsetHeight);
+    elements.forEach((el, i) => {
+        el.style.height = heights[i] + "px";
+        el.replaceChildren();
+        el.setAttribute(PLACEHOLDER_ATTRIBUTE, "");
+    });
+}
+"""
+
+
+def run_page_script(driver, script, *args):
+    """
+    補助関数 (text, xpathFirst, xpathAll, xpathString, replaceWithPlaceholders) を
+    付けてスクリプトを実行し、その戻り値を返す。引数はスクリプト内で arguments として
+    参照できる。
+    """
+    return driver.execute_script(_JS_HELPERS + script, *args)
+
+
+# ページ内の全ての展開ボタンを押し、DOMの変更が quietMs の間止まるまで待つ。
+# 変更が一度も起きない場合や止まらない場合は timeoutMs で打ち切る。押した数を返す
+_EXPAND_ALL_SCRIPT = """
+const [expanderXpath, quietMs, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const expanders = xpathAll(document, expanderXpath);
+if (!expanders.length) {
+    done(0);
+    return;
+}
+let lastMutationAt = null;
+const observer = new MutationObserver(() => {
+    lastMutationAt = Date.now();
+});
+observer.observe(document.body, {
+    childList: true, subtree: true, characterData: true, attributes: true,
+});
+expanders.forEach((expander) => expander.click());
+const startedAt = Date.now();
+const poll = () => {
+    const now = Date.now();
+    const settled = lastMutationAt !== null && now - lastMutationAt >= quietMs;
+    if (settled || now - startedAt >= timeoutMs) {
+        observer.disconnect();
+        done(expanders.length);
+    } else {
+        setTimeout(poll, 25);
+    }
+};
+setTimeout(poll, quietMs);
+"""
+
+
+def expand_all(driver, expander_xpath, quiet_ms=200, timeout_ms=3000):
+    """
+    expander_xpath に一致する「続きを読む」等のボタンを1回のスクリプト実行で全て押し、
+    全ての本文の展開が落ち着くまで (MutationObserver で検知したDOMの変更が
+    quiet_ms ミリ秒途絶えるまで) 待つ。押したボタンの数を返す。
+    """
+    with phase(WAIT):
+        return driver.execute_async_script(
+            _JS_HELPERS + _EXPAND_ALL_SCRIPT, expander_xpath, quiet_ms, timeout_ms
+        )
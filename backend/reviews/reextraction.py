@@ -0,0 +1,59 @@
+"""
+アーカイブ済みページからの再抽出処理。
+
+reextract_reviews コマンドから ProcessPoolExecutor のワーカーとして実行される。
+各ワーカープロセスはオフラインのブラウザを1つ起動して使い回し、渡されたページの
+チャンクを OTA ごとの抽出処理で解析して、口コミデータのリストを親プロセスに返す。
+DBへの書き込みは親プロセスがまとめて行う。
+"""
+from multiprocessing.util import Finalize
+
+from .archive import offline_browser, open_archived_page
+from .crawlers import (
+    expedia_crawler,
+    google_travel_crawler,
+    ikyu_crawler,
+    jalan_crawler,
+    rakuten_travel_crawler,
+)
+from .normalizer import DataNormalizer
+from .utils import annotate_languages
+
+# OTAキー -> アーカイブ済みページ1枚分を再抽出する関数
+REEXTRACTORS = {
+    "rakuten": rakuten_travel_crawler.reextract_page,
+    "jalan": jalan_crawler.reextract_page,
+    "ikyu": ikyu_crawler.reextract_page,
+    "expedia": expedia_crawler.reextract_page,
+    "google": google_travel_crawler.reextract_page,
+}
+
+# ワーカープロセスごとのブラウザと正規化クラス
+_worker_browser = None
+_worker_normalizer = None
+
+
+def init_worker():
+    """ワーカープロセスの初期化。ブラウザはプロセス終了時に閉じる。"""
+    global _worker_browser, _worker_normalizer
+    browser_context = offline_browser()
+    _worker_browser = browser_context.__enter__()
+    _worker_normalizer = DataNormalizer()
+    Finalize(None, browser_context.__exit__, args=(None, None, None), exitpriority=10)
+
+
+def reextract_chunk(ota_key, hotel_slug, pages, detail_pages):
+    """
+    一覧ページのチャンクを再抽出し、[(ページID, [口コミデータ, ...]), ...] を返す。
+    detail_pages は同じ実行の {詳細ページのURL: ArchivedPage}。
+    """
+    reextract_page = REEXTRACTORS[ota_key]
+    results = []
+    for page in pages:
+        open_archived_page(_worker_browser, page)
+        reviews = reextract_page(
+            _worker_browser, _worker_normalizer, hotel_slug, page, detail_pages
+        )
+        annotate_languages(reviews)
+        results.append((page.pk, reviews))
+    return results
@@ -0,0 +1,153 @@
+"""
+Selenium Remote WebDriver (Selenium Grid / standalone server) でのChromeの起動。
+
+settings.SELENIUM_REMOTE_URLS にエンドポイントを設定すると、クローラーはChromeを
+ローカルで起動せず、いずれかのエンドポイントにセッションを作成する。
+エンドポイントは /status で報告される空きスロットの数が最も多いものを選ぶ
+(このプロセスが作成中のセッションも使用中として数える)。応答しないエンドポイントは
+飛ばし、セッションの作成に失敗した場合は次に空きの多いエンドポイントで作成し直す。
+
+ローカルでは、Selenium の standalone サーバーで動作を確認できる。
+    docker run -d -p 4444:4444 --shm-size=2g selenium/standalone-chrome
+    SELENIUM_REMOTE_URLS=http://localhost:4444 python manage.py check_webdriver_endpoints --open-session
+"""
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# このプロセスがセッションを作成中のエンドポイントごとの数
+_pending_sessions = Counter()
+_pending_lock = threading.Lock()
+
+
+class RemoteWebDriverUnavailable(Exception):
+    """セッションを作成できるエンドポイントが無い場合の例外"""
+
+
+@dataclass
+class EndpointStatus:
+    url: str
+    ready: bool
+    total_slots: int = 0
+    busy_slots: int = 0
+    error: str = ""
+
+    @property
+    def free_slots(self):
+        return self.total_slots - self.busy_slots - _pending_sessions[self.url]
+
+
+def remote_urls():
+    return [url.rstrip("/") for url in settings.SELENIUM_REMOTE_URLS]
+
+
+def fetch_status(url, timeout=None):
+    """
+    エンドポイントの /status から、スロットの数と使用中の数を取得する。
+    Selenium 4 はノードごとのスロットを返す。スロットの情報が無いサーバー
+    (Selenium 3 など) は ready かどうかだけを見て、1スロットとして扱う。
+    """
+    timeout = timeout or settings.SELENIUM_REMOTE_STATUS_TIMEOUT
+    try:
+        response = requests.get(f"{url}/status", timeout=timeout)
+        response.raise_for_status()
+        value = response.json()["value"]
+    except (requests.RequestException, ValueError, KeyError) as e:
+        return EndpointStatus(url=url, ready=False, error=str(e))
+
+    nodes = value.get("nodes")
+    if not nodes:
+        ready = bool(value.get("ready"))
+        return EndpointStatus(
+            url=url, ready=ready, total_slots=1, busy_slots=0 if ready else 1
+        )
+
+    total_slots = busy_slots = 0
+    for node in nodes:
+        if node.get("availability", "UP") != "UP":
+            continue
+        slots = node.get("slots", [])
+        total_slots += len(slots)
+        busy_slots += sum(1 for slot in slots if slot.get("session"))
+    # Grid の ready は空きの有無を表さないため、稼働中のノードのスロットがあれば候補とする
+    return EndpointStatus(
+        url=url, ready=total_slots > 0, total_slots=total_slots, busy_slots=busy_slots
+    )
+
+
+def fetch_statuses(urls):
+    """
+    複数のエンドポイントの /status を並行して取得する。
+    応答しないエンドポイントがあっても、待つのは最大で1回分のタイムアウトになる。
+    """
+    urls = list(urls)
+    if len(urls) <= 1:
+        return [fetch_status(url) for url in urls]
+    with ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="webdriver-status") as executor:
+        return list(executor.map(fetch_status, urls))
+
+
+def rank_endpoints(statuses):
+    """
+    セッションを作成する順にエンドポイントを並べる。
+    空きスロットが多い順 (同数なら使用率が低い順) で、応答しないものは除く。
+    空きが無くても、Grid はセッションの要求を順番待ちさせるため候補に残す。
+    """
+    candidates = [status for status in statuses if status.ready and status.total_slots]
+    return sorted(
+        candidates,
+        key=lambda status: (
+            -status.free_slots,
+            (status.total_slots - status.free_slots) / status.total_slots,
+        ),
+    )
+
+
+def start_remote_chrome(options):
+    """
+    空きの最も多いエンドポイントに、options のChromeのセッションを作成して返す。
+    作成したエンドポイントは driver.remote_url で参照できる。
+    """
+    from selenium import webdriver
+
+    urls = remote_urls()
+    errors = []
+    while True:
+        # /status の取得は通信で時間がかかるため、ロックの外で行う
+        statuses = fetch_statuses(urls)
+        with _pending_lock:
+            ranked = rank_endpoints(statuses)
+            if not ranked:
+                break
+            best = ranked[0]
+            url = best.url
+            logger.info(
+                f"Remote WebDriver {url} にセッションを作成します。"
+                f"(空きスロット: {best.free_slots}/{best.total_slots})"
+            )
+            _pending_sessions[url] += 1
+        try:
+            driver = webdriver.Remote(command_executor=url, options=options)
+        except Exception as e:
+            logger.warning(f"Remote WebDriver {url} でのセッションの作成に失敗しました: {e}")
+            errors.append(f"{url}: {e}")
+            # 失敗したエンドポイントは今回の候補から外す
+            urls = [candidate for candidate in urls if candidate != url]
+            continue
+        finally:
+            with _pending_lock:
+                _pending_sessions[url] -= 1
+        driver.remote_url = url
+        return driver
+
+    raise RemoteWebDriverUnavailable(
+        "セッションを作成できる Remote WebDriver のエンドポイントがありません。"
+        + (f" ({'; '.join(errors)})" if errors else "")
+    )
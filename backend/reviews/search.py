@@ -0,0 +1,49 @@
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Review
+
+# 全文検索の対象カラム (マイグレーション 0014 の FULLTEXT インデックスと一致させる)
+FULLTEXT_COLUMNS = ("review_comment", "translated_review_comment")
+
+
+def supports_fulltext_search() -> bool:
+    """ngramパーサー付きのFULLTEXTインデックスを利用できるか (MySQLのみ)"""
+    return connection.vendor == "mysql"
+
+
+def search_reviews(query: str, queryset=None):
+    """
+    口コミ本文 (原文・翻訳) を全文検索し、関連度の高い順に並べたクエリセットを返す。
+
+    MySQLでは ngram パーサーによる FULLTEXT インデックスを MATCH ... AGAINST で利用する。
+    日本語のように単語区切りのないテキストでもインデックスが効く。
+    それ以外のDB (開発用のSQLiteなど) では icontains による部分一致にフォールバックする。
+    """
+    if queryset is None:
+        queryset = Review.objects.all()
+
+    query = query.strip()
+    if supports_fulltext_search():
+        table = Review._meta.db_table
+        columns = ", ".join(f"`{table}`.`{column}`" for column in FULLTEXT_COLUMNS)
+        relevance = RawSQL(
+            f"MATCH ({columns}) AGAINST (%s IN NATURAL LANGUAGE MODE)",
+            (query,),
+            output_field=FloatField(),
+        )
+        return (
+            queryset.annotate(relevance=relevance)
+            .filter(relevance__gt=0)
+            .order_by("-relevance", "-review_date", "-id")
+        )
+
+    return (
+        queryset.filter(
+            Q(review_comment__icontains=query)
+            | Q(translated_review_comment__icontains=query)
+        )
+        .annotate(relevance=Value(1.0, output_field=FloatField()))
+        .order_by("-review_date", "-id")
+    )
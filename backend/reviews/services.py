@@ -1,23 +1,33 @@
-import pandas as pd
-import io
 import re
 from datetime import date
-import re
 import hashlib
-import pandas as pd
-from .models import Review, CrawlTarget, ReviewScore, Hotel
-from .crawlers.expedia_crawler import scrape_expedia_reviews
-from .crawlers.rakuten_travel_crawler import scrape_rakuten_travel_reviews
-# from .crawlers.google_travel_crawler import scrape_google_travel_reviews
-from .crawlers.jalan_crawler import scrape_jalan_reviews
-from .crawlers.ikyu_crawler import scrape_ikyu_reviews
+from .models import Review, CrawlTarget, CrawlRun, ReviewScore, Hotel
+from .crawler_registry import get_crawler
 import logging
 from decimal import Decimal, InvalidOperation
-from django.db import transaction
-
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, F, Max, When
+from django.utils import timezone
+from .tracing import (
+    BROWSER_LAUNCH,
+    BYTES_DOWNLOADED,
+    DB_SAVE,
+    PAGES,
+    REVIEWS_EXTRACTED,
+    REVIEWS_NEW,
+    REVIEWS_SKIPPED,
+    REVIEWS_UPDATED,
+    WEBDRIVER,
+    count,
+    record_error,
+    start_trace,
+    traced,
 )
+from .metrics import observe_crawl_run, observe_saved_reviews
+from .archive import start_page_archive
+
+logger = logging.getLogger(__name__)
 
 
 EXCEL_HEADER_MAP = {
@@ -47,59 +57,94 @@ EXCEL_HEADER_MAP = {
     "translated_review_comment": "口コミ(翻訳済)",
 }
 
+# エクスポート時にDBから一度に読み込む行数
+EXPORT_CHUNK_SIZE = 2000
+# エクスポートの行の読み込みに使う接続 (settings.DATABASES で SSCursor を設定)
+EXPORT_DB_ALIAS = "export"
+
+
 def run_crawl_and_save(
     target: CrawlTarget, start_date: str, end_date: str, hotel_slug: str
 ):
     """
     指定されたCrawlTargetに対してクロールを実行し、結果をDBに保存する。
+    実行ごとの統計 (ページ数・口コミ件数・受信量・所要時間など) は CrawlRun に
+    1行だけ記録し、要約をメッセージに付与する。取得したページのHTMLは
+    アーカイブに保存し、ArchivedPage としてこの実行に紐付ける。
     :return: (成功フラグ, メッセージ) のタプル
     """
+    started_at = timezone.now()
+    with start_trace(target.ota.name) as trace:
+        with start_page_archive(target) as page_recorder:
+            success, message = _crawl_and_save(
+                target, start_date, end_date, hotel_slug
+            )
+    observe_crawl_run(target.ota.name, trace, success)
+
+    counters = trace.counters
+    crawl_run = None
+    try:
+        crawl_run = CrawlRun.objects.create(
+            crawl_target=target,
+            ota_id=target.ota_id,
+            status=(
+                CrawlTarget.CrawlStatus.SUCCESS
+                if success
+                else CrawlTarget.CrawlStatus.FAILURE
+            ),
+            message=message,
+            error_class=trace.error_class,
+            started_at=started_at,
+            finished_at=timezone.now(),
+            duration_seconds=round(trace.total_seconds, 3),
+            browser_seconds=round(
+                trace.phase_seconds.get(BROWSER_LAUNCH, 0)
+                + trace.phase_seconds.get(WEBDRIVER, 0),
+                3,
+            ),
+            pages_visited=counters.get(PAGES, 0),
+            reviews_seen=counters.get(REVIEWS_EXTRACTED, 0),
+            reviews_new=counters.get(REVIEWS_NEW, 0),
+            reviews_updated=counters.get(REVIEWS_UPDATED, 0),
+            reviews_skipped=counters.get(REVIEWS_SKIPPED, 0),
+            bytes_downloaded=counters.get(BYTES_DOWNLOADED, 0),
+            phase_timings=trace.phase_timings(),
+            counters=dict(counters),
+        )
+    except Exception as e:
+        # 実行履歴の保存失敗でクロール結果自体を失敗扱いにはしない
+        logger.error(f"クロール実行履歴の保存に失敗しました: {e}")
+
+    if page_recorder is not None:
+        try:
+            page_recorder.save(crawl_run)
+        except Exception as e:
+            logger.error(f"アーカイブ済みページの記録に失敗しました: {e}")
+
+    return success, f"{message}\n{trace.summary()}"
+
+
+def _crawl_and_save(
+    target: CrawlTarget, start_date: str, end_date: str, hotel_slug: str
+):
     try:
         reviews_list = []
         if not target.crawl_url:
             return True, "クロールURLが未設定のため、スキップしました。"
 
-        # OTAによってクローラーを切り替え
-        if target.ota.name == "Expedia":
-            reviews_list = scrape_expedia_reviews(
-                target.crawl_url, start_date, end_date
-            )
-        elif target.ota.name == "楽天トラベル":
-            print(f"OTA: 楽天トラベル を検出。楽天トラベル用クローラーを開始します。")
-            reviews_list = scrape_rakuten_travel_reviews(
-                url=target.crawl_url,
-                hotel_id=hotel_slug,
-                start_date_str=start_date,
-                end_date_str=end_date,
-            )
-        elif target.ota.name == "じゃらん":
-            print(f"OTA: じゃらん を検出。じゃらん用クローラーを開始します。")
-            reviews_list = scrape_jalan_reviews(
-                url=target.crawl_url,
-                hotel_id=hotel_slug,
-                start_date_str=start_date,
-                end_date_str=end_date,
-            )
-        elif target.ota.name == "一休":
-            print(f"OTA: 一休 を検出。一休用クローラーを開始します。")
-            reviews_list = scrape_ikyu_reviews(
-                url=target.crawl_url,
-                hotel_id=hotel_slug,
-                start_date_str=start_date,
-                end_date_str=end_date,
-            )
-        # elif target.ota.name == "Googleトラベル":
-        #     print(
-        #         f"OTA: Googleトラベル を検出。Googleトラベル用クローラーを開始します。"
-        #     )
-        #     reviews_list = scrape_google_travel_reviews(
-        #         url=target.crawl_url,
-        #         hotel_id=hotel_slug,
-        #         start_date_str=start_date,
-        #         end_date_str=end_date,
-        #     )
-        else:
+        # OTAによってクローラーを切り替え (クローラーのモジュールはここで初めて読み込む)
+        crawler = get_crawler(target.ota.name)
+        if crawler is None:
             return True, f"'{target.ota.name}' に対応するクローラーがありません。"
+        logger.info(
+            f"OTA: {target.ota.name} を検出。{target.ota.name}用クローラーを開始します。"
+        )
+        reviews_list = crawler.crawl(
+            url=target.crawl_url,
+            hotel_id=hotel_slug,
+            start_date_str=start_date,
+            end_date_str=end_date,
+        )
 
         if not reviews_list:
             return True, "口コミは取得されませんでした。"
@@ -112,26 +157,18 @@ def run_crawl_and_save(
     except Exception as e:
         error_message = f"クロール中にエラーが発生しました: {e}"
         # logging.error(error_message)
+        record_error(e)
         return False, error_message
 
 
-def get_reviews_as_dataframe(
-    hotel_id: int,
-    hotel_name: str,
+def filter_export_reviews(
+    hotel: Hotel,
     ota_ids: list = None,
     start_date: str = None,
     end_date: str = None,
-) -> pd.DataFrame:
-    """
-    指定された条件でDBからレビューを取得し、pandas DataFrameとして返す。
-    """
-    print(f"--- [Service] Function started. Searching for hotel: '{hotel_name}' ---")
-    try:
-        hotel_master = Hotel.objects.get(name=hotel_name)
-    except Hotel.DoesNotExist:
-        return pd.DataFrame()
-
-    targets = CrawlTarget.objects.filter(hotel=hotel_master)
+):
+    """エクスポート対象となるReviewのクエリセットを返す。"""
+    targets = CrawlTarget.objects.filter(hotel=hotel)
     if ota_ids:
         targets = targets.filter(ota__id__in=ota_ids)
 
@@ -141,79 +178,122 @@ def get_reviews_as_dataframe(
         reviews_query = reviews_query.filter(review_date__gte=start_date)
     if end_date:
         reviews_query = reviews_query.filter(review_date__lte=end_date)
+    return reviews_query
 
-    reviews_query = reviews_query.select_related("crawl_target__ota")
-
-    review_values = list(
-        reviews_query.values(
-            "id",
-            "review_date",
-            "crawl_target__ota__name", 
-            "reviewer_name",
-            "review_language",
-            "room_type",
-            "purpose_of_visit",
-            "traveler_type",
-            "gender",
-            "age_group",
-            "review_comment",
-            "translated_review_comment",
-            "overall_score",
-        )
-    )
 
-    if not review_values:
-        print("--- [Service] No reviews found. Returning empty DataFrame. ---")
-        return pd.DataFrame()
-
-    df_reviews = pd.DataFrame(review_values)
-    # 分かりやすいようにカラム名を変更
-    df_reviews.rename(columns={"crawl_target__ota__name": "ota_name"}, inplace=True)
-
-    review_ids = df_reviews['id'].tolist()
-    score_values = list(ReviewScore.objects.filter(review_id__in=review_ids).values(
-        'review_id', 'category', 'score'
-    ))
-
-    if score_values:
-        df_scores = pd.DataFrame(score_values)
-        df_scores_pivot = df_scores.pivot_table(
-            index='review_id', columns='category', values='score'
-        ).reset_index()
-
-        df = pd.merge(df_reviews, df_scores_pivot, left_on='id', right_on='review_id', how='left')
-        df.drop(columns=['id', 'review_id'], inplace=True)
-    else:
-        df = df_reviews.drop(columns=['id'])
-
-    # カラム名を日本語ヘッダーにリネーム
-    df.rename(columns=EXCEL_HEADER_MAP, inplace=True)
-    
-    expected_columns_jp = list(EXCEL_HEADER_MAP.values())
-    
-    final_columns_order = [
-        jp_name for jp_name in expected_columns_jp if jp_name in df.columns
-    ]
+def build_export_rows_query(reviews_query, score_categories):
+    """
+    エクスポート用の行 (辞書) を返すクエリセットを組み立てる。
+    ReviewScoreのピボットはSQL側の条件付き集約 (MAX(CASE WHEN ...)) で行う。
+    レビューIDの巨大なIN句やpandasでのpivot/mergeを避け、1クエリで取得する。
+    """
+    score_annotations = {
+        category: Max(
+            Case(When(scores__category=category, then="scores__score"))
+        )
+        for category in score_categories
+    }
+    return reviews_query.annotate(**score_annotations).values(
+        "review_date",
+        "crawl_target__ota__name",
+        "reviewer_name",
+        "review_language",
+        "room_type",
+        "purpose_of_visit",
+        "traveler_type",
+        "gender",
+        "age_group",
+        "review_comment",
+        "translated_review_comment",
+        "overall_score",
+        *score_categories,
+    ).order_by("-review_date")
+
+
+def iter_export_rows(rows_query):
+    """
+    エクスポート用の行を1行ずつ返す。
+    settings.DATABASES に export の接続があれば、サーバーサイドカーソルで実行し、
+    結果全体をクライアント側のメモリに保持しない。
+    """
+    alias = EXPORT_DB_ALIAS if EXPORT_DB_ALIAS in settings.DATABASES else DEFAULT_DB_ALIAS
+    return rows_query.using(alias).iterator(chunk_size=EXPORT_CHUNK_SIZE)
 
-    df = df[final_columns_order]
 
-    print(f"--- [Service] Data found. Returning DataFrame with {len(df)} rows. ---")
-    return df
+def get_export_score_categories():
+    """Excelに出力するReviewScoreのカテゴリ一覧を返す。"""
+    return [
+        category
+        for category in ReviewScore.ScoreCategory.values
+        if category in EXCEL_HEADER_MAP
+    ]
 
 
-def generate_excel_in_memory(df: pd.DataFrame) -> io.BytesIO:
+def write_reviews_xlsx(
+    output_path,
+    hotel: Hotel,
+    ota_ids: list = None,
+    start_date: str = None,
+    end_date: str = None,
+    progress_callback=None,
+) -> int:
     """
-    DataFrameをメモリ上のExcelファイルデータ (BytesIO) として返す。
+    エクスポート対象のレビューを、DataFrameを経由せずにExcelファイルへ逐次書き込む。
+    行はサーバーサイドカーソルで読み込み、openpyxlのwrite-onlyモードで書き込むため、
+    行数が多くてもメモリ使用量は一定。output_path にはファイルオブジェクトも指定できる。
+
+    :param progress_callback: (書き込み済み行数, 総行数) を受け取る関数。EXPORT_CHUNK_SIZE行ごとに呼ばれる。
+    :return: 書き込んだ行数
     """
-    excel_buffer = io.BytesIO()
-    df.to_excel(excel_buffer, index=False, engine="openpyxl")
-    excel_buffer.seek(0)  # ポインタを先頭に戻す
-    return excel_buffer
+    from openpyxl import Workbook
 
+    reviews_query = filter_export_reviews(hotel, ota_ids, start_date, end_date)
+    total_rows = reviews_query.count()
 
+    # スコアが1件も存在しないカテゴリの列は出力しない
+    existing_categories = set(
+        ReviewScore.objects.filter(review__in=reviews_query)
+        .values_list("category", flat=True)
+        .distinct()
+    )
+    score_categories = [
+        category
+        for category in get_export_score_categories()
+        if category in existing_categories
+    ]
+    rows_query = build_export_rows_query(reviews_query, score_categories)
+
+    columns = [
+        key
+        for key in EXCEL_HEADER_MAP
+        if key not in ReviewScore.ScoreCategory.values or key in score_categories
+    ]
+    source_keys = {"ota_name": "crawl_target__ota__name"}
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([EXCEL_HEADER_MAP[column] for column in columns])
+
+    rows_written = 0
+    for row in iter_export_rows(rows_query):
+        sheet.append([row[source_keys.get(column, column)] for column in columns])
+        rows_written += 1
+        if progress_callback and rows_written % EXPORT_CHUNK_SIZE == 0:
+            progress_callback(rows_written, total_rows)
+
+    workbook.save(output_path)
+    if progress_callback:
+        progress_callback(rows_written, total_rows)
+    return rows_written
+
+
+@traced(DB_SAVE)
 def save_reviews_to_db(reviews_list, crawl_target: CrawlTarget):
-    """取得したレビューのリストをデータベースに保存/更新します。"""
-    logging.info(f"  取得した {len(reviews_list)} 件の口コミをDBに保存します...")
+    """
+    取得したレビューのリストをデータベースに保存/更新します。
+    :return: (新規件数, 更新件数, スキップ件数) のタプル
+    """
+    logger.info(f"  取得した {len(reviews_list)} 件の口コミをDBに保存します...")
     saved_count, updated_count, skipped_count = 0, 0, 0
 
     SCORE_MAPPING = {
@@ -305,7 +385,7 @@ def save_reviews_to_db(reviews_list, crawl_target: CrawlTarget):
                                 }
                             )
                         except InvalidOperation:
-                            logging.warning(
+                            logger.warning(
                                 f"  '{score_key}' の値 '{score_data[score_key]}' をDecimalに変換できませんでした。スキップします。"
                             )
 
@@ -316,9 +396,23 @@ def save_reviews_to_db(reviews_list, crawl_target: CrawlTarget):
                     updated_count += 1
 
         except Exception as e:
-            logging.error(f"    DB保存中に致命的なエラー: {e}。このレビューの処理をスキップします. データ: {review_data}")
+            logger.error(f"    DB保存中に致命的なエラー: {e}。このレビューの処理をスキップします. データ: {review_data}")
             skipped_count += 1
 
-    logging.info(
+    logger.info(
         f"  [DB保存結果] 新規: {saved_count}件, 更新: {updated_count}件, スキップ: {skipped_count}件"
     )
+
+    if saved_count or updated_count:
+        # エクスポートキャッシュを無効化するため、データバージョンを加算する
+        CrawlTarget.objects.filter(pk=crawl_target.pk).update(
+            data_version=F("data_version") + 1
+        )
+
+    observe_saved_reviews(
+        crawl_target.ota.name, saved_count, updated_count, skipped_count
+    )
+    count(REVIEWS_NEW, saved_count)
+    count(REVIEWS_UPDATED, updated_count)
+    count(REVIEWS_SKIPPED, skipped_count)
+    return saved_count, updated_count, skipped_count
@@ -1,3 +1,378 @@
-from django.test import TestCase
+import io
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from collections import Counter
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from selenium.webdriver import ChromeOptions
+
+from .browser_profiles import acquire_profile, launch_chrome
+from .browser_watchdog import BrowserWatchdog
+from .crawl_scheduler import BROWSER, plan_crawl, run_crawl_plan
+from .crawler_registry import BaseCrawler
+from .export_cache import export_cache
+from .export_jobs import fail_interrupted_export_jobs
+from .models import CrawlTarget, ExportJob, Hotel, Ota, Review
+from .utils import _detect_by_script, detect_language
+
+
+class DetectLanguageTests(SimpleTestCase):
+    """detect_language() の文字種による判定と cld2 への委譲"""
+
+    def test_pure_japanese_is_detected_by_script(self):
+        text = "ホテルのスタッフはとても親切で、朝食もおいしかったです。"
+        self.assertEqual(_detect_by_script(text), (True, "ja"))
+        self.assertEqual(detect_language(text), "ja")
+
+    def test_pure_korean_is_detected_by_script(self):
+        text = "직원들이 친절하고 방이 깨끗했어요. 다시 오고 싶어요."
+        self.assertEqual(_detect_by_script(text), (True, "ko"))
+        self.assertEqual(detect_language(text), "ko")
+
+    def test_digits_and_symbols_only_are_undetermined(self):
+        self.assertEqual(_detect_by_script("10/10 !!"), (True, None))
+
+    def test_english_with_katakana_word_falls_back_to_cld2(self):
+        text = "The ramen (ラーメン) near the hotel was great and the staff were very friendly."
+        self.assertEqual(_detect_by_script(text), (False, None))
+        self.assertEqual(detect_language(text), "en")
+
+    def test_chinese_with_single_kana_falls_back_to_cld2(self):
+        text = "酒店位置很好,服务人员非常热情,房间干净整洁,早餐种类丰富,我的の最爱。"
+        self.assertEqual(_detect_by_script(text), (False, None))
+        self.assertEqual(detect_language(text), "zh")
+
+    def test_english_with_hangul_word_falls_back_to_cld2(self):
+        text = "The hotel was clean and the 비빔밥 at breakfast was delicious. Great location."
+        self.assertEqual(_detect_by_script(text), (False, None))
+        self.assertEqual(detect_language(text), "en")
+
+    def test_japanese_with_latin_word_falls_back_to_cld2(self):
+        text = "朝食のバイキングが最高でした。WiFiも快適です。"
+        self.assertEqual(_detect_by_script(text), (False, None))
+        self.assertEqual(detect_language(text), "ja")
+
+
+class CrawlSchedulerTests(SimpleTestCase):
+    """plan_crawl() と run_crawl_plan() のジョブの並びと同時実行数"""
+
+    def make_target(self, ota_name, label):
+        return SimpleNamespace(ota=SimpleNamespace(name=ota_name), label=label)
+
+    def test_plan_crawl_skips_unregistered_otas_and_sorts_by_cost(self):
+        targets = [
+            self.make_target("一休", "I1"),
+            self.make_target("Expedia", "E1"),
+            self.make_target("未登録のOTA", "X1"),
+        ]
+        jobs, unsupported = plan_crawl(targets)
+        self.assertEqual([job.target.label for job in jobs], ["E1", "I1"])
+        self.assertEqual([target.label for target in unsupported], ["X1"])
+        self.assertTrue(all(job.strategy == BROWSER for job in jobs))
+
+    def test_blocked_ota_does_not_hold_a_browser_slot(self):
+        # Expedia は max_concurrency=1。E2 が E1 の終了を待つ間に R1 を開始する
+        jobs, _ = plan_crawl(
+            [
+                self.make_target("Expedia", "E1"),
+                self.make_target("Expedia", "E2"),
+                self.make_target("楽天トラベル", "R1"),
+                self.make_target("楽天トラベル", "R2"),
+            ]
+        )
+        lock = threading.Lock()
+        started, running = [], Counter()
+        max_running = {"total": 0, "Expedia": 0}
+
+        def run_job(job):
+            ota_name = job.crawler.ota_name
+            with lock:
+                started.append(job.target.label)
+                running[ota_name] += 1
+                max_running["total"] = max(max_running["total"], sum(running.values()))
+                max_running["Expedia"] = max(max_running["Expedia"], running["Expedia"])
+            time.sleep(0.05)
+            with lock:
+                running[ota_name] -= 1
+            return job.target.label
+
+        results = list(run_crawl_plan(jobs, run_job, max_browsers=2))
+
+        self.assertEqual(set(started[:2]), {"E1", "R1"})
+        self.assertEqual(max_running, {"total": 2, "Expedia": 1})
+        self.assertEqual(
+            sorted(result for _, result in results), ["E1", "E2", "R1", "R2"]
+        )
+
+    def test_exceptions_are_returned_as_results(self):
+        jobs, _ = plan_crawl([self.make_target("じゃらん", "J1")])
+        error = RuntimeError("failed")
+
+        def run_job(job):
+            raise error
+
+        self.assertEqual(list(run_crawl_plan(jobs, run_job)), [(jobs[0], error)])
+
+
+@override_settings(RAW_HTML_ARCHIVE_ENABLED=False)
+class StartCrawlTests(TransactionTestCase):
+    """start_crawl コマンドによる CrawlTarget の更新"""
+
+    def setUp(self):
+        self.hotel = Hotel.objects.create(name="テストホテル")
+        self.target = CrawlTarget.objects.create(
+            hotel=self.hotel,
+            ota=Ota.objects.create(name="楽天トラベル"),
+            crawl_url="https://travel.rakuten.co.jp/HOTEL/1/review.html",
+        )
+
+    def test_saved_reviews_bump_data_version(self):
+        review = {
+            "reviewer_name": "テスト",
+            "review_date": "2025-01-01",
+            "review_comment": "よかったです。",
+        }
+        with mock.patch.object(BaseCrawler, "crawl", return_value=[review]):
+            call_command("start_crawl", self.hotel.name, stdout=io.StringIO())
+
+        self.target.refresh_from_db()
+        self.assertEqual(Review.objects.filter(crawl_target=self.target).count(), 1)
+        self.assertEqual(self.target.data_version, 1)
+        self.assertEqual(self.target.last_crawl_status, CrawlTarget.CrawlStatus.SUCCESS)
+
+
+class FakeChrome:
+    """undetected_chromedriver.Chrome の代わり。同じ ChromeOptions の再利用を拒否する。"""
+
+    def __init__(self, options, user_data_dir=None, **kwargs):
+        if getattr(options, "_session", None) is not None:
+            raise RuntimeError("you cannot reuse the ChromeOptions object")
+        options._session = self
+        if user_data_dir is not None and "broken" in user_data_dir:
+            raise RuntimeError("Chrome failed to start")
+        self.options = options
+        self.user_data_dir = user_data_dir
+        self.current_url = "about:blank"
+        self.window_size = {"width": 800, "height": 600}
+
+    def execute(self, driver_command, params=None):
+        return None
+
+    def get(self, url):
+        self.current_url = url
+
+    def get_window_size(self):
+        return dict(self.window_size)
+
+    def set_window_size(self, width, height):
+        self.window_size = {"width": width, "height": height}
+
+    def get_cookies(self):
+        return []
+
+    def quit(self):
+        pass
+
+
+class LaunchChromeTests(SimpleTestCase):
+    """launch_chrome() と BrowserWatchdog によるChromeの起動と起動し直し"""
+
+    def setUp(self):
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        self.profile_dir = Path(profile_dir.name)
+        settings_override = self.settings(
+            CHROME_PROFILE_DIR=self.profile_dir,
+            CHROME_PROFILES_ENABLED=True,
+            CHROME_PROFILE_SLOTS=1,
+            SELENIUM_REMOTE_URLS=[],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        patcher = mock.patch.dict(
+            sys.modules, {"undetected_chromedriver": SimpleNamespace(Chrome=FakeChrome)}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_broken_profile_falls_back_to_temporary_profile(self):
+        # スロット0のプロファイルの起動に失敗させる
+        with mock.patch(
+            "reviews.browser_profiles.profile_root",
+            return_value=self.profile_dir / "broken",
+        ):
+            options = ChromeOptions()
+            options.add_argument("--lang=ja-JP")
+            driver = launch_chrome("rakuten", options)
+
+            self.assertIsNone(driver.chrome_profile)
+            self.assertIsNone(driver.user_data_dir)
+            self.assertIsNot(driver.options, options)
+            self.assertEqual(driver.options.arguments, ["--lang=ja-JP"])
+            # 失敗したプロファイルのロックは解放されている
+            profile = acquire_profile("rakuten")
+            self.assertIsNotNone(profile)
+            profile.release()
+
+    def test_watchdog_relaunches_with_new_options(self):
+        def build_options():
+            options = ChromeOptions()
+            options.add_argument("--lang=ja-JP")
+            return options
+
+        driver = launch_chrome("rakuten", build_options())
+        driver.set_window_size(500, 500)
+        driver.get("https://travel.rakuten.co.jp/HOTEL/1/review.html?f_next=20")
+        watchdog = BrowserWatchdog("rakuten", build_options, max_rss_mb=0, max_pages=2)
+
+        self.assertIs(watchdog.after_page(driver), driver)
+        new_driver = watchdog.after_page(driver)
+
+        self.assertIsNot(new_driver, driver)
+        self.assertIsNot(new_driver.options, driver.options)
+        self.assertEqual(new_driver.options.arguments, ["--lang=ja-JP"])
+        # 終了したChromeのプロファイルを引き継いで、同じURLを開き直す
+        self.assertEqual(new_driver.user_data_dir, driver.user_data_dir)
+        self.assertEqual(new_driver.current_url, driver.current_url)
+        self.assertEqual(new_driver.window_size, {"width": 500, "height": 500})
+        self.assertEqual(watchdog.pages, 0)
+
+
+class ExportExcelAPITests(TestCase):
+    """ExportExcelAPIView の入力チェックとエクスポートキャッシュ"""
+
+    def setUp(self):
+        self.hotel = Hotel.objects.create(name="テストホテル")
+        target = CrawlTarget.objects.create(
+            hotel=self.hotel, ota=Ota.objects.create(name="楽天トラベル")
+        )
+        Review.objects.create(
+            crawl_target=target,
+            review_hash="hash-1",
+            review_date=date(2025, 1, 1),
+            review_comment="よかったです。",
+        )
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patcher = mock.patch.object(export_cache, "cache_dir", Path(cache_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post_export(self, ota_ids=None):
+        return self.client.post(
+            "/api/export/",
+            {"hotel": {"name": self.hotel.name}, "options": {"ota_ids": ota_ids}},
+            content_type="application/json",
+        )
+
+    def test_malformed_ota_ids_are_rejected(self):
+        response = self.post_export(ota_ids=["abc"])
+        self.assertEqual(response.status_code, 400)
+
+    def test_evicted_cache_file_is_regenerated(self):
+        # get() の直後にファイルが追い出された状況を再現する
+        missing_path = export_cache.cache_dir / "evicted.bin"
+        with mock.patch.object(export_cache, "get", return_value=missing_path):
+            response = self.post_export()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.startswith(b"PK"))
+
+
+@override_settings(EXPORT_JOB_STALE_SECONDS=150)
+class FailInterruptedExportJobsTests(TestCase):
+    """生存確認日時による、中断されたエクスポートジョブの判定"""
+
+    def make_job(self, status, heartbeat_age=None, created_age=0):
+        now = timezone.now()
+        job = ExportJob.objects.create(
+            hotel=self.hotel,
+            status=status,
+            worker_id="other-host:1234",
+            heartbeat_at=None if heartbeat_age is None else now - timedelta(seconds=heartbeat_age),
+        )
+        ExportJob.objects.filter(pk=job.pk).update(
+            created_at=now - timedelta(seconds=created_age)
+        )
+        return job
+
+    def setUp(self):
+        self.hotel = Hotel.objects.create(name="テストホテル")
+
+    def test_only_jobs_with_stale_heartbeat_are_failed(self):
+        running = ExportJob.JobStatus.RUNNING
+        pending = ExportJob.JobStatus.PENDING
+        # 他のプロセスで実行中 (登録は古いが、生存確認日時は新しい)
+        alive = self.make_job(running, heartbeat_age=10, created_age=3600)
+        stale = self.make_job(running, heartbeat_age=600, created_age=3600)
+        legacy = self.make_job(pending, created_age=3600)
+        just_created = self.make_job(pending)
+        finished = self.make_job(ExportJob.JobStatus.SUCCESS, heartbeat_age=600)
+
+        self.assertEqual(fail_interrupted_export_jobs(), 2)
+
+        statuses = dict(ExportJob.objects.values_list("pk", "status"))
+        self.assertEqual(statuses[alive.pk], running)
+        self.assertEqual(statuses[stale.pk], ExportJob.JobStatus.FAILURE)
+        self.assertEqual(statuses[legacy.pk], ExportJob.JobStatus.FAILURE)
+        self.assertEqual(statuses[just_created.pk], pending)
+        self.assertEqual(statuses[finished.pk], ExportJob.JobStatus.SUCCESS)
+
+
+class ReviewListAPITests(TestCase):
+    """ReviewListAPIView のキーセットページネーション"""
+
+    def test_cursor_pages_cover_all_reviews_with_null_dates_last(self):
+        target = CrawlTarget.objects.create(
+            hotel=Hotel.objects.create(name="テストホテル"),
+            ota=Ota.objects.create(name="楽天トラベル"),
+        )
+        review_dates = [
+            date(2025, 1, 2),
+            None,
+            date(2025, 1, 1),
+            date(2025, 1, 2),
+            None,
+            date(2025, 1, 3),
+            date(2025, 1, 1),
+        ]
+        reviews = [
+            Review.objects.create(
+                crawl_target=target, review_hash=f"hash-{i}", review_date=review_date
+            )
+            for i, review_date in enumerate(review_dates)
+        ]
+        expected = [
+            review.id
+            for review in sorted(
+                reviews,
+                key=lambda review: (
+                    review.review_date is not None,
+                    review.review_date or date.min,
+                    review.id,
+                ),
+                reverse=True,
+            )
+        ]
+
+        seen, cursor = [], None
+        while True:
+            params = {"page_size": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = self.client.get("/api/reviews/", params)
+            self.assertEqual(response.status_code, 200)
+            seen += [review["id"] for review in response.json()["results"]]
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, expected)
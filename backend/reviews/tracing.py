@@ -0,0 +1,201 @@
+import contextvars
+import functools
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# フェーズ名 (計測キー) と、結果メッセージに表示する名称
+BROWSER_LAUNCH = "browser_launch"
+WEBDRIVER = "webdriver"
+NAVIGATION = "navigation"
+WAIT = "wait"
+EXTRACTION = "extraction"
+LANGUAGE_DETECTION = "language_detection"
+NORMALIZATION = "normalization"
+DB_SAVE = "db_save"
+ARCHIVE = "archive"
+
+PHASE_LABELS = {
+    BROWSER_LAUNCH: "ブラウザ起動",
+    WEBDRIVER: "WebDriver",
+    NAVIGATION: "ページ遷移",
+    WAIT: "待機",
+    EXTRACTION: "抽出",
+    LANGUAGE_DETECTION: "言語判定",
+    NORMALIZATION: "正規化",
+    DB_SAVE: "DB保存",
+    ARCHIVE: "アーカイブ",
+}
+
+# カウンター名
+PAGES = "pages"
+REVIEWS_EXTRACTED = "reviews_extracted"
+REVIEWS_NEW = "reviews_new"
+REVIEWS_UPDATED = "reviews_updated"
+REVIEWS_SKIPPED = "reviews_skipped"
+BYTES_DOWNLOADED = "bytes_downloaded"
+BROWSER_RECYCLES = "browser_recycles"
+
+# 前回の呼び出し以降にページが受信したバイト数 (Resource Timing API の transferSize の合計)
+# 計測済みのリソースエントリは削除し、ナビゲーション分は同一ドキュメントで1回だけ数える
+_TRANSFERRED_BYTES_SCRIPT = """
+let total = 0;
+if (!window.__crawlNavigationCounted) {
+    for (const entry of performance.getEntriesByType("navigation")) {
+        total += entry.transferSize || 0;
+    }
+    window.__crawlNavigationCounted = true;
+}
+for (const entry of performance.getEntriesByType("resource")) {
+    total += entry.transferSize || 0;
+}
+performance.clearResourceTimings();
+return total;
+"""
+
+_current_trace = contextvars.ContextVar("crawl_trace", default=None)
+
+
+class CrawlTrace:
+    """
+    1回のクロール実行中の、フェーズごとの所要時間・回数とカウンターを集計する。
+    フェーズは入れ子にできる (例: 抽出の中の正規化)。その場合の時間は内側・外側の
+    両方に計上される。
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._started = time.perf_counter()
+        self._finished = None
+        self.phase_seconds = defaultdict(float)
+        self.phase_counts = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.error_class = None
+
+    def add_phase(self, phase_name, seconds):
+        self.phase_seconds[phase_name] += seconds
+        self.phase_counts[phase_name] += 1
+
+    def increment(self, counter_name, amount=1):
+        self.counters[counter_name] += amount
+
+    def finish(self):
+        if self._finished is None:
+            self._finished = time.perf_counter()
+
+    @property
+    def total_seconds(self):
+        end = self._finished if self._finished is not None else time.perf_counter()
+        return end - self._started
+
+    def phase_timings(self):
+        """{フェーズ名: {"seconds": 合計秒数, "count": 回数}} の辞書を返す (JSON保存用)。"""
+        return {
+            phase_name: {
+                "seconds": round(seconds, 3),
+                "count": self.phase_counts[phase_name],
+            }
+            for phase_name, seconds in self.phase_seconds.items()
+        }
+
+    def summary(self):
+        """結果メッセージに付与する1行の要約を返す。"""
+        parts = []
+        for phase_name, seconds in sorted(
+            self.phase_seconds.items(), key=lambda item: item[1], reverse=True
+        ):
+            label = PHASE_LABELS.get(phase_name, phase_name)
+            parts.append(f"{label} {seconds:.1f}秒")
+        for counter_name, value in self.counters.items():
+            parts.append(f"{counter_name}={value}")
+        detail = f" ({', '.join(parts)})" if parts else ""
+        return f"[計測] 合計 {self.total_seconds:.1f}秒{detail}"
+
+
+def current_trace():
+    """実行中のトレースを返す。トレース外では None。"""
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name):
+    """このコンテキスト内 (同じスレッド) での計測を有効にする。"""
+    trace = CrawlTrace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current_trace.reset(token)
+
+
+@contextmanager
+def phase(phase_name):
+    """ブロックの所要時間を指定フェーズに計上する。トレース外では何もしない。"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_phase(phase_name, time.perf_counter() - started)
+
+
+def traced(phase_name):
+    """関数の所要時間を指定フェーズに計上するデコレーター。"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                trace.add_phase(phase_name, time.perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def count(counter_name, amount=1):
+    """実行中のトレースのカウンターを加算する。"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.increment(counter_name, amount)
+
+
+def record_error(exc):
+    """クロールを中断させた例外のクラス名を記録する。"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.error_class = type(exc).__name__
+
+
+def count_page(driver):
+    """
+    口コミ一覧ページ1枚の処理開始時に呼び出す。
+    ページ数を加算し、ブラウザが受信したバイト数 (概算) を計上する。
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    trace.increment(PAGES)
+    try:
+        trace.increment(
+            BYTES_DOWNLOADED, int(driver.execute_script(_TRANSFERRED_BYTES_SCRIPT) or 0)
+        )
+    except Exception:
+        # 計測の失敗でクロールを止めない
+        pass
+
+
+def traced_sleep(seconds):
+    """time.sleep と同じだが、待機時間を「待機」フェーズに計上する。"""
+    with phase(WAIT):
+        time.sleep(seconds)
@@ -0,0 +1,188 @@
+"""
+口コミ本文の翻訳。
+
+クロールとは切り離した後段の処理として、translate_reviews コマンドから実行する。
+言語コードが翻訳先の言語 (日本語) 以外で、翻訳文が未設定の口コミを対象とし、
+本文をまとめて翻訳バックエンドに渡す。翻訳結果は原文の SHA-256 をキーとして
+TranslationCache に保存するため、同じ本文は1回だけ翻訳される。
+
+翻訳バックエンドは settings.TRANSLATION_BACKEND で差し替えられる。
+"""
+import hashlib
+import logging
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import CrawlTarget, Review, TranslationCache
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationError(Exception):
+    """翻訳バックエンドの呼び出しに失敗した場合の例外"""
+
+
+class TranslationBackend:
+    """翻訳バックエンドの基底クラス"""
+
+    # TranslationCache に記録する名前
+    name = ""
+    # 1回の translate() に渡すテキストの最大件数
+    max_batch_size = 100
+
+    def translate(self, texts, target_language):
+        """texts を target_language に翻訳し、同じ順序の翻訳文のリストを返す。"""
+        raise NotImplementedError
+
+
+class StubTranslationBackend(TranslationBackend):
+    """外部に通信しない動作確認用のバックエンド。原文の先頭に言語コードを付けて返す。"""
+
+    name = "stub"
+
+    def translate(self, texts, target_language):
+        return [f"[{target_language}] {text}" for text in texts]
+
+
+class GoogleCloudTranslationBackend(TranslationBackend):
+    """Google Cloud Translation API (v2) を使うバックエンド"""
+
+    name = "google_cloud"
+    max_batch_size = 128  # API の1リクエストあたりの上限
+    endpoint = "https://translation.googleapis.com/language/translate/v2"
+
+    def __init__(self, api_key=None, timeout=30):
+        self.api_key = api_key or settings.TRANSLATION_API_KEY
+        if not self.api_key:
+            raise ImproperlyConfigured(
+                "Google Cloud Translation を使うには TRANSLATION_API_KEY を設定してください。"
+            )
+        self.timeout = timeout
+
+    def translate(self, texts, target_language):
+        try:
+            response = requests.post(
+                self.endpoint,
+                params={"key": self.api_key},
+                json={"q": list(texts), "target": target_language, "format": "text"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            translations = response.json()["data"]["translations"]
+        except (requests.RequestException, ValueError, KeyError) as e:
+            raise TranslationError(f"翻訳APIの呼び出しに失敗しました: {e}") from e
+        if len(translations) != len(texts):
+            raise TranslationError(
+                f"翻訳APIの応答件数が一致しません (送信: {len(texts)}件, 応答: {len(translations)}件)"
+            )
+        return [translation["translatedText"] for translation in translations]
+
+
+def get_translation_backend(backend_path=None):
+    """settings.TRANSLATION_BACKEND (または backend_path) のバックエンドを生成する。"""
+    return import_string(backend_path or settings.TRANSLATION_BACKEND)()
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def pending_translation_reviews(target_language=None):
+    """翻訳待ちの口コミ (翻訳先以外の言語で、本文があり、翻訳文が未設定のもの)"""
+    target_language = target_language or settings.TRANSLATION_TARGET_LANGUAGE
+    return (
+        Review.objects.filter(language_code__isnull=False)
+        .exclude(language_code=target_language)
+        .exclude(Q(review_comment__isnull=True) | Q(review_comment=""))
+        .filter(
+            Q(translated_review_comment__isnull=True) | Q(translated_review_comment="")
+        )
+    )
+
+
+def translate_reviews(reviews, backend=None, batch_size=50, target_language=None):
+    """
+    口コミのクエリセットを主キー順に batch_size 件ずつ翻訳し、翻訳文を保存する。
+    Returns:
+        dict: {"reviews": 翻訳文を保存した口コミ数, "cache_hits": キャッシュから
+               取得した本文数, "translated": バックエンドで翻訳した本文数}
+    """
+    backend = backend or get_translation_backend()
+    target_language = target_language or settings.TRANSLATION_TARGET_LANGUAGE
+    stats = {"reviews": 0, "cache_hits": 0, "translated": 0}
+
+    last_pk = 0
+    while True:
+        batch = list(
+            reviews.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .only("pk", "crawl_target_id", "language_code", "review_comment")[
+                :batch_size
+            ]
+        )
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        _translate_batch(batch, backend, target_language, stats)
+        logger.info(
+            "翻訳済み: %d件 (キャッシュ: %d件, 翻訳: %d件)",
+            stats["reviews"],
+            stats["cache_hits"],
+            stats["translated"],
+        )
+    return stats
+
+
+def _translate_batch(batch, backend, target_language, stats):
+    # 同じ本文はまとめて1回だけ翻訳する
+    sources = {}
+    for review in batch:
+        sources.setdefault(content_hash(review.review_comment), review)
+
+    translations = dict(
+        TranslationCache.objects.filter(
+            target_language=target_language, content_sha256__in=list(sources)
+        ).values_list("content_sha256", "translated_text")
+    )
+    stats["cache_hits"] += len(translations)
+
+    missing = [sha256 for sha256 in sources if sha256 not in translations]
+    new_entries = []
+    for start in range(0, len(missing), backend.max_batch_size):
+        chunk = missing[start : start + backend.max_batch_size]
+        translated_texts = backend.translate(
+            [sources[sha256].review_comment for sha256 in chunk], target_language
+        )
+        for sha256, translated_text in zip(chunk, translated_texts):
+            translations[sha256] = translated_text
+            new_entries.append(
+                TranslationCache(
+                    content_sha256=sha256,
+                    target_language=target_language,
+                    source_language=sources[sha256].language_code,
+                    translated_text=translated_text,
+                    backend=backend.name,
+                )
+            )
+    stats["translated"] += len(new_entries)
+
+    now = timezone.now()
+    for review in batch:
+        review.translated_review_comment = translations[
+            content_hash(review.review_comment)
+        ]
+        review.updated_at = now
+    with transaction.atomic():
+        TranslationCache.objects.bulk_create(new_entries, ignore_conflicts=True)
+        Review.objects.bulk_update(batch, ["translated_review_comment", "updated_at"])
+        # エクスポートキャッシュを無効化するため、データバージョンを加算する
+        CrawlTarget.objects.filter(
+            pk__in={review.crawl_target_id for review in batch}
+        ).update(data_version=F("data_version") + 1)
+    stats["reviews"] += len(batch)
@@ -1,7 +1,13 @@
 from decimal import Decimal, ROUND_HALF_UP
+from collections import OrderedDict
+import hashlib
+import re
+import threading
 import pycld2 as cld2
 import pycountry
 
+from .tracing import LANGUAGE_DETECTION, traced
+
 LANG_MAP_JA = {
     "ja": "日本語",
     "en": "英語",
@@ -19,39 +25,136 @@ LANG_MAP_JA = {
     "unknown": "不明",
 }
 
+# スコア正規化の事前計算テーブル: (元のスコア, 元の満点, 新しい満点) -> 正規化後のスコア
+# OTAのスコアは 1〜5 (0.5刻み) や x/10 などの離散値が大半のため、
+# よく使う満点について 0.1 刻みの値をインポート時に計算しておく
+PRECOMPUTED_SCORE_SCALES = (5, 10)
+SCORE_CACHE_MAX_SIZE = 1024
+_score_table = {}
+
+
+def _normalize_score_decimal(original_score, original_scale, target_scale):
+    # 元のスコアをDecimal型に変換
+    original_score_dec = Decimal(str(original_score))
+    original_scale_dec = Decimal(str(original_scale))
+    target_scale_dec = Decimal(str(target_scale))
+
+    # 正規化計算: (元のスコア / 元の満点) * 新しい満点
+    normalized = (original_score_dec / original_scale_dec) * target_scale_dec
+
+    # 小数点第2位を四捨五入して、小数点第1位までの値にする
+    return normalized.quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
+
+
+def _build_score_table():
+    for scale in PRECOMPUTED_SCORE_SCALES:
+        for step in range(scale * 10 + 1):
+            value = Decimal(step) / 10
+            normalized = _normalize_score_decimal(value, scale, 10)
+            # "4" / "4.0" / "4.5" のいずれの表記でも引けるようにする
+            for key in {str(value), str(value.normalize()), f"{value:.1f}"}:
+                _score_table[(key, str(scale), "10")] = normalized
+
+
+_build_score_table()
+
+
 def normalize_score(original_score, original_scale, target_scale=10):
     """スコアを正規化する関数"""
     if original_score is None or original_scale is None:
         return None
+    key = (str(original_score), str(original_scale), str(target_scale))
+    normalized = _score_table.get(key)
+    if normalized is not None:
+        return normalized
     try:
-        # 元のスコアをDecimal型に変換
-        original_score_dec = Decimal(str(original_score))
-        original_scale_dec = Decimal(str(original_scale))
-        target_scale_dec = Decimal(str(target_scale))
-
-        # 正規化計算: (元のスコア / 元の満点) * 新しい満点
-        normalized = (original_score_dec / original_scale_dec) * target_scale_dec
-
-        # 小数点第2位を四捨五入して、小数点第1位までの値にする
-        return normalized.quantize(Decimal("0.1"), rounding=ROUND_HALF_UP)
+        normalized = _normalize_score_decimal(original_score, original_scale, target_scale)
     except (ValueError, TypeError):
         # 数値に変換できないデータの場合はNoneを返す
         return None
+    # テーブルにない値は計算結果を上限件数まで追加する
+    if len(_score_table) < SCORE_CACHE_MAX_SIZE:
+        _score_table[key] = normalized
+    return normalized
 
 
-def detect_language(text: str) -> str:
+def normalize_score_column(values, original_scale, target_scale=10):
     """
-    与えられたテキストの言語を判定する。
-    Args:
-        text (str): 言語を判定したいテキスト。
+    スコアの列 (リストまたは pandas.Series) をまとめて正規化する。
+    重複する値は1回だけ正規化し、結果を各行に割り当てる。
+    """
+    mapping = {}
+    for value in values:
+        if value not in mapping:
+            mapping[value] = normalize_score(value, original_scale, target_scale)
+    if hasattr(values, "map"):
+        # pandas.Series の場合は同じインデックスの Series を返す
+        return values.map(mapping)
+    return [mapping[value] for value in values]
+
+
+# 言語コード -> 日本語表示名の変換テーブル (インポート時に一度だけ構築する)
+# LANG_MAP_JA にない言語は pycountry の英語名で補完する
+LANGUAGE_NAME_TABLE = {
+    lang.alpha_2: f"{lang.name} ({lang.alpha_2})"
+    for lang in pycountry.languages
+    if hasattr(lang, "alpha_2")
+}
+LANGUAGE_NAME_TABLE.update(LANG_MAP_JA)
+
+# 言語判定結果のメモ化 (テキストのハッシュ -> 言語コード) の最大件数
+LANGUAGE_CACHE_MAX_SIZE = 4096
+_language_cache = OrderedDict()
+_language_cache_lock = threading.Lock()
+
+# 文字種だけで言語が確定するスクリプトの定義
+# (言語コード, そのスクリプト固有の文字, 許容する文字の範囲)
+# 漢字のみのテキストは中国語と区別できず、ASCIIのみのテキストも英語以外
+# (インドネシア語など) の可能性があるため、これらは cld2 に任せる。
+# 英文中の「ラーメン」や中国語の文中の「の」のような混在を誤判定しないよう、
+# ラテン文字 (A-Z, a-z) を含むテキストは対象外とし、ASCIIは数字と記号のみ許容する
+_ASCII_NON_LETTERS = r"\x00-\x40\x5b-\x60\x7b-\x7f"
+_SCRIPT_LANGUAGE_PATTERNS = [
+    (
+        "ja",
+        re.compile(r"[\u3040-\u30ff\uff66-\uff9f]"),
+        re.compile(rf"^[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef{_ASCII_NON_LETTERS}]+$"),
+    ),
+    (
+        "ko",
+        re.compile(r"[\uac00-\ud7a3\u1100-\u11ff\u3130-\u318f]"),
+        re.compile(rf"^[\uac00-\ud7a3\u1100-\u11ff\u3130-\u318f\u3000-\u303f\uff00-\uffef{_ASCII_NON_LETTERS}]+$"),
+    ),
+    (
+        "th",
+        re.compile(r"[\u0e00-\u0e7f]"),
+        re.compile(rf"^[\u0e00-\u0e7f{_ASCII_NON_LETTERS}]+$"),
+    ),
+]
+
+
+def _detect_by_script(text: str):
+    """
+    文字種だけで判定できるテキストを cld2 を呼ばずに判定する。
+    固有の文字 (かな, ハングル, タイ文字) が文字 (数字・記号以外) の過半数を占める場合のみ判定し、
+    それ以外は cld2 に任せる。
     Returns:
-        str: 判定された言語のISO 639-1コード ('ja', 'en'など)。
-             テキストが短すぎる、または判定不能な場合は None を返す。
+        (判定済みフラグ, 言語コード)
     """
-    # テキストが空、または空白文字のみの場合は判定不能とする
-    if not text or not text.strip():
-        return None
+    letter_count = sum(1 for char in text if char.isalpha())
+    # 文字を含まない (数字や記号のみの) テキストは判定不能
+    if letter_count == 0:
+        return True, None
+    for lang_code, signature_pattern, allowed_pattern in _SCRIPT_LANGUAGE_PATTERNS:
+        if not allowed_pattern.match(text):
+            continue
+        signature_count = len(signature_pattern.findall(text))
+        if signature_count * 2 > letter_count:
+            return True, lang_code
+    return False, None
 
+
+def _detect_with_cld2(text: str) -> str:
     try:
 
         # details: (('言語名1', '言語コード1', 信頼度%, スコア), ('言語名2', ...))
@@ -71,27 +174,72 @@ def detect_language(text: str) -> str:
         return None
 
 
-def get_language_name_ja(lang_code: str) -> str:
+def detect_language(text: str) -> str:
     """
-    言語コードを日本語の表示名に変換する。
+    与えられたテキストの言語を判定する。
+    文字種で判定できるものは cld2 を呼ばずに判定し、結果はテキストのハッシュでメモ化する。
+    Args:
+        text (str): 言語を判定したいテキスト。
+    Returns:
+        str: 判定された言語のISO 639-1コード ('ja', 'en'など)。
+             テキストが短すぎる、または判定不能な場合は None を返す。
     """
-    if not lang_code:
+    # テキストが空、または空白文字のみの場合は判定不能とする
+    if not text or not text.strip():
         return None
-    ja_name = LANG_MAP_JA.get(lang_code)
-    if ja_name:
-        return ja_name
 
-    try:
+    cache_key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+    with _language_cache_lock:
+        if cache_key in _language_cache:
+            _language_cache.move_to_end(cache_key)
+            return _language_cache[cache_key]
+
+    resolved, lang_code = _detect_by_script(text)
+    if not resolved:
+        lang_code = _detect_with_cld2(text)
+
+    with _language_cache_lock:
+        _language_cache[cache_key] = lang_code
+        if len(_language_cache) > LANGUAGE_CACHE_MAX_SIZE:
+            _language_cache.popitem(last=False)
+    return lang_code
 
-        lang_obj = pycountry.languages.get(alpha_2=lang_code)
-        if lang_obj:
-            name = getattr(lang_obj, 'name', lang_code)
-            return f"{name} ({lang_code})"
-    except (KeyError, AttributeError):
-        # pycountryに存在しない、または無効なコードの場合
-        pass
 
-    return f"不明な言語 ({lang_code})"
+def detect_languages(texts) -> list:
+    """
+    複数テキストの言語をまとめて判定する。同一テキストは1回だけ判定する。
+    Returns:
+        list: texts と同じ順序の言語コードのリスト。
+    """
+    results = {}
+    for text in texts:
+        if text not in results:
+            results[text] = detect_language(text)
+    return [results[text] for text in texts]
+
+
+@traced(LANGUAGE_DETECTION)
+def annotate_languages(reviews_list, text_key="review_comment"):
+    """
+    口コミデータ (辞書) のリストに、言語コードと言語名をまとめて付与する。
+    クローラーが1ページ分の口コミを抽出した後に呼び出す。
+    """
+    lang_codes = detect_languages(
+        [review.get(text_key) or "" for review in reviews_list]
+    )
+    for review, lang_code in zip(reviews_list, lang_codes):
+        review["language_code"] = lang_code
+        review["review_language"] = get_language_name_ja(lang_code)
+    return reviews_list
+
+
+def get_language_name_ja(lang_code: str) -> str:
+    """
+    言語コードを日本語の表示名に変換する。
+    """
+    if not lang_code:
+        return None
+    return LANGUAGE_NAME_TABLE.get(lang_code) or f"不明な言語 ({lang_code})"
 
 # 言語コードから国籍カテゴリへのマッピング辞書
 # 提供されたリストに基づき、言語から推定される国籍をマッピング
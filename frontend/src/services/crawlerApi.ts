@@ -36,10 +36,138 @@ export const runCrawler = async (
   }
 };
 
+export type ExportJobStatus = 'PENDING' | 'RUNNING' | 'SUCCESS' | 'FAILURE';
+
+export interface ExportJob {
+  id: string;
+  hotel_name: string;
+  status: ExportJobStatus;
+  rows_written: number;
+  total_rows: number | null;
+  file_size: number | null;
+  error_message: string | null;
+  expires_at: string | null;
+}
+
+// エクスポートジョブの進捗を確認する間隔 (ミリ秒)
+const EXPORT_JOB_POLL_INTERVAL = 2000;
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+/**
+ * Blob形式のレスポンスをファイルとしてダウンロードさせる
+ */
+const saveResponseAsFile = (response: any, defaultFilename: string) => {
+  const contentDisposition = response.headers['content-disposition'];
+  let filename = defaultFilename;
+  if (contentDisposition) {
+    const filenameMatch = contentDisposition.match(/filename\*=UTF-8''(.+)/);
+    if (filenameMatch?.[1]) {
+      filename = decodeURIComponent(filenameMatch[1]);
+    }
+  }
+
+  const url = window.URL.createObjectURL(new Blob([response.data]));
+  const link = document.createElement('a');
+  link.href = url;
+  link.setAttribute('download', filename);
+  document.body.appendChild(link);
+  link.click();
+  link.parentNode?.removeChild(link);
+  window.URL.revokeObjectURL(url);
+};
+
+/**
+ * Blob形式のエラーレスポンスをテキストに変換して例外を投げる
+ */
+const throwBlobError = async (err: any): Promise<never> => {
+  if (err.response?.data instanceof Blob) {
+    const errorText = await err.response.data.text();
+    let errorJson: any;
+    try {
+      errorJson = JSON.parse(errorText);
+    } catch {
+      throw new Error('サーバーから予期せぬエラーが返されました。');
+    }
+    throw new Error(errorJson.error || '不明なエラーが発生しました。');
+  }
+  throw new Error(
+    err.response?.data?.error || 'エクスポート処理中にエラーが発生しました。'
+  );
+};
+
+/**
+ * エクスポートジョブを登録する関数
+ */
+export const createExportJob = async (
+  hotel: ApiHotel,
+  options: CrawlerOptions
+): Promise<ExportJob> => {
+  const payload = {
+    hotel: { id: hotel.id, name: hotel.name },
+    options: options,
+  };
+  const response = await axios.post<ExportJob>(
+    `${API_URL}/export-jobs/`,
+    payload
+  );
+  return response.data;
+};
+
+/**
+ * エクスポートジョブの進捗を取得する関数
+ */
+export const getExportJob = async (jobId: string): Promise<ExportJob> => {
+  const response = await axios.get<ExportJob>(
+    `${API_URL}/export-jobs/${jobId}/`
+  );
+  return response.data;
+};
+
 /**
  * レビューデータのエクスポートとダウンロードを処理する関数
+ * バックグラウンドのエクスポートジョブを登録し、完了を待ってから成果物をダウンロードする。
  */
 export const exportFile = async (
+  hotel: ApiHotel,
+  options: CrawlerOptions,
+  onProgress?: (job: ExportJob) => void
+): Promise<void> => {
+  try {
+    let job = await createExportJob(hotel, options);
+    onProgress?.(job);
+
+    while (job.status === 'PENDING' || job.status === 'RUNNING') {
+      await sleep(EXPORT_JOB_POLL_INTERVAL);
+      job = await getExportJob(job.id);
+      onProgress?.(job);
+    }
+
+    if (job.status === 'FAILURE') {
+      throw new Error(job.error_message || 'エクスポート処理に失敗しました。');
+    }
+
+    const response = await axios.get(
+      `${API_URL}/export-jobs/${job.id}/download/`,
+      { responseType: 'blob' }
+    );
+    saveResponseAsFile(response, 'export.xlsx');
+  } catch (err: any) {
+    console.error('エクスポートに失敗しました:', err);
+    if (!err.response) {
+      throw err instanceof Error
+        ? err
+        : new Error('エクスポート処理中にエラーが発生しました。');
+    }
+    await throwBlobError(err);
+  }
+};
+
+/**
+ * レビューデータを同期的にエクスポートしてダウンロードする関数
+ * (リクエスト内でファイルを生成するため、大量データではタイムアウトする可能性がある)
+ */
+export const exportFileSync = async (
   hotel: ApiHotel,
   options: CrawlerOptions
 ): Promise<void> => {
@@ -52,37 +180,9 @@ export const exportFile = async (
     const response = await axios.post(`${API_URL}/export/`, payload, {
       responseType: 'blob',
     });
-
-    // ファイルダウンロード処理
-    const contentDisposition = response.headers['content-disposition'];
-    let filename = 'export.xlsx';
-    if (contentDisposition) {
-      const filenameMatch = contentDisposition.match(/filename\*=UTF-8''(.+)/);
-      if (filenameMatch?.[1]) {
-        filename = decodeURIComponent(filenameMatch[1]);
-      }
-    }
-
-    const url = window.URL.createObjectURL(new Blob([response.data]));
-    const link = document.createElement('a');
-    link.href = url;
-    link.setAttribute('download', filename);
-    document.body.appendChild(link);
-    link.click();
-    link.parentNode?.removeChild(link);
-    window.URL.revokeObjectURL(url);
+    saveResponseAsFile(response, 'export.xlsx');
   } catch (err: any) {
     console.error('エクスポートに失敗しました:', err);
-    // Blob形式のエラーレスポンスをテキストに変換して処理する
-    if (err.response?.data instanceof Blob) {
-      const errorText = await err.response.data.text();
-      try {
-        const errorJson = JSON.parse(errorText);
-        throw new Error(errorJson.error || '不明なエラーが発生しました。');
-      } catch {
-        throw new Error('サーバーから予期せぬエラーが返されました。');
-      }
-    }
-    throw new Error('エクスポート処理中にエラーが発生しました。');
+    await throwBlobError(err);
   }
 };